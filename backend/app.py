@@ -10,41 +10,114 @@ if __package__ in {None, ''}:  # allow running via `python backend/app.py`
         sys.path.insert(0, project_root_str)
     __package__ = 'backend'
 
-from flask import Flask, jsonify
+from flask import Flask, g, jsonify, request
 from flask_cors import CORS
 
 from .config import settings
-from .db import db
-from .routes import register_error_handlers
+from .db import (
+    READ_PRIMARY_FOR_HEADER,
+    READ_PRIMARY_HEADER,
+    REPLICA_BIND,
+    db,
+    flask_engine_config,
+    instrument_engine,
+    pool_stats,
+)
+from .metrics import dict_collector, instrument_app, instrument_sql, registry
+from .profiling import instrument_app as instrument_profiling
+from .routes import auth_metrics, register_error_handlers, revoked_tokens, success_response, token_required
 from .routes.auth import auth_bp
 from .routes.patients import patients_bp
 from .routes.notes import notes_bp
 from .routes.export import export_bp
+from .routes.wards import wards_bp
+from .routes.debug import debug_bp
+from .services.audit import audit_writer
+from .services.jobs import job_queue
+from .services.note_search import note_index
 
 
 def create_app() -> Flask:
     app = Flask(__name__)
-    app.config['SQLALCHEMY_DATABASE_URI'] = settings.MYSQL_URL
+    app.config.update(flask_engine_config())
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
     db.init_app(app)
-    CORS(app)
+    with app.app_context():
+        engines = dict(db.engines)
+    for key, engine in engines.items():
+        instrument_engine(engine, key or 'primary')
+    replica_enabled = REPLICA_BIND in app.config['SQLALCHEMY_BINDS']
+    if settings.METRICS_ENABLED or settings.PROFILING_ENABLED:
+        for key, engine in engines.items():
+            instrument_sql(engine, key or 'primary')
+    if settings.PROFILING_ENABLED:
+        instrument_profiling(app)
+    if settings.METRICS_ENABLED:
+        instrument_app(app, guard=token_required('admin'))
+        registry.collector('db_pool', dict_collector(
+            'carenotes_db_pool', lambda: pool_stats(engines), label='engine',
+            counters=('connects', 'checkouts', 'checkins', 'invalidations'),
+        ))
+        registry.collector('auth', dict_collector(
+            'carenotes_auth', auth_metrics,
+            counters=('requests', 'cache_hits', 'cache_misses', 'rejected', 'revoked', 'evictions'),
+        ))
+        registry.collector('jobs', dict_collector(
+            'carenotes_jobs', job_queue.metrics, counters=('completed', 'failed', 'rejected'),
+        ))
+    CORS(app, expose_headers=[READ_PRIMARY_FOR_HEADER])
     register_error_handlers(app)
+    if settings.AUDIT_BUFFERED:
+        audit_writer.init_app(app)
+    if settings.NOTE_SEARCH_CATCH_UP_SECONDS > 0:
+        note_index.init_app(app, settings.NOTE_SEARCH_CATCH_UP_SECONDS)
+    revoked_tokens.init_app(app)
 
     app.register_blueprint(auth_bp, url_prefix='/api/auth')
     app.register_blueprint(patients_bp, url_prefix='/api/patients')
     app.register_blueprint(notes_bp, url_prefix='/api/notes')
     app.register_blueprint(export_bp, url_prefix='/api/export')
+    app.register_blueprint(wards_bp, url_prefix='/api/wards')
+    app.register_blueprint(debug_bp, url_prefix='/debug')
+
+    @app.before_request
+    def _route_reads():
+        # Read-only requests may be served from the replica (see RoutingSession),
+        # except from a client that wrote within the last DB_REPLICA_PIN_SECONDS.
+        g.db_replica = (
+            replica_enabled
+            and request.method in {'GET', 'HEAD'}
+            and not request.headers.get(READ_PRIMARY_HEADER)
+        )
+
+    @app.after_request
+    def _pin_reads_after_write(response):
+        if replica_enabled and settings.DB_REPLICA_PIN_SECONDS > 0 and g.get('db_wrote'):
+            response.headers[READ_PRIMARY_FOR_HEADER] = str(settings.DB_REPLICA_PIN_SECONDS)
+        return response
+
+    @app.after_request
+    def _auth_timing(response):
+        auth_seconds = g.get('auth_seconds')
+        if auth_seconds is not None:
+            response.headers.add('Server-Timing', f'auth;dur={auth_seconds * 1000.0:.3f}')
+        return response
 
     @app.route('/')
     def root():
         return jsonify({'ok': True, 'version': 'mvp'})
 
-    return app
-
+    @app.get('/api/db/pool')
+    @token_required('admin')
+    def db_pool():
+        return success_response(pool_stats(db.engines))
 
-app = create_app()
+    return app
 
 
+# No module-level app: importing this module (scripts, tests, each worker
+# before fork) must not open engines or register hooks. ``flask --app app``
+# finds ``create_app`` by itself; WSGI servers use ``backend.app:create_app()``.
 if __name__ == '__main__':  # pragma: no cover
-    app.run(debug=True)
+    create_app().run(debug=True)
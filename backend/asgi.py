@@ -0,0 +1,304 @@
+"""ASGI serving mode: the Flask app's routes under an asyncio server.
+
+    uvicorn backend.asgi:create_asgi_app --factory --host 0.0.0.0 --port 5000
+    python -m backend.asgi --port 5000
+
+Endpoints that registered an ``async_variant`` (transcribe, parse and the
+note reads) are awaited on the event loop, so a request waiting on OpenAI or
+MySQL holds no thread. Every other route runs the unchanged WSGI app on a
+bounded thread pool (``ASGI_WSGI_THREADS``).
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import inspect
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from tempfile import SpooledTemporaryFile
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from flask import Flask
+from werkzeug.exceptions import HTTPException
+
+from .config import settings
+from .db import dispose_async_engine
+from .lazy import optional_import
+from .metrics import RequestObservation
+from .routes import async_views
+from .services.openai_client import close_async_openai_client
+
+
+# Request bodies above this are spooled to disk (audio uploads).
+SPOOL_BYTES = 1 << 20
+# Automatic OPTIONS and HEAD responses are left to Flask.
+_NATIVE_METHODS = frozenset({'GET', 'POST', 'PUT', 'PATCH', 'DELETE'})
+
+Scope = Dict[str, Any]
+Receive = Callable[[], Any]
+Send = Callable[[Dict[str, Any]], Any]
+
+
+async def _read_body(receive: Receive) -> Optional[SpooledTemporaryFile]:
+    """The whole request body, or ``None`` if the client went away first."""
+    body = SpooledTemporaryFile(max_size=SPOOL_BYTES)
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            body.close()
+            return None
+        chunk = message.get('body', b'')
+        if chunk:
+            body.write(chunk)
+        if not message.get('more_body', False):
+            break
+    body.seek(0)
+    return body
+
+
+def build_environ(scope: Scope, body: Any) -> Dict[str, Any]:
+    """WSGI environ for an ASGI ``http`` scope whose body is already in ``body``."""
+    root_path = scope.get('root_path', '')
+    path = scope['path']
+    if root_path and path.startswith(root_path):
+        path = path[len(root_path):]
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    body.seek(0, 2)
+    length = body.tell()
+    body.seek(0)
+    environ: Dict[str, Any] = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': root_path.encode('utf-8').decode('latin-1'),
+        'PATH_INFO': path.encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1] or 80),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': client[0],
+        'REMOTE_PORT': str(client[1]),
+        # The body is fully read, so its real size replaces any chunked encoding.
+        'CONTENT_LENGTH': str(length),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for raw_name, raw_value in scope.get('headers', ()):
+        name = raw_name.decode('latin-1').upper().replace('-', '_')
+        value = raw_value.decode('latin-1')
+        if name == 'CONTENT_LENGTH':
+            continue
+        if name != 'CONTENT_TYPE':
+            name = f'HTTP_{name}'
+        environ[name] = f'{environ[name]},{value}' if name in environ else value
+    return environ
+
+
+def _asgi_headers(headers: Any) -> List[Tuple[bytes, bytes]]:
+    return [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+
+
+class WSGIBridge:
+    """Runs a WSGI app for ASGI requests on a bounded thread pool.
+
+    Requests run concurrently on up to ``threads`` threads. Each response
+    chunk is handed to the loop and awaited before the next one is produced,
+    so a slow client throttles a streamed export instead of buffering it.
+    """
+
+    def __init__(self, wsgi_app: Callable, threads: int) -> None:
+        self.wsgi_app = wsgi_app
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='carenotes-wsgi')
+
+    async def __call__(self, environ: Dict[str, Any], receive: Receive, send: Send) -> None:
+        loop = asyncio.get_running_loop()
+        disconnected = threading.Event()
+        watcher = loop.create_task(self._watch_disconnect(receive, disconnected))
+        try:
+            await loop.run_in_executor(self.executor, self._run, environ, send, loop, disconnected)
+        finally:
+            watcher.cancel()
+
+    @staticmethod
+    async def _watch_disconnect(receive: Receive, disconnected: threading.Event) -> None:
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+        disconnected.set()
+
+    def _run(self, environ: Dict[str, Any], send: Send, loop: asyncio.AbstractEventLoop,
+             disconnected: threading.Event) -> None:
+        def deliver(message: Dict[str, Any]) -> None:
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        # [start message, sent]
+        state: List[Any] = [None, False]
+
+        def start_response(status: str, headers: Any, exc_info: Any = None) -> Callable[[bytes], None]:
+            if exc_info is not None and state[1]:
+                raise exc_info[1].with_traceback(exc_info[2])
+            state[0] = {'type': 'http.response.start', 'status': int(status[:3]), 'headers': _asgi_headers(headers)}
+            return write
+
+        def write(chunk: bytes) -> None:
+            if not state[1]:
+                deliver(state[0])
+                state[1] = True
+            if chunk:
+                deliver({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+
+        iterable = self.wsgi_app(environ, start_response)
+        try:
+            for chunk in iterable:
+                if disconnected.is_set():
+                    return
+                if chunk:
+                    write(chunk)
+            if not state[1]:
+                deliver(state[0])
+            deliver({'type': 'http.response.body', 'body': b'', 'more_body': False})
+        finally:
+            close = getattr(iterable, 'close', None)
+            if close is not None:
+                close()
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+class CareNotesASGI:
+    """ASGI entry point: async views on the loop, everything else through the bridge.
+
+    Async views go through Flask's own request handling (URL matching,
+    ``before_request``/``after_request`` hooks, error handlers, CORS) with
+    the view awaited instead of called. The WSGI middlewares (request
+    metrics, profiling) wrap only the bridged routes; async views are timed
+    here, but not profiled.
+    """
+
+    def __init__(self, flask_app: Flask, *, wsgi_threads: Optional[int] = None) -> None:
+        self.flask_app = flask_app
+        self.bridge = WSGIBridge(flask_app, wsgi_threads or settings.ASGI_WSGI_THREADS)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] == 'http':
+            await self._http(scope, receive, send)
+        elif scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        else:  # websocket: nothing is served over it
+            await send({'type': 'websocket.close', 'code': 1000})
+
+    async def _lifespan(self, receive: Receive, send: Send) -> None:
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.aclose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def aclose(self) -> None:
+        await dispose_async_engine()
+        await close_async_openai_client()
+        self.bridge.close()
+
+    async def _http(self, scope: Scope, receive: Receive, send: Send) -> None:
+        body = await _read_body(receive)
+        if body is None:
+            return
+        try:
+            environ = build_environ(scope, body)
+            match = self._match(environ)
+            if match is None:
+                await self.bridge(environ, receive, send)
+            else:
+                await self._dispatch(environ, send, *match)
+        finally:
+            body.close()
+
+    def _match(self, environ: Dict[str, Any]) -> Optional[Tuple[Callable, str]]:
+        if environ['REQUEST_METHOD'] not in _NATIVE_METHODS or not async_views:
+            return None
+        try:
+            rule, _ = self.flask_app.url_map.bind_to_environ(environ).match(return_rule=True)
+        except HTTPException:  # 404, 405 and redirects: Flask answers those
+            return None
+        view = async_views.get(rule.endpoint)
+        return (view, rule.rule) if view is not None else None
+
+    async def _dispatch(self, environ: Dict[str, Any], send: Send, view: Callable, rule: str) -> None:
+        observation = RequestObservation(environ['REQUEST_METHOD'], rule) if settings.METRICS_ENABLED else None
+        try:
+            response = await self._respond(environ, view)
+            if observation is not None:
+                observation.status = str(response.status_code)
+        finally:
+            if observation is not None:
+                observation.finish()
+        try:
+            body = response.get_data() if not response.is_streamed else await asyncio.to_thread(response.get_data)
+            await send({
+                'type': 'http.response.start',
+                'status': response.status_code,
+                'headers': _asgi_headers(response.headers.items()),
+            })
+            await send({'type': 'http.response.body', 'body': body, 'more_body': False})
+        finally:
+            response.close()
+
+    async def _respond(self, environ: Dict[str, Any], view: Callable) -> Any:
+        """``Flask.full_dispatch_request`` with the view awaited."""
+        app = self.flask_app
+        # Flask keeps the request context in context variables, so it is
+        # private to this request's task across every await below.
+        ctx = app.request_context(environ)
+        ctx.push()
+        error: Optional[BaseException] = None
+        try:
+            try:
+                rv = app.preprocess_request()
+                if rv is None:
+                    rv = view(**ctx.request.view_args)
+                    if inspect.isawaitable(rv):
+                        rv = await rv
+            except Exception as exc:
+                rv = app.handle_user_exception(exc)
+            return app.finalize_request(rv)
+        except Exception as exc:
+            error = exc
+            return app.handle_exception(exc)
+        finally:
+            ctx.pop(error)
+
+
+def create_asgi_app(flask_app: Optional[Flask] = None) -> CareNotesASGI:
+    if flask_app is None:
+        from .app import create_app
+
+        flask_app = create_app()
+    return CareNotesASGI(flask_app)
+
+
+def main() -> None:  # pragma: no cover - needs a server
+    parser = argparse.ArgumentParser(description='Serve the API with uvicorn (ASGI mode).')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--workers', type=int, default=1)
+    args = parser.parse_args()
+
+    uvicorn = optional_import('uvicorn')
+    if uvicorn is None:
+        sys.exit('ASGI mode needs uvicorn: pip install uvicorn')
+    uvicorn.run('backend.asgi:create_asgi_app', factory=True, host=args.host, port=args.port, workers=args.workers)
+
+
+__all__ = ['CareNotesASGI', 'WSGIBridge', 'build_environ', 'create_asgi_app']
+
+
+if __name__ == '__main__':  # pragma: no cover
+    main()
@@ -1,16 +1,296 @@
 ﻿from __future__ import annotations
 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import scoped_session, sessionmaker
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from flask import g, has_request_context
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session as _FlaskSession
+from sqlalchemy import create_engine, event, func, select
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.sql import Select
+from sqlalchemy.sql.dml import UpdateBase
 
 from .config import settings
+from .metrics import instrument_sql
+
+
+REPLICA_BIND = 'replica'
+_WROTE_KEY = 'carenotes.wrote'
+# Read-after-write across requests: a response to a request that wrote
+# carries READ_PRIMARY_FOR_HEADER (seconds); while that window lasts the
+# client sends READ_PRIMARY_HEADER and its reads stay on the primary.
+READ_PRIMARY_HEADER = 'X-Read-Primary'
+READ_PRIMARY_FOR_HEADER = 'X-Read-Primary-For'
+
+
+def engine_options(url: str) -> Dict[str, Any]:
+    """Pool and driver options for ``url``, taken from ``settings``.
+
+    Every engine in the process is built from these: the Flask-SQLAlchemy
+    engines (primary and replica) and the ones scripts open via ``make_engine``.
+    """
+    options: Dict[str, Any] = {'pool_pre_ping': settings.DB_POOL_PRE_PING}
+    if url.startswith('sqlite'):
+        return options
+    options.update(
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        # Below MySQL's wait_timeout (and any proxy idle timeout), so pooled
+        # connections are replaced before the server drops them ("gone away").
+        pool_recycle=settings.DB_POOL_RECYCLE,
+    )
+    if url.startswith('mysql+pymysql'):
+        options['connect_args'] = {
+            'connect_timeout': settings.DB_CONNECT_TIMEOUT,
+            'read_timeout': settings.DB_READ_TIMEOUT,
+            'write_timeout': settings.DB_READ_TIMEOUT,
+        }
+    elif url.startswith('mysql+aiomysql'):
+        options['connect_args'] = {'connect_timeout': settings.DB_CONNECT_TIMEOUT}
+    return options
+
+
+def flask_engine_config() -> Dict[str, Any]:
+    """``SQLALCHEMY_*`` app config for the primary and, if configured, the read replica."""
+    config: Dict[str, Any] = {
+        'SQLALCHEMY_DATABASE_URI': settings.MYSQL_URL,
+        'SQLALCHEMY_ENGINE_OPTIONS': engine_options(settings.MYSQL_URL),
+        'SQLALCHEMY_BINDS': {},
+    }
+    if settings.MYSQL_REPLICA_URL:
+        config['SQLALCHEMY_BINDS'][REPLICA_BIND] = {
+            'url': settings.MYSQL_REPLICA_URL,
+            **engine_options(settings.MYSQL_REPLICA_URL),
+        }
+    return config
+
+
+class PoolMetrics:
+    """Connection lifecycle counters for one engine, fed by pool events."""
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self._lock = threading.Lock()
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.invalidations = 0
+        self.max_checked_out = 0
+        self._checked_out = 0
+        self._checkout_started: Dict[int, float] = {}
+        self.total_hold_seconds = 0.0
+
+    def on_connect(self, *_: Any) -> None:
+        with self._lock:
+            self.connects += 1
+
+    def on_checkout(self, dbapi_conn: Any, *_: Any) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self._checked_out += 1
+            self.max_checked_out = max(self.max_checked_out, self._checked_out)
+            self._checkout_started[id(dbapi_conn)] = time.perf_counter()
+
+    def on_checkin(self, dbapi_conn: Any, *_: Any) -> None:
+        with self._lock:
+            self.checkins += 1
+            started = self._checkout_started.pop(id(dbapi_conn), None)
+            if started is not None:
+                self._checked_out -= 1
+                self.total_hold_seconds += time.perf_counter() - started
+
+    def on_invalidate(self, dbapi_conn: Any, *_: Any) -> None:
+        with self._lock:
+            self.invalidations += 1
+            # An invalidated connection is checked in without its DBAPI handle.
+            started = self._checkout_started.pop(id(dbapi_conn), None)
+            if started is not None:
+                self._checked_out -= 1
+                self.total_hold_seconds += time.perf_counter() - started
+
+    def snapshot(self, engine: Engine) -> Dict[str, Any]:
+        pool = engine.pool
+        with self._lock:
+            data = {
+                'engine': self.name,
+                'pool': type(pool).__name__,
+                'connects': self.connects,
+                'checkouts': self.checkouts,
+                'checkins': self.checkins,
+                'invalidations': self.invalidations,
+                'max_checked_out': self.max_checked_out,
+                'mean_hold_ms': round(self.total_hold_seconds * 1000.0 / self.checkins, 3) if self.checkins else 0.0,
+            }
+        for key in ('size', 'checkedin', 'checkedout', 'overflow'):
+            reader = getattr(pool, key, None)
+            if callable(reader):
+                data[key] = reader()
+        limit = getattr(pool, '_max_overflow', None)
+        if 'size' in data and isinstance(limit, int) and limit >= 0:
+            data['capacity'] = data['size'] + limit
+            data['utilization'] = round(data['checkedout'] / data['capacity'], 3) if data['capacity'] else 0.0
+        return data
+
+
+_metrics: Dict[int, PoolMetrics] = {}
+_metrics_lock = threading.Lock()
+
+
+def instrument_engine(engine: Engine, name: str) -> PoolMetrics:
+    """Attach pool event listeners once per engine."""
+    with _metrics_lock:
+        metrics = _metrics.get(id(engine))
+        if metrics is None:
+            metrics = _metrics[id(engine)] = PoolMetrics(name)
+            event.listen(engine, 'connect', metrics.on_connect)
+            event.listen(engine, 'checkout', metrics.on_checkout)
+            event.listen(engine, 'checkin', metrics.on_checkin)
+            event.listen(engine, 'invalidate', metrics.on_invalidate)
+        return metrics
+
+
+def pool_stats(engines: Dict[Optional[str], Engine]) -> Dict[str, Dict[str, Any]]:
+    stats: Dict[str, Dict[str, Any]] = {}
+    for key, engine in engines.items():
+        name = key or 'primary'
+        stats[name] = instrument_engine(engine, name).snapshot(engine)
+    return stats
+
+
+def make_engine(url: str, name: str = 'script', **overrides: Any) -> Engine:
+    """Standalone engine for scripts and workers outside the Flask app."""
+    options = {**engine_options(url), **overrides}
+    engine = create_engine(url, future=True, **options)
+    instrument_engine(engine, name)
+    return engine
+
+
+def db_now(session: Any) -> datetime:
+    """The database clock, as ``server_default=func.now()`` columns see it.
+
+    Timestamps compared with ``created_at`` must come from here rather than
+    ``datetime.now()``: the app and the database need not share a timezone.
+    """
+    return session.execute(select(func.now())).scalar_one()
+
+
+# Sync driver -> its asyncio counterpart, for the async read engine.
+ASYNC_DRIVERS = {
+    'mysql': 'mysql+aiomysql',
+    'mysql+pymysql': 'mysql+aiomysql',
+    'sqlite': 'sqlite+aiosqlite',
+    'sqlite+pysqlite': 'sqlite+aiosqlite',
+}
+
+
+def async_database_url(url: str) -> str:
+    """``url`` with its driver swapped for the asyncio one (unchanged if already async)."""
+    parsed = make_url(url)
+    driver = ASYNC_DRIVERS.get(parsed.drivername)
+    return parsed.set(drivername=driver).render_as_string(hide_password=False) if driver else url
+
+
+_async_engines: Dict[str, Any] = {}
+_async_engine_lock = threading.Lock()
+
+
+def async_read_engine(replica: bool = True) -> Any:
+    """The ``AsyncEngine`` async views read through, built on first use.
+
+    It reads from the replica when one is configured; ``MYSQL_ASYNC_URL``
+    overrides the derived URL. ``replica=False`` (a request pinned to the
+    primary) gets a second engine on the primary. Their connections belong
+    to the event loop that opened them, so the ASGI app disposes of them on
+    shutdown.
+    """
+    name = 'async_read' if replica or not settings.MYSQL_REPLICA_URL else 'async_primary'
+    with _async_engine_lock:
+        engine = _async_engines.get(name)
+        if engine is None:
+            from sqlalchemy.ext.asyncio import create_async_engine
+
+            if name == 'async_read':
+                url = settings.MYSQL_ASYNC_URL or async_database_url(settings.MYSQL_REPLICA_URL or settings.MYSQL_URL)
+            else:
+                url = async_database_url(settings.MYSQL_URL)
+            engine = _async_engines[name] = create_async_engine(url, **engine_options(url))
+            instrument_engine(engine.sync_engine, name)
+            if settings.METRICS_ENABLED or settings.PROFILING_ENABLED:
+                instrument_sql(engine.sync_engine, name)
+        return engine
+
+
+def async_read_session() -> Any:
+    """A new ``AsyncSession`` on :func:`async_read_engine`; use as ``async with``.
+
+    Inside a request it follows ``g.db_replica``, like :class:`RoutingSession`.
+    """
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+    replica = has_request_context() and bool(g.get('db_replica'))
+    return AsyncSession(async_read_engine(replica), expire_on_commit=False)
+
+
+async def dispose_async_engine() -> None:
+    with _async_engine_lock:
+        engines = list(_async_engines.values())
+        _async_engines.clear()
+    for engine in engines:
+        await engine.dispose()
+
+
+class RoutingSession(_FlaskSession):
+    """Sends plain SELECTs of read-only requests to the replica engine.
+
+    A request opts in with ``g.db_replica = True`` (set for GET/HEAD when a
+    replica is configured and the client is not inside a read-primary window,
+    see ``READ_PRIMARY_HEADER``). Once the session has flushed or executed a
+    write, every later statement in it stays on the primary so it reads its
+    own writes, and ``g.db_wrote`` is set so the response opens that window;
+    ``SELECT ... FOR UPDATE`` always goes to the primary.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None:
+            if self._flushing or isinstance(clause, UpdateBase):
+                self.info[_WROTE_KEY] = True
+                if has_request_context():
+                    g.db_wrote = True
+            elif self._use_replica(clause):
+                replica = self._db.engines.get(REPLICA_BIND)
+                if replica is not None:
+                    return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def _use_replica(self, clause: Any) -> bool:
+        if self.info.get(_WROTE_KEY) or not has_request_context() or not g.get('db_replica'):
+            return False
+        return isinstance(clause, Select) and clause._for_update_arg is None
 
 
-db = SQLAlchemy(session_options={'expire_on_commit': False})
-engine = create_engine(settings.MYSQL_URL, future=True)
-SessionLocal = scoped_session(sessionmaker(bind=engine, autocommit=False, autoflush=False))
+db = SQLAlchemy(session_options={'class_': RoutingSession, 'expire_on_commit': False})
 
 
-def get_session():
-    return SessionLocal()
+__all__ = [
+    'ASYNC_DRIVERS',
+    'REPLICA_BIND',
+    'PoolMetrics',
+    'READ_PRIMARY_FOR_HEADER',
+    'READ_PRIMARY_HEADER',
+    'RoutingSession',
+    'async_database_url',
+    'async_read_engine',
+    'async_read_session',
+    'db',
+    'db_now',
+    'dispose_async_engine',
+    'engine_options',
+    'flask_engine_config',
+    'instrument_engine',
+    'make_engine',
+    'pool_stats',
+]
@@ -0,0 +1,32 @@
+from __future__ import annotations
+
+import importlib
+import importlib.util
+from functools import lru_cache
+from types import ModuleType
+from typing import Optional
+
+
+@lru_cache(maxsize=None)
+def optional_import(name: str) -> Optional[ModuleType]:
+    """Import ``name`` on first use; ``None`` when it is not installed.
+
+    Heavy optional dependencies (WeasyPrint, reportlab, pyarrow, NumPy,
+    pypinyin, the OpenAI SDK) go through here instead of module-level
+    ``try: import``, so importing the app does not pay for them.
+    """
+    try:
+        return importlib.import_module(name)
+    except ModuleNotFoundError as exc:
+        if exc.name and name.split('.')[0] != exc.name.split('.')[0]:
+            raise  # the package is installed but one of its own dependencies is missing
+        return None
+
+
+@lru_cache(maxsize=None)
+def is_available(name: str) -> bool:
+    """Cheap installed-check for a top-level package, without importing it."""
+    return importlib.util.find_spec(name) is not None
+
+
+__all__ = ['is_available', 'optional_import']
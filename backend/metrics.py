@@ -0,0 +1,415 @@
+from __future__ import annotations
+
+import hmac
+import inspect
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from functools import wraps
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from flask import Flask, Response, g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .config import settings
+from .profiling import add_span
+
+
+LabelValues = Tuple[str, ...]
+
+# Seconds; spans a cached token check up to a long transcription.
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: LabelValues, extra: str = '') -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _number(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def header(self) -> List[str]:
+        return [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, labels: LabelValues = (), amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [f'{self.name}{_labels(self.labelnames, key)} {_number(value)}' for key, value in items]
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, labels: LabelValues = (), amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, labels: LabelValues = (), amount: float = 1) -> None:
+        self.inc(labels, -amount)
+
+    def set(self, value: float, labels: LabelValues = ()) -> None:
+        with self._lock:
+            self._values[labels] = value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [f'{self.name}{_labels(self.labelnames, key)} {_number(value)}' for key, value in items]
+
+
+class Histogram(_Metric):
+    """Fixed-bucket histogram; ``observe`` is one bisect and two adds under a lock."""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [bucket counts..., +Inf count], sum
+        self._series: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, labels: LabelValues = ()) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = ([0] * (len(self.buckets) + 1), [0.0])
+            series[0][index] += 1
+            series[1][0] += value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, (list(counts), total[0])) for key, (counts, total) in self._series.items())
+        lines = self.header()
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = 'le="' + _number(float(bound)) + '"'
+                lines.append(f'{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}')
+            lines.append(f'{self.name}_sum{_labels(self.labelnames, key)} {_number(total)}')
+            lines.append(f'{self.name}_count{_labels(self.labelnames, key)} {cumulative}')
+        return lines
+
+
+Sample = Tuple[str, str, str, Dict[str, str], float]
+Collector = Callable[[], Iterable[Sample]]
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: Dict[str, Collector] = {}
+
+    def register(self, metric: _Metric) -> Any:
+        if metric.name in self._metrics:
+            raise ValueError(f'duplicate metric: {metric.name}')
+        self._metrics[metric.name] = metric
+        return metric
+
+    def collector(self, name: str, fn: Collector) -> None:
+        """Scrape-time source of ``(name, kind, help, labels, value)`` samples.
+
+        Registering the same ``name`` again replaces the earlier collector.
+        """
+        self._collectors[name] = fn
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        # Samples of one metric must be contiguous in the exposition format.
+        grouped: Dict[str, Tuple[str, str, List[str]]] = {}
+        for collect in list(self._collectors.values()):
+            for name, kind, documentation, labels, value in collect():
+                entry = grouped.setdefault(name, (kind, documentation, []))
+                names = tuple(labels)
+                entry[2].append(f'{name}{_labels(names, tuple(labels[key] for key in names))} {_number(value)}')
+        for name, (kind, documentation, samples) in grouped.items():
+            lines.append(f'# HELP {name} {documentation}')
+            lines.append(f'# TYPE {name} {kind}')
+            lines.extend(samples)
+        return '\n'.join(lines) + '\n'
+
+
+def dict_collector(prefix: str, source: Callable[[], Dict[str, Any]], *, label: Optional[str] = None,
+                   counters: Sequence[str] = ()) -> Collector:
+    """Expose the numeric values of an existing ``metrics()``-style dict.
+
+    Nested dicts are flattened (``wait_ms.p50`` becomes ``<prefix>_wait_ms_p50``).
+    With ``label``, ``source()`` maps label values to such dicts, e.g. pool
+    stats per engine. Keys in ``counters`` are exported as ``*_total`` counters.
+    """
+    counter_keys = frozenset(counters)
+
+    def flatten(values: Dict[str, Any], path: str = '') -> Iterable[Tuple[str, Any]]:
+        for key, value in values.items():
+            if isinstance(value, dict):
+                yield from flatten(value, f'{path}{key}_')
+            else:
+                yield f'{path}{key}', value
+
+    def collect() -> Iterable[Sample]:
+        data = source()
+        groups = data.items() if label else ((None, data),)
+        for label_value, values in groups:
+            labels = {label: str(label_value)} if label else {}
+            for key, value in flatten(values):
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                if key in counter_keys:
+                    yield f'{prefix}_{key}_total', 'counter', f'{prefix} {key}', labels, value
+                else:
+                    yield f'{prefix}_{key}', 'gauge', f'{prefix} {key}', labels, value
+
+    return collect
+
+
+registry = Registry()
+
+http_requests = registry.register(Counter(
+    'carenotes_http_requests_total', 'HTTP requests by endpoint and status.', ('method', 'endpoint', 'status')))
+http_latency = registry.register(Histogram(
+    'carenotes_http_request_duration_seconds', 'Time spent in the view, per endpoint.', ('method', 'endpoint')))
+http_in_flight = registry.register(Gauge(
+    'carenotes_http_requests_in_flight', 'Requests currently being handled.'))
+request_queries = registry.register(Histogram(
+    'carenotes_http_request_db_queries', 'SQL statements executed per request.', ('endpoint',), COUNT_BUCKETS))
+request_db_time = registry.register(Histogram(
+    'carenotes_http_request_db_seconds', 'Total SQL time per request.', ('endpoint',)))
+db_queries = registry.register(Counter(
+    'carenotes_db_queries_total', 'SQL statements executed.', ('engine',)))
+db_query_time = registry.register(Histogram(
+    'carenotes_db_query_duration_seconds', 'Latency of individual SQL statements.', ('engine',)))
+external_latency = registry.register(Histogram(
+    'carenotes_external_call_duration_seconds', 'Latency of calls to OpenAI and the PDF renderer.',
+    ('service', 'operation', 'outcome')))
+external_in_flight = registry.register(Gauge(
+    'carenotes_external_calls_in_flight', 'External calls currently running.', ('service',)))
+
+
+def timed_call(service: str, operation: str) -> Callable[[Callable], Callable]:
+    """Record latency (and ok/error outcome) of every call to the wrapped function.
+
+    Coroutine functions are timed until the awaited call completes.
+    """
+    in_flight = (service,)
+    ok = (service, operation, 'ok')
+    error = (service, operation, 'error')
+
+    def decorator(fn: Callable) -> Callable:
+        if inspect.iscoroutinefunction(fn):
+            @wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                external_in_flight.inc(in_flight)
+                started = time.perf_counter()
+                labels = error
+                try:
+                    result = await fn(*args, **kwargs)
+                    labels = ok
+                    return result
+                finally:
+                    elapsed = time.perf_counter() - started
+                    external_latency.observe(elapsed, labels)
+                    external_in_flight.dec(in_flight)
+                    add_span(service, f'{operation} ({labels[2]})', started, elapsed)
+
+            return async_wrapper
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            external_in_flight.inc(in_flight)
+            started = time.perf_counter()
+            labels = error
+            try:
+                result = fn(*args, **kwargs)
+                labels = ok
+                return result
+            finally:
+                elapsed = time.perf_counter() - started
+                external_latency.observe(elapsed, labels)
+                external_in_flight.dec(in_flight)
+                add_span(service, f'{operation} ({labels[2]})', started, elapsed)
+
+        return wrapper
+
+    return decorator
+
+
+# -- SQLAlchemy hooks ----------------------------------------------------------
+
+# [query count, query seconds] of the request being served on this thread.
+_request_sql: ContextVar[Optional[List[Any]]] = ContextVar('carenotes_request_sql', default=None)
+
+
+def instrument_sql(engine: Engine, name: str) -> None:
+    labels = (name,)
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._metrics_started = time.perf_counter()
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, '_metrics_started', None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        db_queries.inc(labels)
+        db_query_time.observe(elapsed, labels)
+        state = _request_sql.get()
+        if state is not None:
+            state[0] += 1
+            state[1] += elapsed
+        add_span('db', statement, started, elapsed)
+
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', after_cursor_execute)
+
+
+# -- request timing ------------------------------------------------------------
+
+class RequestObservation:
+    """Timing and SQL counters of one request, from construction to ``finish()``."""
+
+    __slots__ = ('method', 'endpoint', 'status', 'sql', 'started', '_token')
+
+    def __init__(self, method: str, endpoint: str = 'unmatched') -> None:
+        self.method = method
+        self.endpoint = endpoint
+        self.status = '500'
+        self.sql = [0, 0.0]
+        self._token = _request_sql.set(self.sql)
+        http_in_flight.inc()
+        self.started = time.perf_counter()
+
+    def finish(self) -> None:
+        elapsed = time.perf_counter() - self.started
+        _request_sql.reset(self._token)
+        http_in_flight.dec()
+        http_requests.inc((self.method, self.endpoint, self.status))
+        http_latency.observe(elapsed, (self.method, self.endpoint))
+        request_queries.observe(self.sql[0], (self.endpoint,))
+        request_db_time.observe(self.sql[1], (self.endpoint,))
+
+
+class RequestMetricsMiddleware:
+    """WSGI wrapper around ``app.wsgi_app`` that times each request.
+
+    Working on the WSGI level avoids three Flask hook dispatches and the
+    ``g``/``request`` proxy lookups they would need. The endpoint label is the
+    matched URL rule, so path parameters don't multiply the series; it is read
+    in ``start_response``, while Flask still has the request object in the
+    environ. For streamed responses the duration ends when the body starts
+    streaming.
+    """
+
+    def __init__(self, wsgi_app: Callable) -> None:
+        self.wsgi_app = wsgi_app
+
+    def __call__(self, environ: Dict[str, Any], start_response: Callable) -> Any:
+        observation = RequestObservation(environ.get('REQUEST_METHOD', 'GET'))
+
+        def _start_response(status_line: str, headers: Any, exc_info: Any = None) -> Any:
+            observation.status = status_line[:3]
+            rule = getattr(environ.get('werkzeug.request'), 'url_rule', None)
+            if rule is not None:
+                observation.endpoint = rule.rule
+            return start_response(status_line, headers, exc_info)
+
+        try:
+            return self.wsgi_app(environ, _start_response)
+        finally:
+            observation.finish()
+
+
+def _authorized() -> bool:
+    if settings.METRICS_TOKEN:
+        header = request.headers.get('Authorization', '')
+        return header.startswith('Bearer ') and hmac.compare_digest(header[7:].strip(), settings.METRICS_TOKEN)
+    # Without a scrape token the route is only served behind the app's admin
+    # guard (which sets ``g.current_user``) or when METRICS_PUBLIC opts out.
+    return settings.METRICS_PUBLIC or g.get('current_user') is not None
+
+
+def render_metrics() -> Response:
+    if not _authorized():
+        return Response('unauthorized\n', status=401, mimetype='text/plain')
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+
+def instrument_app(
+    app: Flask,
+    engines: Optional[Dict[Optional[str], Engine]] = None,
+    guard: Optional[Callable[[Callable], Callable]] = None,
+) -> None:
+    """Request timing middleware, SQL hooks for ``engines`` and the ``/metrics`` route.
+
+    ``guard`` wraps the route when neither METRICS_TOKEN nor METRICS_PUBLIC is
+    set (the app passes ``token_required('admin')``); with none of the three
+    the route answers 401.
+    """
+    app.wsgi_app = RequestMetricsMiddleware(app.wsgi_app)
+    for key, engine in (engines or {}).items():
+        instrument_sql(engine, key or 'primary')
+    view = render_metrics
+    if guard is not None and not settings.METRICS_TOKEN and not settings.METRICS_PUBLIC:
+        view = guard(render_metrics)
+    app.add_url_rule('/metrics', 'metrics', view, methods=['GET'])
+
+
+__all__ = [
+    'Counter',
+    'Gauge',
+    'Histogram',
+    'Registry',
+    'RequestMetricsMiddleware',
+    'RequestObservation',
+    'dict_collector',
+    'instrument_app',
+    'instrument_sql',
+    'registry',
+    'render_metrics',
+    'timed_call',
+]
@@ -0,0 +1,199 @@
+from __future__ import annotations
+
+import argparse
+import hashlib
+import re
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+
+if __package__ in {None, ''}:  # allow running via `python backend/migrate.py`
+    project_root = Path(__file__).resolve().parent.parent
+    project_root_str = str(project_root)
+    if project_root_str not in sys.path:
+        sys.path.insert(0, project_root_str)
+    __package__ = 'backend'
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+from .config import settings
+from .db import make_engine
+
+
+MIGRATIONS_DIR = Path(__file__).resolve().parent / 'migrations'
+BASELINE_SCHEMA = MIGRATIONS_DIR / 'schema.sql'
+VERSION_TABLE = 'schema_migrations'
+STEP_TABLE = 'schema_migration_steps'
+
+_FILENAME_RE = re.compile(r'^(\d{4})_([a-z0-9_]+)\.sql$')
+
+
+@dataclass(slots=True)
+class Migration:
+    version: int
+    name: str
+    path: Path
+
+    def statements(self) -> List[str]:
+        return split_statements(self.path.read_text(encoding='utf-8-sig'))
+
+
+def split_statements(sql: str) -> List[str]:
+    statements: List[str] = []
+    buffer: List[str] = []
+    for line in sql.splitlines():
+        stripped = line.strip()
+        if not stripped or stripped.startswith('--'):
+            continue
+        buffer.append(line)
+        if stripped.endswith(';'):
+            statements.append('\n'.join(buffer).rstrip().rstrip(';'))
+            buffer = []
+    if buffer:
+        statements.append('\n'.join(buffer).rstrip())
+    return statements
+
+
+def discover_migrations(directory: Path = MIGRATIONS_DIR) -> List[Migration]:
+    migrations: List[Migration] = []
+    seen = set()
+    for path in sorted(directory.glob('*.sql')):
+        match = _FILENAME_RE.match(path.name)
+        if not match:
+            continue
+        version = int(match.group(1))
+        if version in seen:
+            raise RuntimeError(f'duplicate_migration_version: {version}')
+        seen.add(version)
+        migrations.append(Migration(version=version, name=match.group(2), path=path))
+    return migrations
+
+
+def _ensure_version_table(conn: Connection) -> None:
+    conn.execute(text(
+        f'CREATE TABLE IF NOT EXISTS {VERSION_TABLE} ('
+        '  version INT PRIMARY KEY,'
+        '  name VARCHAR(128) NOT NULL,'
+        '  applied_at DATETIME DEFAULT CURRENT_TIMESTAMP'
+        ') ENGINE=InnoDB DEFAULT CHARSET=utf8mb4'
+    ))
+
+
+def _ensure_step_table(conn: Connection) -> None:
+    conn.execute(text(
+        f'CREATE TABLE IF NOT EXISTS {STEP_TABLE} ('
+        '  version INT NOT NULL,'
+        '  step INT NOT NULL,'
+        '  digest CHAR(40) NOT NULL,'
+        '  applied_at DATETIME DEFAULT CURRENT_TIMESTAMP,'
+        '  PRIMARY KEY (version, step)'
+        ') ENGINE=InnoDB DEFAULT CHARSET=utf8mb4'
+    ))
+
+
+def _statement_digest(statement: str) -> str:
+    return hashlib.sha1(statement.encode('utf-8')).hexdigest()
+
+
+def _applied_steps(engine: Engine, version: int) -> Dict[int, str]:
+    with engine.begin() as conn:
+        _ensure_step_table(conn)
+        rows = conn.execute(text(f'SELECT step, digest FROM {STEP_TABLE} WHERE version = :version'),
+                            {'version': version})
+        return {step: digest for step, digest in rows}
+
+
+def applied_versions(engine: Engine) -> List[int]:
+    with engine.begin() as conn:
+        _ensure_version_table(conn)
+        rows = conn.execute(text(f'SELECT version FROM {VERSION_TABLE} ORDER BY version'))
+        return [row[0] for row in rows]
+
+
+def upgrade(engine: Engine, *, target: Optional[int] = None) -> List[Migration]:
+    """Apply the baseline schema and every pending numbered migration."""
+    with engine.begin() as conn:
+        for statement in split_statements(BASELINE_SCHEMA.read_text(encoding='utf-8-sig')):
+            conn.execute(text(statement))
+
+    done = set(applied_versions(engine))
+    applied: List[Migration] = []
+    for migration in discover_migrations():
+        if migration.version in done:
+            continue
+        if target is not None and migration.version > target:
+            break
+        _apply(engine, migration)
+        applied.append(migration)
+    return applied
+
+
+def _apply(engine: Engine, migration: Migration) -> None:
+    """Run one migration statement by statement, resuming after the last one that succeeded.
+
+    MySQL commits each DDL statement on its own, so a migration that fails
+    halfway cannot be rolled back, and re-running it from the top fails on
+    the first CREATE INDEX or ADD COLUMN that already went through. Each
+    statement is therefore recorded in STEP_TABLE as it completes. A DML
+    statement is recorded in the same transaction as its own effect. A re-run
+    skips the recorded statements and retries from the failed one. The
+    version row replaces the step rows once every statement has run.
+    """
+    done = _applied_steps(engine, migration.version)
+    for step, statement in enumerate(migration.statements()):
+        digest = _statement_digest(statement)
+        if step in done:
+            if done[step] != digest:
+                raise RuntimeError(
+                    f'migration_changed: {migration.path.name} statement {step + 1} was edited after it was applied'
+                )
+            continue
+        with engine.begin() as conn:
+            conn.execute(text(statement))
+            conn.execute(
+                text(f'INSERT INTO {STEP_TABLE} (version, step, digest) VALUES (:version, :step, :digest)'),
+                {'version': migration.version, 'step': step, 'digest': digest},
+            )
+    with engine.begin() as conn:
+        conn.execute(
+            text(f'INSERT INTO {VERSION_TABLE} (version, name) VALUES (:version, :name)'),
+            {'version': migration.version, 'name': migration.name},
+        )
+        conn.execute(text(f'DELETE FROM {STEP_TABLE} WHERE version = :version'), {'version': migration.version})
+
+
+def status(engine: Engine) -> List[tuple[Migration, bool]]:
+    done = set(applied_versions(engine))
+    return [(migration, migration.version in done) for migration in discover_migrations()]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='CareNotes schema migrations')
+    parser.add_argument('--url', default=None, help='database URL (defaults to MYSQL_URL)')
+    sub = parser.add_subparsers(dest='command', required=True)
+    up = sub.add_parser('upgrade', help='apply pending migrations')
+    up.add_argument('--target', type=int, default=None, help='stop after this version')
+    sub.add_parser('status', help='list migrations and whether they are applied')
+    args = parser.parse_args(argv)
+
+    engine = make_engine(args.url or settings.MYSQL_URL)
+    try:
+        if args.command == 'upgrade':
+            applied = upgrade(engine, target=args.target)
+            for migration in applied:
+                print(f'applied {migration.version:04d}_{migration.name}')
+            if not applied:
+                print('schema up to date')
+        else:
+            for migration, is_applied in status(engine):
+                marker = 'x' if is_applied else ' '
+                print(f'[{marker}] {migration.version:04d}_{migration.name}')
+    finally:
+        engine.dispose()
+    return 0
+
+
+if __name__ == '__main__':  # pragma: no cover
+    sys.exit(main())
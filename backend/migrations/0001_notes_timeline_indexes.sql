@@ -0,0 +1,5 @@
+-- notes: timeline reads (patient_id + created_at range, keyset on id)
+CREATE INDEX ix_notes_patient_created ON notes (patient_id, created_at, id);
+
+-- notes: signed-only timeline filter
+CREATE INDEX ix_notes_patient_signed ON notes (patient_id, signed, created_at);
@@ -0,0 +1,2 @@
+-- audit_events: history lookups by entity
+CREATE INDEX ix_audit_events_entity ON audit_events (entity, entity_id, at);
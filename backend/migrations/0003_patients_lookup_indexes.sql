@@ -0,0 +1,3 @@
+-- patients: MRN lookup and ward/bed census
+CREATE INDEX ix_patients_mrn ON patients (mrn);
+CREATE INDEX ix_patients_ward_bed ON patients (ward, bed);
@@ -0,0 +1,33 @@
+-- patient_latest_state: per-patient summary maintained on every note write
+CREATE TABLE IF NOT EXISTS patient_latest_state (
+  patient_id INT PRIMARY KEY,
+  ward VARCHAR(64),
+  bed VARCHAR(32),
+  last_note_id INT,
+  last_note_at DATETIME,
+  latest_vitals JSON,
+  latest_alerts JSON,
+  unsigned_count INT NOT NULL DEFAULT 0,
+  updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  FOREIGN KEY (patient_id) REFERENCES patients(id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE INDEX ix_patient_latest_state_ward_bed ON patient_latest_state (ward, bed);
+
+-- backfill from existing rows
+INSERT INTO patient_latest_state (patient_id, ward, bed, unsigned_count)
+SELECT p.id, p.ward, p.bed,
+       (SELECT COUNT(*) FROM notes n WHERE n.patient_id = p.id AND n.signed = 0)
+FROM patients p;
+
+UPDATE patient_latest_state s
+JOIN notes n ON n.id = (
+  SELECT n2.id FROM notes n2
+  WHERE n2.patient_id = s.patient_id
+  ORDER BY n2.created_at DESC, n2.id DESC
+  LIMIT 1
+)
+SET s.last_note_id = n.id,
+    s.last_note_at = n.created_at,
+    s.latest_vitals = n.vitals,
+    s.latest_alerts = n.alerts;
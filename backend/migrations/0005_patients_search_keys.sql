@@ -0,0 +1,11 @@
+-- patient type-ahead search: normalized name and pinyin-initials keys, populated at write time
+ALTER TABLE patients
+  ADD COLUMN search_name VARCHAR(100) NULL,
+  ADD COLUMN name_initials VARCHAR(100) NULL;
+
+CREATE INDEX ix_patients_search_name ON patients (search_name);
+CREATE INDEX ix_patients_name_initials ON patients (name_initials);
+
+-- best-effort SQL backfill; `python -m backend.scripts.backfill_patient_search_keys`
+-- recomputes both keys with the application's normalization
+UPDATE patients SET search_name = LOWER(TRIM(name)) WHERE search_name IS NULL;
@@ -0,0 +1,18 @@
+-- notes: typed vitals columns, dual-written by the application alongside notes.vitals.
+-- MySQL 8 adds trailing nullable columns with ALGORITHM=INSTANT (metadata only).
+ALTER TABLE notes
+  ADD COLUMN temp DECIMAL(4,1) NULL,
+  ADD COLUMN hr SMALLINT NULL,
+  ADD COLUMN rr SMALLINT NULL,
+  ADD COLUMN bp_sys SMALLINT NULL,
+  ADD COLUMN bp_dia SMALLINT NULL,
+  ADD COLUMN spo2 SMALLINT NULL;
+
+-- vital range + time window lookups; built online without blocking writes.
+-- Existing rows are filled by `python -m backend.scripts.backfill_note_vitals`.
+CREATE INDEX ix_notes_temp_created ON notes (temp, created_at) ALGORITHM=INPLACE LOCK=NONE;
+CREATE INDEX ix_notes_hr_created ON notes (hr, created_at) ALGORITHM=INPLACE LOCK=NONE;
+CREATE INDEX ix_notes_rr_created ON notes (rr, created_at) ALGORITHM=INPLACE LOCK=NONE;
+CREATE INDEX ix_notes_bp_sys_created ON notes (bp_sys, created_at) ALGORITHM=INPLACE LOCK=NONE;
+CREATE INDEX ix_notes_bp_dia_created ON notes (bp_dia, created_at) ALGORITHM=INPLACE LOCK=NONE;
+CREATE INDEX ix_notes_spo2_created ON notes (spo2, created_at) ALGORITHM=INPLACE LOCK=NONE;
@@ -0,0 +1,8 @@
+-- revoked_tokens: logouts shared by every worker (polled by each process)
+CREATE TABLE IF NOT EXISTS revoked_tokens (
+  jti VARCHAR(64) PRIMARY KEY,
+  expires_at DOUBLE NOT NULL,
+  revoked_at DOUBLE NOT NULL
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE INDEX ix_revoked_tokens_revoked_at ON revoked_tokens (revoked_at);
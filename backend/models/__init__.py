@@ -2,5 +2,7 @@
 from .encounter import Encounter
 from .note import Note
 from .audit import AuditEvent
+from .ward_state import PatientLatestState
+from .revoked_token import RevokedToken
 
-__all__ = ['Patient', 'Encounter', 'Note', 'AuditEvent']
+__all__ = ['Patient', 'Encounter', 'Note', 'AuditEvent', 'PatientLatestState', 'RevokedToken']
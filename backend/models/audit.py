@@ -1,43 +1,39 @@
 ﻿from __future__ import annotations
 
-import json
-from datetime import datetime
 from typing import Any, Dict, Optional
 
 from sqlalchemy.sql import func
 
 from ..db import db
+from ..serialization import Field, Schema, dump_json, id_str, isoformat, load_json
 
 
-def _isoformat(value: datetime | None) -> str | None:
-    if value is None:
-        return None
-    if value.tzinfo is None:
-        return value.replace(tzinfo=None).isoformat(timespec='seconds') + 'Z'
-    return value.astimezone().isoformat(timespec='seconds')
+AUDIT_SCHEMA = Schema([
+    Field('id', id_str),
+    Field('user'),
+    Field('action'),
+    Field('entity'),
+    Field('entity_id', id_str),
+    Field('at', isoformat),
+    Field('diff_json', load_json),
+])
 
 
-def _load_json(value: Any) -> Any:
-    if value is None:
-        return None
-    if isinstance(value, (dict, list)):
-        return value
-    try:
-        return json.loads(value)
-    except (TypeError, ValueError):
-        return value
-
-
-def _dump_json(value: Any) -> Any:
-    if value in (None, ''):
-        return None
-    if isinstance(value, (dict, list)):
-        return json.dumps(value)
-    return value
+def audit_row(*, user: Optional[str], action: str, entity: str, entity_id: Optional[int], diff: Any = None) -> Dict[str, Any]:
+    return {
+        'user': user,
+        'action': action,
+        'entity': entity,
+        'entity_id': entity_id,
+        'diff_json': dump_json(diff),
+    }
 
 
 class AuditEvent(db.Model):
     __tablename__ = 'audit_events'
+    __table_args__ = (
+        db.Index('ix_audit_events_entity', 'entity', 'entity_id', 'at'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user = db.Column(db.String(100))
@@ -48,18 +44,10 @@ class AuditEvent(db.Model):
     diff_json = db.Column(db.JSON)
 
     def to_dict(self) -> Dict[str, Any]:
-        return {
-            'id': str(self.id) if self.id is not None else None,
-            'user': self.user,
-            'action': self.action,
-            'entity': self.entity,
-            'entity_id': str(self.entity_id) if self.entity_id is not None else None,
-            'at': _isoformat(self.at),
-            'diff_json': _load_json(self.diff_json),
-        }
+        return AUDIT_SCHEMA.dump(self)
 
     def set_diff(self, value: Optional[Any]) -> None:
-        self.diff_json = _dump_json(value)
+        self.diff_json = dump_json(value)
 
     def __repr__(self) -> str:  # pragma: no cover
         return f'<AuditEvent id={self.id} entity={self.entity}>'
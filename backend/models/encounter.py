@@ -1,19 +1,19 @@
 ﻿from __future__ import annotations
 
-from datetime import datetime
 from typing import Any, Dict
 
 from sqlalchemy.sql import func
 
 from ..db import db
+from ..serialization import Field, Schema, id_str, isoformat
 
 
-def _isoformat(value: datetime | None) -> str | None:
-    if value is None:
-        return None
-    if value.tzinfo is None:
-        return value.replace(tzinfo=None).isoformat(timespec='seconds') + 'Z'
-    return value.astimezone().isoformat(timespec='seconds')
+ENCOUNTER_SCHEMA = Schema([
+    Field('id', id_str),
+    Field('patient_id', id_str),
+    Field('admit_time', isoformat),
+    Field('attending'),
+])
 
 
 class Encounter(db.Model):
@@ -29,12 +29,7 @@ class Encounter(db.Model):
     notes = db.relationship('Note', back_populates='encounter')
 
     def to_dict(self) -> Dict[str, Any]:
-        return {
-            'id': str(self.id) if self.id is not None else None,
-            'patient_id': str(self.patient_id) if self.patient_id is not None else None,
-            'admit_time': _isoformat(self.admit_time),
-            'attending': self.attending,
-        }
+        return ENCOUNTER_SCHEMA.dump(self)
 
     def __repr__(self) -> str:  # pragma: no cover - repr utility
         return f'<Encounter id={self.id} patient_id={self.patient_id}>'
@@ -1,43 +1,92 @@
 ﻿from __future__ import annotations
 
-import json
-from datetime import datetime
+import math
 from typing import Any, Dict, Optional
 
+from sqlalchemy import String, cast
 from sqlalchemy.sql import func
+from sqlalchemy.sql.elements import ColumnElement
 
 from ..db import db
+from ..serialization import Field, Schema, boolean, dump_json, id_str, isoformat, json_or, load_json
 
 
-def _isoformat(value: datetime | None) -> str | None:
-    if value is None:
-        return None
-    if value.tzinfo is None:
-        return value.replace(tzinfo=None).isoformat(timespec='seconds') + 'Z'
-    return value.astimezone().isoformat(timespec='seconds')
+# Typed copies of the vitals JSON, kept in step by set_json_fields (dual write)
+# and scripts/backfill_note_vitals for rows written before migration 0006.
+VITAL_COLUMNS = ('temp', 'hr', 'rr', 'bp_sys', 'bp_dia', 'spo2')
+_SMALLINT_MAX = 32767
+
+
+def _empty_vitals() -> Dict[str, Any]:
+    return {name: None for name in VITAL_COLUMNS}
 
 
-def _load_json(value: Any) -> Any:
-    if value is None:
+def _vital_value(name: str, value: Any) -> float | int | None:
+    if value in (None, '') or isinstance(value, bool):
         return None
-    if isinstance(value, (dict, list)):
-        return value
     try:
-        return json.loads(value)
+        number = float(value)
     except (TypeError, ValueError):
-        return value
-
-
-def _dump_json(value: Any) -> Any:
-    if value in (None, ''):
         return None
-    if isinstance(value, (dict, list)):
-        return json.dumps(value)
-    return value
+    if not math.isfinite(number):  # NaN, or inf, which int() cannot take
+        return None
+    if name == 'temp':
+        number = round(number, 1)
+        return number if -1000 < number < 1000 else None
+    number = int(round(number))
+    return number if 0 <= number <= _SMALLINT_MAX else None
+
+
+def typed_vitals(vitals: Any) -> Dict[str, float | int | None]:
+    """Column values for a vitals payload (dict or stored JSON text)."""
+    data = load_json(vitals)
+    if not isinstance(data, dict):
+        data = {}
+    return {name: _vital_value(name, data.get(name)) for name in VITAL_COLUMNS}
+
+
+# Text forms of an empty list/missing value in a JSON column: dump_json stores
+# JSON text, so the column usually holds a JSON *string* ("[]"), whose
+# JSON_LENGTH on MySQL is 1 however empty the list inside it is.
+_EMPTY_JSON_TEXT = ('"[]"', '[]', 'null', '""')
+
+
+def has_json_items(column: Any) -> ColumnElement:
+    """SQL predicate: a JSON list column (``alerts``) holds at least one item.
+
+    Compares the column's text form, which reads the same on MySQL and SQLite
+    for both double-encoded and native JSON arrays.
+    """
+    return cast(column, String).notin_(_EMPTY_JSON_TEXT)
+
+
+NOTE_SCHEMA = Schema([
+    Field('id', id_str),
+    Field('patient_id', id_str),
+    Field('encounter_id', id_str),
+    Field('created_at', isoformat),
+    Field('vitals', json_or(_empty_vitals)),
+    Field('pain_score'),
+    Field('intake_ml'),
+    Field('output_ml'),
+    Field('subjective'),
+    Field('objective'),
+    Field('assessment'),
+    Field('plan'),
+    Field('med_given', json_or(list)),
+    Field('alerts', json_or(list)),
+    Field('signed', boolean),
+    Field('transcript'),
+])
 
 
 class Note(db.Model):
     __tablename__ = 'notes'
+    __table_args__ = (
+        db.Index('ix_notes_patient_created', 'patient_id', 'created_at', 'id'),
+        db.Index('ix_notes_patient_signed', 'patient_id', 'signed', 'created_at'),
+        *(db.Index(f'ix_notes_{name}_created', name, 'created_at') for name in VITAL_COLUMNS),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     patient_id = db.Column(db.Integer, db.ForeignKey('patients.id'), nullable=False)
@@ -55,44 +104,28 @@ class Note(db.Model):
     alerts = db.Column(db.JSON)
     signed = db.Column(db.Integer, default=0)
     transcript = db.Column(db.Text)
+    temp = db.Column(db.Numeric(4, 1, asdecimal=False))
+    hr = db.Column(db.SmallInteger)
+    rr = db.Column(db.SmallInteger)
+    bp_sys = db.Column(db.SmallInteger)
+    bp_dia = db.Column(db.SmallInteger)
+    spo2 = db.Column(db.SmallInteger)
 
     patient = db.relationship('Patient', back_populates='notes')
     encounter = db.relationship('Encounter', back_populates='notes')
 
     def to_dict(self) -> Dict[str, Any]:
-        return {
-            'id': str(self.id) if self.id is not None else None,
-            'patient_id': str(self.patient_id) if self.patient_id is not None else None,
-            'encounter_id': str(self.encounter_id) if self.encounter_id is not None else None,
-            'created_at': _isoformat(self.created_at),
-            'vitals': _load_json(self.vitals) or {
-                'temp': None,
-                'hr': None,
-                'rr': None,
-                'bp_sys': None,
-                'bp_dia': None,
-                'spo2': None,
-            },
-            'pain_score': self.pain_score,
-            'intake_ml': self.intake_ml,
-            'output_ml': self.output_ml,
-            'subjective': self.subjective,
-            'objective': self.objective,
-            'assessment': self.assessment,
-            'plan': self.plan,
-            'med_given': _load_json(self.med_given) or [],
-            'alerts': _load_json(self.alerts) or [],
-            'signed': bool(self.signed),
-            'transcript': self.transcript,
-        }
+        return NOTE_SCHEMA.dump(self)
 
     def set_json_fields(self, *, vitals: Optional[Any] = None, med_given: Optional[Any] = None, alerts: Optional[Any] = None) -> None:
         if vitals is not None:
-            self.vitals = _dump_json(vitals)
+            self.vitals = dump_json(vitals)
+            for name, value in typed_vitals(vitals).items():
+                setattr(self, name, value)
         if med_given is not None:
-            self.med_given = _dump_json(med_given)
+            self.med_given = dump_json(med_given)
         if alerts is not None:
-            self.alerts = _dump_json(alerts)
+            self.alerts = dump_json(alerts)
 
     def __repr__(self) -> str:  # pragma: no cover - repr utility
         return f'<Note id={self.id} patient_id={self.patient_id}>'
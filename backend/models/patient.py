@@ -1,23 +1,96 @@
 ﻿from __future__ import annotations
 
-from datetime import date, datetime
+import re
+import unicodedata
 from typing import Any, Dict
 
+from sqlalchemy.orm import validates
 from sqlalchemy.sql import func
 
 from ..db import db
+from ..lazy import optional_import
+from ..serialization import Field, Schema, date_iso, id_str, isoformat
 
 
-def _isoformat(value: datetime | None) -> str | None:
-    if value is None:
-        return None
-    if value.tzinfo is None:
-        return value.replace(tzinfo=None).isoformat(timespec='seconds') + 'Z'
-    return value.astimezone().isoformat(timespec='seconds')
+_WHITESPACE_RE = re.compile(r'\s+')
+
+# GB2312 level-1 hanzi are ordered by pinyin, so the first letter can be read
+# off the GBK code point: (first code point of the letter, letter).
+_GB2312_INITIALS = (
+    (0xB0A1, 'a'), (0xB0C5, 'b'), (0xB2C1, 'c'), (0xB4EE, 'd'), (0xB6EA, 'e'),
+    (0xB7A2, 'f'), (0xB8C1, 'g'), (0xB9FE, 'h'), (0xBBF7, 'j'), (0xBFA6, 'k'),
+    (0xC0AC, 'l'), (0xC2E8, 'm'), (0xC4C3, 'n'), (0xC5B6, 'o'), (0xC5BE, 'p'),
+    (0xC6DA, 'q'), (0xC8BB, 'r'), (0xC8F6, 's'), (0xCBFA, 't'), (0xCDDA, 'w'),
+    (0xCEF4, 'x'), (0xD1B9, 'y'), (0xD4D1, 'z'),
+)
+_GB2312_LEVEL1_END = 0xD7F9
+
+
+def normalize_search_text(value: str | None) -> str:
+    """NFKC-fold, lowercase and collapse whitespace for prefix matching."""
+    if not value:
+        return ''
+    folded = unicodedata.normalize('NFKC', value).lower()
+    return _WHITESPACE_RE.sub(' ', folded).strip()
+
+
+def _hanzi_initial(char: str) -> str:
+    try:
+        encoded = char.encode('gbk')
+    except UnicodeEncodeError:
+        return ''
+    if len(encoded) != 2:
+        return ''
+    code = encoded[0] << 8 | encoded[1]
+    if not _GB2312_INITIALS[0][0] <= code < _GB2312_LEVEL1_END:
+        return ''
+    letter = ''
+    for start, initial in _GB2312_INITIALS:
+        if code < start:
+            break
+        letter = initial
+    return letter
+
+
+def name_initials(value: str | None) -> str:
+    """Type-ahead key: pinyin initials for hanzi, ASCII letters/digits kept as-is.
+
+    ``'张三'`` -> ``'zs'``, ``'John Li'`` -> ``'johnli'``.
+    """
+    normalized = normalize_search_text(value)
+    # optional: exact pinyin for rare characters outside GB2312 level 1;
+    # its dictionaries are loaded on the first write, not with the models.
+    pypinyin = optional_import('pypinyin')
+    if pypinyin is not None:
+        parts = pypinyin.lazy_pinyin(normalized, style=pypinyin.Style.FIRST_LETTER, errors=lambda chars: list(chars))
+        return ''.join(part for part in parts if part.isascii() and part.isalnum())
+    return ''.join(
+        char if char.isascii() else _hanzi_initial(char)
+        for char in normalized
+        if char.isalnum()
+    )
+
+
+PATIENT_SCHEMA = Schema([
+    Field('id', id_str),
+    Field('name'),
+    Field('gender'),
+    Field('dob', date_iso),
+    Field('mrn'),
+    Field('ward'),
+    Field('bed'),
+    Field('created_at', isoformat),
+])
 
 
 class Patient(db.Model):
     __tablename__ = 'patients'
+    __table_args__ = (
+        db.Index('ix_patients_mrn', 'mrn'),
+        db.Index('ix_patients_ward_bed', 'ward', 'bed'),
+        db.Index('ix_patients_search_name', 'search_name'),
+        db.Index('ix_patients_name_initials', 'name_initials'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
@@ -26,23 +99,21 @@ class Patient(db.Model):
     mrn = db.Column(db.String(64))
     ward = db.Column(db.String(64))
     bed = db.Column(db.String(32))
+    search_name = db.Column(db.String(100))
+    name_initials = db.Column(db.String(100))
     created_at = db.Column(db.DateTime, server_default=func.now())
 
     encounters = db.relationship('Encounter', back_populates='patient', cascade='all, delete-orphan')
     notes = db.relationship('Note', back_populates='patient', cascade='all, delete-orphan')
 
+    @validates('name')
+    def _refresh_search_keys(self, key: str, value: str) -> str:
+        self.search_name = normalize_search_text(value)[:100]
+        self.name_initials = name_initials(value)[:100]
+        return value
+
     def to_dict(self) -> Dict[str, Any]:
-        dob_value = self.dob.isoformat() if isinstance(self.dob, date) else None
-        return {
-            'id': str(self.id) if self.id is not None else None,
-            'name': self.name,
-            'gender': self.gender,
-            'dob': dob_value,
-            'mrn': self.mrn,
-            'ward': self.ward,
-            'bed': self.bed,
-            'created_at': _isoformat(self.created_at),
-        }
+        return PATIENT_SCHEMA.dump(self)
 
     def __repr__(self) -> str:  # pragma: no cover - repr utility
         return f'<Patient id={self.id} name={self.name!r}>'
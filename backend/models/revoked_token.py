@@ -0,0 +1,17 @@
+from __future__ import annotations
+
+from ..db import db
+
+
+class RevokedToken(db.Model):
+    """Revoked token ``jti`` values, shared by every worker through the primary database."""
+
+    __tablename__ = 'revoked_tokens'
+    __table_args__ = (
+        db.Index('ix_revoked_tokens_revoked_at', 'revoked_at'),
+    )
+
+    jti = db.Column(db.String(64), primary_key=True)
+    # Epoch seconds, as in the token's own ``exp`` claim.
+    expires_at = db.Column(db.Float, nullable=False)
+    revoked_at = db.Column(db.Float, nullable=False)
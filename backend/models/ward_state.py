@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Any, Dict
+
+from sqlalchemy.sql import func
+
+from ..db import db
+from ..serialization import Field, Schema, id_str, isoformat, json_or, load_json
+
+
+WARD_STATE_SCHEMA = Schema([
+    Field('patient_id', id_str),
+    Field('ward'),
+    Field('bed'),
+    Field('last_note_id', id_str),
+    Field('last_note_at', isoformat),
+    Field('latest_vitals', load_json),
+    Field('latest_alerts', json_or(list)),
+    Field('unsigned_count', lambda value: value or 0),
+])
+
+
+class PatientLatestState(db.Model):
+    """Materialized per-patient summary backing the ward dashboard."""
+
+    __tablename__ = 'patient_latest_state'
+    __table_args__ = (
+        db.Index('ix_patient_latest_state_ward_bed', 'ward', 'bed'),
+    )
+
+    patient_id = db.Column(db.Integer, db.ForeignKey('patients.id'), primary_key=True)
+    ward = db.Column(db.String(64))
+    bed = db.Column(db.String(32))
+    last_note_id = db.Column(db.Integer)
+    last_note_at = db.Column(db.DateTime)
+    latest_vitals = db.Column(db.JSON)
+    latest_alerts = db.Column(db.JSON)
+    unsigned_count = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, server_default=func.now(), onupdate=func.now())
+
+    def is_newer(self, created_at: datetime | None, note_id: int) -> bool:
+        if self.last_note_id is None or created_at is None or self.last_note_at is None:
+            return True
+        return (created_at, note_id) >= (self.last_note_at, self.last_note_id)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return WARD_STATE_SCHEMA.dump(self)
+
+    def __repr__(self) -> str:  # pragma: no cover - repr utility
+        return f'<PatientLatestState patient_id={self.patient_id} ward={self.ward!r}>'
@@ -0,0 +1,292 @@
+from __future__ import annotations
+
+import cProfile
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from contextvars import ContextVar
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from .config import settings
+
+
+logger = logging.getLogger(__name__)
+
+MAX_SPANS = 200
+MAX_STACK_DEPTH = 64
+STATEMENT_PREFIX = 160
+# Reading the captures must not rotate them away.
+_NOT_CAPTURED = ('/debug/', '/metrics')
+
+
+class RequestTrace:
+    """Stage timings of one request, filled in by the SQL and external-call hooks."""
+
+    __slots__ = ('started', 'stages', 'spans', 'statements', 'samples', 'dropped_spans')
+
+    def __init__(self, started: float) -> None:
+        self.started = started
+        # stage -> [count, seconds]
+        self.stages: Dict[str, List[float]] = {}
+        # (offset ms, duration ms, stage, label)
+        self.spans: List[Tuple[float, float, str, str]] = []
+        # statement prefix -> [count, seconds]; repeated prefixes point at N+1 loops
+        self.statements: Dict[str, List[float]] = {}
+        self.samples: Counter = Counter()
+        self.dropped_spans = 0
+
+    def add(self, stage: str, label: str, started: float, elapsed: float) -> None:
+        totals = self.stages.get(stage)
+        if totals is None:
+            totals = self.stages[stage] = [0, 0.0]
+        totals[0] += 1
+        totals[1] += elapsed
+        if stage == 'db':
+            key = ' '.join(label.split())[:STATEMENT_PREFIX]
+            entry = self.statements.get(key)
+            if entry is None:
+                entry = self.statements[key] = [0, 0.0]
+            entry[0] += 1
+            entry[1] += elapsed
+        if len(self.spans) < MAX_SPANS:
+            self.spans.append((
+                round((started - self.started) * 1000.0, 3),
+                round(elapsed * 1000.0, 3),
+                stage,
+                label[:STATEMENT_PREFIX],
+            ))
+        else:
+            self.dropped_spans += 1
+
+
+_current: ContextVar[Optional[RequestTrace]] = ContextVar('carenotes_trace', default=None)
+
+
+def add_span(stage: str, label: str, started: float, elapsed: float) -> None:
+    """Attach a timed stage to the request being traced on this thread, if any."""
+    trace = _current.get()
+    if trace is not None:
+        trace.add(stage, label, started, elapsed)
+
+
+class StackSampler:
+    """One background thread sampling the stacks of threads serving traced requests."""
+
+    def __init__(self, interval: float) -> None:
+        self.interval = interval
+        self._active: Dict[int, RequestTrace] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def register(self, trace: RequestTrace) -> int:
+        ident = threading.get_ident()
+        with self._lock:
+            self._active[ident] = trace
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+                self._thread.start()
+        self._wake.set()
+        return ident
+
+    def unregister(self, ident: int) -> None:
+        with self._lock:
+            self._active.pop(ident, None)
+
+    def _run(self) -> None:
+        while True:
+            # Sampling under the lock: once unregister() returns, the trace is
+            # no longer touched and can be read safely by the request thread.
+            with self._lock:
+                idle = not self._active
+                if idle:
+                    self._wake.clear()
+                else:
+                    frames = sys._current_frames()
+                    for ident, trace in self._active.items():
+                        frame = frames.get(ident)
+                        if frame is not None:
+                            trace.samples[_stack(frame)] += 1
+                    del frames
+            if idle:
+                self._wake.wait()
+            else:
+                time.sleep(self.interval)
+
+
+def _stack(frame: Any) -> str:
+    parts: List[str] = []
+    while frame is not None and len(parts) < MAX_STACK_DEPTH:
+        code = frame.f_code
+        parts.append(f'{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}')
+        frame = frame.f_back
+    # Root first, ';'-separated: the "folded" format flame graph tools read.
+    return ';'.join(reversed(parts))
+
+
+class SlowRequestLog:
+    """Recent slow requests in memory plus their profiles in a rotating directory."""
+
+    def __init__(self, directory: Optional[str], keep: int) -> None:
+        self.directory = Path(directory) if directory else Path(tempfile.gettempdir()) / 'carenotes-profiles'
+        self.keep = keep
+        self._recent: Deque[Dict[str, Any]] = deque(maxlen=keep)
+        self._lock = threading.Lock()
+
+    def add(self, record: Dict[str, Any], profile: Optional[cProfile.Profile], samples: Counter) -> None:
+        try:
+            record['files'] = self._write(record, profile, samples)
+        except OSError:
+            logger.exception('could not write slow request profile %s', record['id'])
+        with self._lock:
+            self._recent.appendleft(record)
+
+    def _write(self, record: Dict[str, Any], profile: Optional[cProfile.Profile], samples: Counter) -> List[str]:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        stem = f"{record['at'].replace(':', '').replace('-', '')}-{record['id']}"
+        files: List[str] = []
+        if profile is not None:
+            path = self.directory / f'{stem}.prof'
+            profile.dump_stats(str(path))
+            files.append(path.name)
+        if samples:
+            path = self.directory / f'{stem}.folded'
+            path.write_text(''.join(f'{stack} {count}\n' for stack, count in samples.most_common()), encoding='utf-8')
+            files.append(path.name)
+        path = self.directory / f'{stem}.json'
+        path.write_text(json.dumps({**record, 'files': files}, ensure_ascii=False, indent=2), encoding='utf-8')
+        files.append(path.name)
+        self._rotate()
+        return files
+
+    def _rotate(self) -> None:
+        # One .json per captured request; drop the oldest captures beyond ``keep``.
+        captures = sorted(self.directory.glob('*.json'), key=lambda path: path.stat().st_mtime_ns)
+        for stale in captures[:-self.keep] if len(captures) > self.keep else ():
+            for path in self.directory.glob(stale.stem + '.*'):
+                path.unlink(missing_ok=True)
+
+    def recent(self, limit: int) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(self._recent)[:limit]
+
+    def find(self, capture_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return next((record for record in self._recent if record['id'] == capture_id), None)
+
+
+class ProfilingMiddleware:
+    """Traces every request and keeps a profile of those slower than ``threshold``.
+
+    ``mode='sample'`` samples the request thread's stack every ``interval``
+    seconds from a background thread (cheap enough to leave on);
+    ``mode='cprofile'`` runs cProfile on the request thread (exact call
+    counts, but several times slower).
+    """
+
+    def __init__(self, wsgi_app: Callable, log: SlowRequestLog, *, threshold: float, mode: str,
+                 interval: float) -> None:
+        if mode not in {'sample', 'cprofile'}:
+            raise ValueError(f'invalid_profile_mode: {mode}')
+        self.wsgi_app = wsgi_app
+        self.log = log
+        self.threshold = threshold
+        self.mode = mode
+        self.sampler = StackSampler(interval) if mode == 'sample' else None
+
+    def __call__(self, environ: Dict[str, Any], start_response: Callable) -> Any:
+        # [status, endpoint]
+        seen = ['500', None]
+
+        def _start_response(status_line: str, headers: Any, exc_info: Any = None) -> Any:
+            seen[0] = status_line[:3]
+            rule = getattr(environ.get('werkzeug.request'), 'url_rule', None)
+            if rule is not None:
+                seen[1] = rule.rule
+            return start_response(status_line, headers, exc_info)
+
+        started = time.perf_counter()
+        trace = RequestTrace(started)
+        token = _current.set(trace)
+        profile = cProfile.Profile() if self.mode == 'cprofile' else None
+        ident = self.sampler.register(trace) if self.sampler is not None else None
+        if profile is not None:
+            try:
+                profile.enable()
+            except ValueError:  # another request on Python 3.12+ already holds the profiler
+                profile = None
+        try:
+            return self.wsgi_app(environ, _start_response)
+        finally:
+            if profile is not None:
+                profile.disable()
+            if ident is not None:
+                self.sampler.unregister(ident)
+            _current.reset(token)
+            elapsed = time.perf_counter() - started
+            if elapsed >= self.threshold and not environ.get('PATH_INFO', '').startswith(_NOT_CAPTURED):
+                self._capture(environ, seen, trace, elapsed, profile)
+
+    def _capture(self, environ: Dict[str, Any], seen: List[Any], trace: RequestTrace, elapsed: float,
+                 profile: Optional[cProfile.Profile]) -> None:
+        accounted = sum(seconds for _count, seconds in trace.stages.values())
+        stages = {stage: {'count': int(count), 'ms': round(seconds * 1000.0, 3)}
+                  for stage, (count, seconds) in trace.stages.items()}
+        stages['other'] = {'count': 0, 'ms': round(max(elapsed - accounted, 0.0) * 1000.0, 3)}
+        statements = sorted(trace.statements.items(), key=lambda item: item[1][1], reverse=True)[:10]
+        record = {
+            'id': uuid.uuid4().hex[:12],
+            'at': datetime.now().isoformat(timespec='seconds'),
+            'method': environ.get('REQUEST_METHOD'),
+            # Path only: query strings can carry patient names.
+            'path': environ.get('PATH_INFO'),
+            'endpoint': seen[1],
+            'status': seen[0],
+            'duration_ms': round(elapsed * 1000.0, 3),
+            'stages': stages,
+            'top_statements': [
+                {'statement': text, 'count': int(count), 'ms': round(seconds * 1000.0, 3)}
+                for text, (count, seconds) in statements
+            ],
+            'spans': [
+                {'offset_ms': offset, 'ms': duration, 'stage': stage, 'label': label}
+                for offset, duration, stage, label in trace.spans
+            ],
+            'dropped_spans': trace.dropped_spans,
+            'stack_samples': sum(trace.samples.values()),
+        }
+        self.log.add(record, profile, trace.samples)
+        logger.warning('slow request %s %s: %.0fms (%s)', record['method'], record['path'], record['duration_ms'],
+                       ', '.join(f"{stage}={data['ms']:.0f}ms" for stage, data in stages.items()))
+
+
+slow_requests = SlowRequestLog(settings.PROFILE_DIR, settings.PROFILE_KEEP)
+
+
+def instrument_app(app: Any) -> None:
+    app.wsgi_app = ProfilingMiddleware(
+        app.wsgi_app,
+        slow_requests,
+        threshold=settings.SLOW_REQUEST_MS / 1000.0,
+        mode=settings.PROFILE_MODE,
+        interval=settings.PROFILE_SAMPLE_MS / 1000.0,
+    )
+
+
+__all__ = [
+    'ProfilingMiddleware',
+    'RequestTrace',
+    'SlowRequestLog',
+    'StackSampler',
+    'add_span',
+    'instrument_app',
+    'slow_requests',
+]
@@ -1,5 +1,6 @@
 ﻿from __future__ import annotations
 
+import threading
 import time
 import uuid
 from dataclasses import dataclass
@@ -7,9 +8,19 @@ from functools import wraps
 from typing import Any, Callable, Dict, Optional, Tuple
 
 import jwt
-from flask import Flask, Response, current_app, g, jsonify, request
+from flask import Blueprint, Flask, Response, current_app, g, request
 
 from ..config import settings
+from ..db import db
+from ..models import RevokedToken
+from ..serialization import Schema, UnknownFieldError, dumps, parse_fields
+from ..services.token_cache import (
+    AuthStats,
+    DatabaseRevocationStore,
+    VerifiedTokenCache,
+    build_revocation_list,
+    token_digest,
+)
 
 
 class APIError(Exception):
@@ -34,7 +45,7 @@ class APIError(Exception):
                 'message': self.message,
             },
         }
-        return jsonify(payload), self.status_code
+        return json_response(payload), self.status_code
 
 
 class UnauthorizedError(APIError):
@@ -67,22 +78,52 @@ class UnprocessableError(APIError):
     message = 'unprocessable'
 
 
+class TooManyRequestsError(APIError):
+    status_code = 429
+    code = 'too_many_requests'
+    message = 'too_many_requests'
+
+
+class ServiceUnavailableError(APIError):
+    status_code = 503
+    code = 'service_unavailable'
+    message = 'service_unavailable'
+
+
 class ServerError(APIError):
     status_code = 500
     code = 'server_error'
     message = 'server_error'
 
 
+def json_response(payload: Any) -> Response:
+    return Response(dumps(payload), mimetype='application/json')
+
+
 def success_response(data: Any = None, *, meta: Optional[Dict[str, Any]] = None, status_code: int = 200):
     payload: Dict[str, Any] = {'ok': True}
     if data is not None:
         payload['data'] = data
     if meta is not None:
         payload['meta'] = meta
-    return jsonify(payload), status_code
+    return json_response(payload), status_code
+
+
+def requested_fields(schema: Schema) -> Optional[Tuple[str, ...]]:
+    """Validate the ``?fields=`` projection against ``schema`` (None = all fields)."""
+    names = parse_fields(request.args.get('fields'))
+    if names is None:
+        return None
+    try:
+        return schema.project(names)
+    except UnknownFieldError as exc:
+        raise APIError(f'unknown_field: {exc}', code='bad_request', status_code=400) from exc
+
+
+TOKEN_TTL_SECONDS = 3600
 
 
-@dataclass(slots=True)
+@dataclass(slots=True, frozen=True)
 class AuthContext:
     username: str
     role: str
@@ -95,7 +136,7 @@ def issue_token(username: str, role: str) -> Dict[str, Any]:
         'sub': username,
         'role': role,
         'iat': now,
-        'exp': now + 3600,
+        'exp': now + TOKEN_TTL_SECONDS,
         'jti': str(uuid.uuid4()),
     }
     token = jwt.encode(payload, settings.JWT_SECRET, algorithm='HS256')
@@ -112,6 +153,75 @@ def decode_token(token: str) -> Dict[str, Any]:
     return payload
 
 
+token_cache = VerifiedTokenCache(settings.AUTH_CACHE_SIZE) if settings.AUTH_CACHE_SIZE > 0 else None
+# Shared through the primary database unless AUTH_REVOCATION_PATH selects the
+# host-local SQLite tier, so a logout reaches every worker on every host.
+revoked_tokens = build_revocation_list(
+    settings.AUTH_REVOCATION_PATH,
+    DatabaseRevocationStore(lambda: db.engine, RevokedToken.__table__),
+)
+auth_stats = AuthStats()
+_auth_stats_lock = threading.Lock()
+
+
+def _verify(token: str, now: float) -> Tuple[AuthContext, bool]:
+    digest = token_digest(token) if token_cache is not None else None
+    context = token_cache.get(digest, now) if digest is not None else None
+    hit = context is not None
+    if context is None:
+        payload = decode_token(token)
+        context = AuthContext(username=payload.get('sub'), role=payload.get('role', ''), payload=payload)
+        if digest is not None:
+            evicted = token_cache.set(digest, context, payload.get('exp'))
+            if evicted:
+                with _auth_stats_lock:
+                    auth_stats.evictions += evicted
+    if revoked_tokens.is_revoked(context.payload.get('jti'), now):
+        raise UnauthorizedError('token_revoked')
+    return context, hit
+
+
+def authenticate(token: str) -> AuthContext:
+    """Verify ``token`` (through the cache) and check it against the revocation list."""
+    started = time.perf_counter()
+    hit = False
+    failure: Optional[str] = None
+    try:
+        context, hit = _verify(token, time.time())
+        return context
+    except UnauthorizedError as exc:
+        failure = exc.message
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        g.auth_seconds = elapsed
+        with _auth_stats_lock:
+            auth_stats.requests += 1
+            auth_stats.total_seconds += elapsed
+            auth_stats.max_seconds = max(auth_stats.max_seconds, elapsed)
+            if hit:
+                auth_stats.cache_hits += 1
+            else:
+                auth_stats.cache_misses += 1
+            if failure == 'token_revoked':
+                auth_stats.revoked += 1
+            elif failure is not None:
+                auth_stats.rejected += 1
+
+
+def revoke_token(jti: str, expires_at: float) -> None:
+    """Reject tokens carrying ``jti`` until ``expires_at`` (their own ``exp``)."""
+    revoked_tokens.revoke(jti, expires_at)
+
+
+def auth_metrics() -> Dict[str, Any]:
+    with _auth_stats_lock:
+        data = auth_stats.to_dict()
+    data['cached_tokens'] = len(token_cache) if token_cache is not None else 0
+    data['revoked_tokens'] = len(revoked_tokens)
+    return data
+
+
 def token_required(role: Optional[str] = None):
     def decorator(fn: Callable):
         @wraps(fn)
@@ -119,13 +229,10 @@ def token_required(role: Optional[str] = None):
             auth_header = request.headers.get('Authorization', '')
             if not auth_header.startswith('Bearer '):
                 raise UnauthorizedError('invalid_token')
-            token = auth_header.split(' ', 1)[1].strip()
-            payload = decode_token(token)
-            username = payload.get('sub')
-            role_value = payload.get('role', '')
-            if role and role_value != role:
+            context = authenticate(auth_header[7:].strip())
+            if role and context.role != role:
                 raise ForbiddenError()
-            g.current_user = AuthContext(username=username, role=role_value, payload=payload)
+            g.current_user = context
             return fn(*args, **kwargs)
 
         return wrapper
@@ -133,6 +240,23 @@ def token_required(role: Optional[str] = None):
     return decorator
 
 
+# Blueprint endpoint -> coroutine view the ASGI server runs instead of the sync one.
+async_views: Dict[str, Callable] = {}
+
+
+def async_variant(blueprint: Blueprint, endpoint: str):
+    """Register an ``async def`` counterpart of ``blueprint``'s ``endpoint`` view.
+
+    Flask (WSGI) keeps serving the sync view; ``backend.asgi`` awaits this one
+    on its event loop, with the same URL rule, hooks and error handlers.
+    """
+    def decorator(fn: Callable):
+        async_views[f'{blueprint.name}.{endpoint}'] = fn
+        return fn
+
+    return decorator
+
+
 def register_error_handlers(app: "Flask"):
     @app.errorhandler(APIError)
     def _handle_api_error(err: APIError):
@@ -152,9 +276,20 @@ __all__ = [
     'NotFoundError',
     'ConflictError',
     'UnprocessableError',
+    'TooManyRequestsError',
+    'ServiceUnavailableError',
     'ServerError',
     'success_response',
+    'json_response',
+    'requested_fields',
     'token_required',
+    'async_variant',
+    'async_views',
     'register_error_handlers',
     'issue_token',
+    'authenticate',
+    'revoke_token',
+    'revoked_tokens',
+    'auth_metrics',
+    'TOKEN_TTL_SECONDS',
 ]
@@ -1,8 +1,19 @@
 ﻿from __future__ import annotations
 
-from flask import Blueprint, request
+import time
 
-from . import APIError, UnauthorizedError, issue_token, success_response
+from flask import Blueprint, g, request
+
+from . import (
+    TOKEN_TTL_SECONDS,
+    APIError,
+    UnauthorizedError,
+    auth_metrics,
+    issue_token,
+    revoke_token,
+    success_response,
+    token_required,
+)
 
 
 auth_bp = Blueprint('auth', __name__)
@@ -29,3 +40,37 @@ def login():
     issued = issue_token(username, account['role'])
     data = {'token': issued['token'], 'payload': issued['payload']}
     return success_response(data)
+
+
+@auth_bp.post('/logout')
+@token_required()
+def logout():
+    """Revoke the presented token; it is rejected from now until it expires."""
+    payload = g.current_user.payload
+    jti = payload.get('jti')
+    if not jti:
+        raise APIError('token_without_jti', code='bad_request', status_code=400)
+    revoke_token(jti, float(payload.get('exp') or time.time() + TOKEN_TTL_SECONDS))
+    return success_response({'revoked': jti})
+
+
+@auth_bp.post('/revoke')
+@token_required('admin')
+def revoke():
+    payload = request.get_json(silent=True) or {}
+    jti = (payload.get('jti') or '').strip()
+    if not jti:
+        raise APIError('missing_jti', code='bad_request', status_code=400)
+    try:
+        # Without the token's exp, keep the entry for the longest token lifetime.
+        exp = float(payload.get('exp') or time.time() + TOKEN_TTL_SECONDS)
+    except (TypeError, ValueError) as exc:
+        raise APIError('invalid_exp', code='bad_request', status_code=400) from exc
+    revoke_token(jti, exp)
+    return success_response({'revoked': jti})
+
+
+@auth_bp.get('/metrics')
+@token_required('admin')
+def metrics():
+    return success_response(auth_metrics())
@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+from flask import Blueprint, request, send_file
+
+from ..config import settings
+from ..profiling import slow_requests
+from . import APIError, NotFoundError, success_response, token_required
+
+
+debug_bp = Blueprint('debug', __name__)
+
+
+def _summary(record):
+    return {key: value for key, value in record.items() if key not in {'spans', 'top_statements'}}
+
+
+@debug_bp.get('/slow')
+@token_required('admin')
+def list_slow_requests():
+    """Recent requests over SLOW_REQUEST_MS in this process, newest first."""
+    try:
+        limit = min(max(int(request.args.get('limit', 20)), 1), settings.PROFILE_KEEP)
+    except ValueError as exc:
+        raise APIError('invalid_integer', code='bad_request', status_code=400) from exc
+    records = slow_requests.recent(limit)
+    meta = {
+        'enabled': settings.PROFILING_ENABLED,
+        'threshold_ms': settings.SLOW_REQUEST_MS,
+        'mode': settings.PROFILE_MODE,
+        'count': len(records),
+    }
+    return success_response([_summary(record) for record in records], meta=meta)
+
+
+@debug_bp.get('/slow/<capture_id>')
+@token_required('admin')
+def get_slow_request(capture_id: str):
+    record = slow_requests.find(capture_id)
+    if record is None:
+        raise NotFoundError('capture_not_found')
+    return success_response(record)
+
+
+@debug_bp.get('/slow/<capture_id>/files/<name>')
+@token_required('admin')
+def download_profile(capture_id: str, name: str):
+    """The .prof (cProfile/pstats) or .folded (stack samples) file of one capture."""
+    record = slow_requests.find(capture_id)
+    if record is None or name not in record.get('files', ()):
+        raise NotFoundError('capture_not_found')
+    path = slow_requests.directory / name
+    if not path.is_file():
+        raise NotFoundError('profile_rotated')
+    return send_file(path, mimetype='application/octet-stream', as_attachment=True, download_name=name)
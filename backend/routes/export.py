@@ -1,12 +1,32 @@
 from __future__ import annotations
 
+import os
+from functools import partial
 from io import BytesIO
+from pathlib import Path
 
-from flask import Blueprint, send_file
+from flask import Blueprint, Response, current_app, g, request, send_file, stream_with_context
 
+from ..config import settings
+from ..db import db
 from ..models import Note, Patient
-from ..services import generate_note_pdf
-from . import NotFoundError, token_required
+from ..services.audit import record_audit
+from ..services.columnar_export import FORMATS, columnar_export_available, export_columnar, read_watermark
+from ..services.jobs import job_queue
+from ..services.note_export import build_export_query, export_filters_summary, iter_batches, stream_csv, stream_ndjson
+from ..services.pdf_cache import pdf_cache
+from ..services.pdf_pool import RendererBusyError, RendererUnavailableError, pdf_renderer, render_packet_to_tempfile
+from . import (
+    APIError,
+    NotFoundError,
+    ServiceUnavailableError,
+    TooManyRequestsError,
+    UnprocessableError,
+    success_response,
+    token_required,
+)
+from .notes import _submit_job
+from .patients import _parse_datetime
 
 
 export_bp = Blueprint('export', __name__)
@@ -22,7 +42,33 @@ def export_note(note_id: int):
     if not patient:
         raise NotFoundError('patient_not_found')
 
-    pdf_bytes = generate_note_pdf(note, patient=patient)
+    try:
+        if pdf_cache is not None:
+            pdf_file, etag = pdf_cache.get_or_render(
+                note.to_dict(), patient.to_dict(), partial(pdf_renderer.render_note, cached=True)
+            )
+        else:
+            pdf_bytes = pdf_renderer.render_note(note.to_dict(), patient.to_dict())
+    except RendererBusyError as exc:
+        raise TooManyRequestsError('pdf_renderer_busy') from exc
+    except RendererUnavailableError as exc:
+        raise ServiceUnavailableError(str(exc)) from exc
+
+    if pdf_cache is not None:
+        response = send_file(
+            pdf_file,
+            mimetype='application/pdf',
+            as_attachment=True,
+            download_name=f'note_{note_id}.pdf',
+            etag=etag,
+            conditional=True,
+            max_age=0,
+        )
+        if response.status_code == 200 and response.content_length is None:
+            # send_file only sizes paths and BytesIO; the cache hands out open files.
+            response.content_length = os.fstat(pdf_file.fileno()).st_size
+        return response
+
     buffer = BytesIO(pdf_bytes)
     buffer.seek(0)
 
@@ -32,3 +78,171 @@ def export_note(note_id: int):
         as_attachment=True,
         download_name=f'note_{note_id}.pdf',
     )
+
+
+def _stream_notes(output_format: str) -> Response:
+    patient_id = request.args.get('patient_id')
+    try:
+        patient_id = int(patient_id) if patient_id else None
+    except ValueError as exc:
+        raise APIError('invalid_integer', code='bad_request', status_code=400) from exc
+    filters = {
+        'ward': (request.args.get('ward') or '').strip() or None,
+        'patient_id': patient_id,
+        'since': _parse_datetime(request.args.get('from')),
+        'until': _parse_datetime(request.args.get('to')),
+        'signed_only': request.args.get('signed_only') in {'1', 'true', 'True'},
+    }
+    include_transcript = request.args.get('include_transcript') in {'1', 'true', 'True'}
+
+    current = getattr(g, 'current_user', None)
+    record_audit(
+        user=current.username if current else None,
+        action='export',
+        entity='notes',
+        entity_id=None,
+        diff={'format': output_format, **export_filters_summary(**filters)},
+    )
+    db.session.commit()
+
+    statement = build_export_query(include_transcript=include_transcript, **filters)
+    batches = iter_batches(db.session, statement, settings.EXPORT_STREAM_BATCH)
+    if output_format == 'csv':
+        body, mimetype = stream_csv(batches, include_transcript), 'text/csv; charset=utf-8'
+    else:
+        body, mimetype = stream_ndjson(batches, include_transcript), 'application/x-ndjson'
+
+    response = Response(stream_with_context(body), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename=notes.{output_format}'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@export_bp.get('/notes.ndjson')
+@token_required('admin')
+def export_notes_ndjson():
+    return _stream_notes('ndjson')
+
+
+@export_bp.get('/notes.csv')
+@token_required('admin')
+def export_notes_csv():
+    return _stream_notes('csv')
+
+
+def _run_columnar_export(payload, report):
+    def progress(rows: int, last_note_id: int) -> None:
+        report({'rows': rows, 'last_note_id': last_note_id})
+
+    with payload['app'].app_context():
+        summary = export_columnar(
+            db.session,
+            settings.COLUMNAR_EXPORT_DIR,
+            output_format=payload['format'],
+            batch_size=settings.EXPORT_STREAM_BATCH,
+            full=payload['full'],
+            on_batch=progress,
+        )
+    return summary.to_dict()
+
+
+job_queue.register('columnar_export', _run_columnar_export)
+
+
+def _require_columnar_export() -> str:
+    if not settings.COLUMNAR_EXPORT_DIR:
+        raise UnprocessableError('columnar_export_not_configured')
+    if not columnar_export_available():
+        raise UnprocessableError('pyarrow_not_installed')
+    return settings.COLUMNAR_EXPORT_DIR
+
+
+@export_bp.get('/columnar')
+@token_required('admin')
+def columnar_export_status():
+    root = _require_columnar_export()
+    return success_response({'directory': root, 'watermark': read_watermark(Path(root))})
+
+
+@export_bp.post('/columnar')
+@token_required('admin')
+def start_columnar_export():
+    _require_columnar_export()
+    payload = request.get_json(silent=True) or {}
+    output_format = (payload.get('format') or settings.COLUMNAR_EXPORT_FORMAT).lower()
+    if output_format not in FORMATS:
+        raise APIError('invalid_format', code='bad_request', status_code=400)
+    full = bool(payload.get('full'))
+
+    current = getattr(g, 'current_user', None)
+    record_audit(
+        user=current.username if current else None,
+        action='export',
+        entity='notes',
+        entity_id=None,
+        diff={'format': output_format, 'full': full, 'target': 'columnar'},
+    )
+    db.session.commit()
+    # Runs on the shared job queue; poll GET /api/notes/jobs/<id> for progress.
+    return _submit_job('columnar_export', {
+        'app': current_app._get_current_object(),
+        'format': output_format,
+        'full': full,
+    })
+
+
+@export_bp.get('/patients/<int:patient_id>')
+@token_required()
+def export_patient_notes(patient_id: int):
+    patient = Patient.query.get(patient_id)
+    if not patient:
+        raise NotFoundError('patient_not_found')
+
+    output_format = (request.args.get('format') or 'pdf').lower()
+    if output_format not in {'pdf', 'zip'}:
+        raise APIError('invalid_format', code='bad_request', status_code=400)
+
+    query = Note.query.filter_by(patient_id=patient_id)
+    from_dt = _parse_datetime(request.args.get('from'))
+    to_dt = _parse_datetime(request.args.get('to'))
+    encounter_id = request.args.get('encounter_id')
+    if from_dt:
+        query = query.filter(Note.created_at >= from_dt)
+    if to_dt:
+        query = query.filter(Note.created_at <= to_dt)
+    if encounter_id:
+        try:
+            query = query.filter(Note.encounter_id == int(encounter_id))
+        except ValueError as exc:
+            raise APIError('invalid_integer', code='bad_request', status_code=400) from exc
+
+    max_notes = settings.EXPORT_MAX_NOTES
+    notes = query.order_by(Note.created_at.asc(), Note.id.asc()).limit(max_notes + 1).all()
+    if not notes:
+        raise NotFoundError('notes_not_found')
+    if len(notes) > max_notes:
+        raise UnprocessableError('too_many_notes')
+
+    # Rendered into an anonymous temp file so the body is streamed from disk, not held in memory.
+    try:
+        spool = render_packet_to_tempfile(
+            pdf_renderer,
+            [note.to_dict() for note in notes],
+            patient.to_dict(),
+            output_format,
+        )
+    except RendererBusyError as exc:
+        raise TooManyRequestsError('pdf_renderer_busy') from exc
+    except RendererUnavailableError as exc:
+        raise ServiceUnavailableError(str(exc)) from exc
+    if output_format == 'zip':
+        mimetype, download_name = 'application/zip', f'patient_{patient_id}_notes.zip'
+    else:
+        mimetype, download_name = 'application/pdf', f'patient_{patient_id}_notes.pdf'
+
+    return send_file(
+        spool,
+        mimetype=mimetype,
+        as_attachment=True,
+        download_name=download_name,
+    )
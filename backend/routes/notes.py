@@ -1,49 +1,128 @@
 ﻿from __future__ import annotations
 
-from typing import Any, Dict
+import asyncio
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
-from flask import Blueprint, g, request
+from flask import Blueprint, Response, g, request
+from sqlalchemy import Select, and_, or_, select
+from sqlalchemy.exc import SQLAlchemyError
 
-from ..db import db
-from ..models import AuditEvent, Note, Patient
-from ..services import detect_alerts, parse_note, transcribe_openai
-from . import APIError, NotFoundError, UnprocessableError, success_response, token_required
+from ..config import settings
+from ..db import async_read_session, db, db_now
+from ..models import AuditEvent, Encounter, Note, Patient
+from ..models.note import NOTE_SCHEMA
+from ..services import (
+    detect_alerts,
+    parse_note,
+    parse_note_async,
+    spool_upload,
+    stitch_transcripts,
+    transcribe_file,
+    transcribe_file_async,
+)
+from ..services.audit import record_audit
+from ..services.jobs import Job, QueueFullError, job_queue
+from ..services.note_search import SEARCH_FIELDS, SearchFilters, note_index, query_terms
+from ..services.risk import risk_registry
+from ..services.ward_state import apply_notes_to_latest_state
+from . import (
+    APIError,
+    NotFoundError,
+    TooManyRequestsError,
+    UnprocessableError,
+    async_variant,
+    requested_fields,
+    success_response,
+    token_required,
+)
+from .patients import _decode_cursor, _encode_cursor, _parse_datetime, _parse_limit, _vital_filters
 
 
 notes_bp = Blueprint('notes', __name__)
 
 
+def _spool_request_file(req: Any) -> Tuple[Path, str]:
+    if 'file' not in req.files:
+        raise APIError('file_required', code='bad_request', status_code=400)
+    uploaded = req.files['file']
+    filename = uploaded.filename or 'audio.webm'
+    return spool_upload(uploaded.stream, filename), filename
+
+
 @notes_bp.post('/transcribe')
 @token_required()
 def transcribe():
-    if 'file' not in request.files:
-        raise APIError('file_required', code='bad_request', status_code=400)
-    uploaded = request.files['file']
-    file_bytes = uploaded.read()
-    filename = uploaded.filename or 'audio.webm'
+    path, filename = _spool_request_file(request)
     try:
-        text = transcribe_openai(file_bytes, filename)
+        text = transcribe_file(path, filename)
     except ValueError as exc:
         raise APIError(str(exc), code='bad_request', status_code=400) from exc
     except RuntimeError as exc:
         raise APIError(str(exc), code='server_error', status_code=500) from exc
+    finally:
+        os.unlink(path)
 
     return success_response({'text': text})
 
 
-@notes_bp.post('/parse')
+@async_variant(notes_bp, 'transcribe')
 @token_required()
-def parse():
+async def transcribe_async():
+    # Form parsing and spooling are blocking file I/O: off the event loop.
+    path, filename = await asyncio.to_thread(_spool_request_file, request._get_current_object())
+    try:
+        text = await transcribe_file_async(path, filename)
+    except ValueError as exc:
+        raise APIError(str(exc), code='bad_request', status_code=400) from exc
+    except RuntimeError as exc:
+        raise APIError(str(exc), code='server_error', status_code=500) from exc
+    finally:
+        os.unlink(path)
+
+    return success_response({'text': text})
+
+
+def _requested_text() -> str:
     payload = request.get_json(silent=True) or {}
     text = (payload.get('text') or '').strip()
     if not text:
         raise APIError('text_required', code='bad_request', status_code=400)
+    return text
+
 
+@notes_bp.post('/parse')
+@token_required()
+def parse():
+    text = _requested_text()
     try:
-        parsed = parse_note(text)
+        parsed = _parse_with_rule_alerts(text)
     except RuntimeError as exc:
         raise UnprocessableError('parse_failed') from exc
 
+    return success_response(parsed)
+
+
+@async_variant(notes_bp, 'parse')
+@token_required()
+async def parse_async():
+    text = _requested_text()
+    try:
+        parsed = _merge_rule_alerts(await parse_note_async(text))
+    except RuntimeError as exc:
+        raise UnprocessableError('parse_failed') from exc
+
+    return success_response(parsed)
+
+
+def _parse_with_rule_alerts(text: str) -> Dict[str, Any]:
+    return _merge_rule_alerts(parse_note(text))
+
+
+def _merge_rule_alerts(parsed: Dict[str, Any]) -> Dict[str, Any]:
     vitals = parsed.get('vitals') or {}
     alerts = parsed.get('alerts') or []
     rule_alerts = detect_alerts(vitals)
@@ -54,8 +133,127 @@ def parse():
             merged_alerts.append(item)
             seen.add(item)
     parsed['alerts'] = merged_alerts
+    return parsed
 
-    return success_response(parsed)
+
+def _run_transcribe_job(payload: Dict[str, Any], report) -> Dict[str, Any]:
+    parts: List[str | None] = []
+
+    def on_partial(index: int, total: int, text: str) -> None:
+        if not parts:
+            parts.extend([None] * total)
+        parts[index] = text
+        ready = []
+        for part in parts:
+            if part is None:
+                break
+            ready.append(part)
+        report({
+            'chunks_done': sum(part is not None for part in parts),
+            'chunks_total': total,
+            'text': stitch_transcripts(ready),
+        })
+
+    try:
+        return {'text': transcribe_file(payload['path'], payload['filename'], on_partial=on_partial)}
+    finally:
+        os.unlink(payload['path'])
+
+
+def _run_parse_job(payload: Dict[str, Any], report) -> Dict[str, Any]:
+    try:
+        return _parse_with_rule_alerts(payload['text'])
+    except RuntimeError as exc:
+        raise RuntimeError('parse_failed') from exc
+
+
+job_queue.register('transcribe', _run_transcribe_job)
+job_queue.register('parse', _run_parse_job)
+
+
+def _current_username() -> str | None:
+    return getattr(g, 'current_user', None).username if hasattr(g, 'current_user') else None
+
+
+def _submit_job(kind: str, payload: Dict[str, Any]):
+    try:
+        job = job_queue.submit(kind, payload, user=_current_username())
+    except QueueFullError as exc:
+        raise TooManyRequestsError('job_queue_full') from exc
+    return success_response(job.to_dict(), status_code=202)
+
+
+def _get_visible_job(job_id: str) -> Job:
+    job = job_queue.get(job_id)
+    current = getattr(g, 'current_user', None)
+    if not job or (job.user != _current_username() and getattr(current, 'role', None) != 'admin'):
+        raise NotFoundError('job_not_found')
+    return job
+
+
+@notes_bp.post('/transcribe/jobs')
+@token_required()
+def submit_transcribe_job():
+    if 'file' not in request.files:
+        raise APIError('file_required', code='bad_request', status_code=400)
+    uploaded = request.files['file']
+    filename = uploaded.filename or 'audio.webm'
+    path = spool_upload(uploaded.stream, filename)
+    if os.path.getsize(path) == 0:
+        os.unlink(path)
+        raise APIError('invalid_audio', code='bad_request', status_code=400)
+    try:
+        return _submit_job('transcribe', {'path': str(path), 'filename': filename})
+    except TooManyRequestsError:
+        os.unlink(path)
+        raise
+
+
+@notes_bp.post('/parse/jobs')
+@token_required()
+def submit_parse_job():
+    payload = request.get_json(silent=True) or {}
+    text = (payload.get('text') or '').strip()
+    if not text:
+        raise APIError('text_required', code='bad_request', status_code=400)
+    return _submit_job('parse', {'text': text})
+
+
+@notes_bp.get('/jobs/metrics')
+@token_required()
+def job_metrics():
+    return success_response(job_queue.metrics())
+
+
+@notes_bp.get('/jobs/<job_id>')
+@token_required()
+def get_job(job_id: str):
+    return success_response(_get_visible_job(job_id).to_dict())
+
+
+@notes_bp.get('/jobs/<job_id>/events')
+@token_required()
+def stream_job(job_id: str):
+    job = _get_visible_job(job_id)
+
+    def events() -> Iterator[str]:
+        current = job
+        last_revision = None
+        while current is not None:
+            if current.revision != last_revision:
+                last_revision = current.revision
+                yield f"event: {current.status}\ndata: {json.dumps(current.to_dict(), ensure_ascii=False)}\n\n"
+            if current.finished:
+                return
+            current = job_queue.wait(job_id, since_revision=last_revision, timeout=15.0)
+            if current is not None and current.revision == last_revision:
+                yield ': keepalive\n\n'
+
+    return Response(
+        events(),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
 
 
 def _coerce_int(value: Any) -> int | None:
@@ -87,11 +285,28 @@ def create_note():
     if not patient:
         raise NotFoundError('patient_not_found')
 
-    encounter_id = _coerce_int(payload.get('encounter_id'))
+    created_at = db_now(db.session)
+    note = _note_from_payload(payload, patient_id, created_at)
+
+    # One transaction: flush to get the note id, then audit and commit together.
+    db.session.add(note)
+    db.session.flush()
+    apply_notes_to_latest_state([note])
+    record_audit(user=_current_username(), action='create', entity='note', entity_id=note.id, diff=payload)
+    db.session.commit()
+    risk_registry.observe(patient_id, note.id, payload.get('vitals'), created_at)
+    note_index.index_notes([note], {patient_id: patient.ward})
+
+    return success_response(note.to_dict(), status_code=201)
+
 
+def _note_from_payload(payload: Dict[str, Any], patient_id: int, created_at: Optional[datetime] = None) -> Note:
+    # created_at is set here rather than left to the server default: MySQL has
+    # no RETURNING, so a defaulted value is reloaded with one SELECT per note.
     note = Note(
         patient_id=patient_id,
-        encounter_id=encounter_id,
+        created_at=created_at,
+        encounter_id=_coerce_int(payload.get('encounter_id')),
         pain_score=_coerce_int(payload.get('pain_score')),
         intake_ml=_coerce_int(payload.get('intake_ml')),
         output_ml=_coerce_int(payload.get('output_ml')),
@@ -107,29 +322,270 @@ def create_note():
         med_given=payload.get('med_given'),
         alerts=payload.get('alerts'),
     )
+    return note
 
-    db.session.add(note)
-    db.session.commit()
 
-    audit = AuditEvent(
-        user=getattr(g, 'current_user', None).username if hasattr(g, 'current_user') else None,
-        action='create',
-        entity='note',
-        entity_id=note.id,
+_NDJSON_MIMETYPES = {'application/x-ndjson', 'application/ndjson', 'application/jsonlines'}
+_INVALID_ROW = object()
+
+
+def _iter_bulk_rows() -> Iterator[Any]:
+    if request.mimetype in _NDJSON_MIMETYPES:
+        for raw in request.stream:
+            line = raw.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                yield _INVALID_ROW
+        return
+    rows = request.get_json(silent=True)
+    if not isinstance(rows, list):
+        raise APIError('array_required', code='bad_request', status_code=400)
+    yield from rows
+
+
+def _bulk_error(index: int, message: str, code: str = 'bad_request') -> Dict[str, Any]:
+    return {'index': index, 'ok': False, 'error': {'code': code, 'message': message}}
+
+
+def _note_from_bulk_row(row: Any) -> Note:
+    if row is _INVALID_ROW:
+        raise APIError('invalid_json', code='bad_request', status_code=400)
+    if not isinstance(row, dict):
+        raise APIError('object_required', code='bad_request', status_code=400)
+    patient_id = _coerce_int(row.get('patient_id'))
+    if not patient_id:
+        raise APIError('patient_id_required', code='bad_request', status_code=400)
+    note = _note_from_payload(row, patient_id)
+    created_at = row.get('created_at')
+    if created_at:
+        if not isinstance(created_at, str):
+            raise APIError(f'invalid_date: {created_at!r}', code='bad_request', status_code=400)
+        note.created_at = _parse_datetime(created_at)
+    return note
+
+
+def _flush_bulk_batch(batch: List[Tuple[int, Dict[str, Any], Note]], results: List[Optional[Dict[str, Any]]],
+                      username: str | None) -> None:
+    patient_ids = {note.patient_id for _, _, note in batch}
+    wards = dict(db.session.query(Patient.id, Patient.ward).filter(Patient.id.in_(patient_ids)))
+    # Checked up front like patients: a dangling encounter_id would otherwise
+    # fail the foreign key at flush and take the whole batch down with it.
+    encounter_ids = {note.encounter_id for _, _, note in batch if note.encounter_id is not None}
+    known_encounters = set(
+        db.session.scalars(select(Encounter.id).where(Encounter.id.in_(encounter_ids)))
+    ) if encounter_ids else set()
+    accepted = []
+    for index, row, note in batch:
+        if note.patient_id not in wards:
+            results[index] = _bulk_error(index, 'patient_not_found', code='not_found')
+        elif note.encounter_id is not None and note.encounter_id not in known_encounters:
+            results[index] = _bulk_error(index, 'encounter_not_found', code='not_found')
+        else:
+            accepted.append((index, row, note))
+    if not accepted:
+        return
+
+    try:
+        now = db_now(db.session)
+        for _, _, note in accepted:
+            if note.created_at is None:
+                note.created_at = now
+        db.session.add_all([note for _, _, note in accepted])
+        db.session.flush()
+        apply_notes_to_latest_state([note for _, _, note in accepted])
+        audits = []
+        for _, row, note in accepted:
+            audit = AuditEvent(user=username, action='create', entity='note', entity_id=note.id)
+            audit.set_diff(row)
+            audits.append(audit)
+        db.session.bulk_save_objects(audits)
+        db.session.commit()
+    except SQLAlchemyError:
+        db.session.rollback()
+        for index, _, _ in accepted:
+            results[index] = _bulk_error(index, 'batch_failed', code='server_error')
+        return
+
+    for index, row, note in accepted:
+        results[index] = {'index': index, 'ok': True, 'id': str(note.id)}
+        risk_registry.observe(note.patient_id, note.id, row.get('vitals'), note.created_at)
+    note_index.index_notes([note for _, _, note in accepted], wards)
+
+
+@notes_bp.post('/bulk')
+@token_required()
+def create_notes_bulk():
+    username = _current_username()
+    batch_size = settings.BULK_BATCH_SIZE
+    max_rows = settings.BULK_MAX_ROWS
+    results: List[Optional[Dict[str, Any]]] = []
+    batch: List[Tuple[int, Dict[str, Any], Note]] = []
+
+    for index, row in enumerate(_iter_bulk_rows()):
+        if index >= max_rows:
+            results.append(_bulk_error(index, 'too_many_rows'))
+            break
+        results.append(None)
+        try:
+            note = _note_from_bulk_row(row)
+        except APIError as exc:
+            results[index] = _bulk_error(index, exc.message, code=exc.code)
+            continue
+        batch.append((index, row, note))
+        if len(batch) >= batch_size:
+            _flush_bulk_batch(batch, results, username)
+            batch = []
+    if batch:
+        _flush_bulk_batch(batch, results, username)
+
+    created = sum(1 for item in results if item and item['ok'])
+    meta = {'total': len(results), 'created': created, 'failed': len(results) - created}
+    return success_response({'results': results}, meta=meta)
+
+
+def _search_snippet(note: Note, terms: List[str], width: int = 40) -> Dict[str, str] | None:
+    for field in SEARCH_FIELDS:
+        text = getattr(note, field) or ''
+        lowered = text.lower()
+        for term in terms:
+            position = lowered.find(term)
+            if position < 0:
+                continue
+            start = max(0, position - width)
+            end = min(len(text), position + len(term) + width)
+            prefix = '…' if start else ''
+            suffix = '…' if end < len(text) else ''
+            return {'field': field, 'text': f'{prefix}{text[start:end]}{suffix}'}
+    return None
+
+
+@notes_bp.get('/search')
+@token_required()
+def search_notes():
+    fields = requested_fields(NOTE_SCHEMA)
+    query = request.args.get('q') or ''
+    terms = query_terms(query)
+    if not terms:
+        raise APIError('query_required', code='bad_request', status_code=400)
+
+    cursor = request.args.get('cursor')
+    try:
+        offset = int(cursor) if cursor else 0
+    except ValueError as exc:
+        raise APIError('invalid_cursor', code='bad_request', status_code=400) from exc
+    if offset < 0:
+        raise APIError('invalid_cursor', code='bad_request', status_code=400)
+    limit = _parse_limit(request.args.get('limit'))
+    filters = SearchFilters(
+        patient_id=_coerce_int(request.args.get('patient_id')),
+        ward=(request.args.get('ward') or '').strip() or None,
+        since=_parse_datetime(request.args.get('from')),
+        until=_parse_datetime(request.args.get('to')),
     )
-    audit.set_diff(payload)
-    db.session.add(audit)
-    db.session.commit()
 
-    return success_response(note.to_dict(), status_code=201)
+    hits = note_index.search(query, filters, limit=limit + 1, offset=offset)
+    has_more = len(hits) > limit
+    hits = hits[:limit]
+
+    notes = {note.id: note for note in Note.query.filter(Note.id.in_([note_id for note_id, _ in hits]))}
+    serialize = NOTE_SCHEMA.serializer(fields)
+    results: List[Dict[str, Any]] = []
+    for note_id, score in hits:
+        note = notes.get(note_id)
+        if note is None:
+            continue
+        item = serialize(note)
+        item['score'] = round(score, 4)
+        item['snippet'] = _search_snippet(note, terms)
+        results.append(item)
+
+    meta = {
+        'count': len(results),
+        'limit': limit,
+        'next_cursor': str(offset + limit) if has_more else None,
+        'terms': terms,
+        'backend': note_index.backend.name,
+    }
+    return success_response(results, meta=meta)
+
+
+def _vitals_statement() -> Tuple[Select, int]:
+    """The query behind GET /notes/vitals (shared by the sync and async views) and its page size."""
+    statement = select(Note).where(*_vital_filters())
+
+    patient_id = _coerce_int(request.args.get('patient_id'))
+    ward = (request.args.get('ward') or '').strip() or None
+    from_dt = _parse_datetime(request.args.get('from'))
+    to_dt = _parse_datetime(request.args.get('to'))
+    limit = _parse_limit(request.args.get('limit'))
+    cursor = _decode_cursor(request.args.get('cursor'))
+
+    if patient_id:
+        statement = statement.filter(Note.patient_id == patient_id)
+    if ward:
+        statement = statement.join(Patient, Patient.id == Note.patient_id).filter(Patient.ward == ward)
+    if from_dt:
+        statement = statement.filter(Note.created_at >= from_dt)
+    if to_dt:
+        statement = statement.filter(Note.created_at <= to_dt)
+    if cursor:
+        cursor_at, cursor_id = cursor
+        statement = statement.filter(or_(
+            Note.created_at < cursor_at,
+            and_(Note.created_at == cursor_at, Note.id < cursor_id),
+        ))
+
+    return statement.order_by(Note.created_at.desc(), Note.id.desc()).limit(limit + 1), limit
+
+
+def _vitals_page(rows: List[Note], limit: int, fields: Optional[Tuple[str, ...]]):
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = _encode_cursor(rows[-1]) if has_more and rows else None
+    meta = {'count': len(rows), 'limit': limit, 'next_cursor': next_cursor}
+    return success_response(NOTE_SCHEMA.dump_many(rows, fields), meta=meta)
+
+
+@notes_bp.get('/vitals')
+@token_required()
+def list_notes_by_vitals():
+    """Notes whose typed vitals fall in the requested ranges, newest first."""
+    fields = requested_fields(NOTE_SCHEMA)
+    statement, limit = _vitals_statement()
+    return _vitals_page(db.session.scalars(statement).all(), limit, fields)
+
+
+@async_variant(notes_bp, 'list_notes_by_vitals')
+@token_required()
+async def list_notes_by_vitals_async():
+    fields = requested_fields(NOTE_SCHEMA)
+    statement, limit = _vitals_statement()
+    async with async_read_session() as session:
+        rows = (await session.scalars(statement)).all()
+    return _vitals_page(rows, limit, fields)
 
 
 @notes_bp.get('/<int:note_id>')
 @token_required()
 def get_note(note_id: int):
+    fields = requested_fields(NOTE_SCHEMA)
     note = Note.query.get(note_id)
     if not note:
         raise NotFoundError('note_not_found')
-    return success_response(note.to_dict())
+    return success_response(NOTE_SCHEMA.dump(note, fields))
+
+
+@async_variant(notes_bp, 'get_note')
+@token_required()
+async def get_note_async(note_id: int):
+    fields = requested_fields(NOTE_SCHEMA)
+    async with async_read_session() as session:
+        note = await session.get(Note, note_id)
+    if not note:
+        raise NotFoundError('note_not_found')
+    return success_response(NOTE_SCHEMA.dump(note, fields))
 
 
@@ -1,17 +1,29 @@
 ﻿from __future__ import annotations
 
+import base64
+import math
 from datetime import datetime
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Tuple
 
 from flask import Blueprint, request
+from sqlalchemy import and_, func, or_
 
 from ..db import db
 from ..models import Note, Patient
-from . import APIError, NotFoundError, success_response, token_required
+from ..models.note import NOTE_SCHEMA, VITAL_COLUMNS, has_json_items
+from ..models.patient import PATIENT_SCHEMA
+from ..serialization import isoformat, load_json
+from ..services.patient_search import InvalidCursorError, search_patients
+from ..services.risk import CATCH_UP_OVERLAP, risk_registry
+from ..services.ward_state import init_latest_state
+from . import APIError, NotFoundError, requested_fields, success_response, token_required
 
 
 patients_bp = Blueprint('patients', __name__)
 
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
 
 def _parse_datetime(value: str | None) -> datetime | None:
     if not value:
@@ -23,6 +35,119 @@ def _parse_datetime(value: str | None) -> datetime | None:
         raise APIError(f'invalid_date: {value}', code='bad_request', status_code=400) from exc
 
 
+def _parse_limit(value: str | None) -> int:
+    if not value:
+        return DEFAULT_PAGE_SIZE
+    try:
+        limit = int(value)
+    except ValueError as exc:
+        raise APIError('invalid_limit', code='bad_request', status_code=400) from exc
+    if limit < 1:
+        raise APIError('invalid_limit', code='bad_request', status_code=400)
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def _encode_cursor(note: Note) -> str:
+    created_at = note.created_at.isoformat() if note.created_at else ''
+    raw = f'{created_at}|{note.id}'.encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def _decode_cursor(value: str | None) -> Tuple[datetime, int] | None:
+    if not value:
+        return None
+    try:
+        padded = value + '=' * (-len(value) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8')
+        created_at, note_id = raw.rsplit('|', 1)
+        return datetime.fromisoformat(created_at), int(note_id)
+    except (ValueError, UnicodeError) as exc:
+        raise APIError('invalid_cursor', code='bad_request', status_code=400) from exc
+
+
+def _vital_filters() -> List[Any]:
+    """``<vital>_min`` / ``<vital>_max`` query args as conditions on the typed vitals columns."""
+    conditions: List[Any] = []
+    for name in VITAL_COLUMNS:
+        column = getattr(Note, name)
+        for suffix, compare in (('_min', column.__ge__), ('_max', column.__le__)):
+            raw = request.args.get(name + suffix)
+            if raw in (None, ''):
+                continue
+            try:
+                value = float(raw)
+            except ValueError as exc:
+                raise APIError(f'invalid_number: {name}{suffix}', code='bad_request', status_code=400) from exc
+            if not math.isfinite(value):  # float() accepts 'nan' and 'inf'
+                raise APIError(f'invalid_number: {name}{suffix}', code='bad_request', status_code=400)
+            conditions.append(compare(value))
+    if not conditions:
+        raise APIError('vital_range_required', code='bad_request', status_code=400)
+    return conditions
+
+
+@patients_bp.get('/vitals')
+@token_required()
+def list_patients_by_vitals():
+    """Patients with at least one note in range, most recent match first."""
+    conditions = _vital_filters()
+    from_dt = _parse_datetime(request.args.get('from'))
+    to_dt = _parse_datetime(request.args.get('to'))
+    ward = (request.args.get('ward') or '').strip() or None
+    limit = _parse_limit(request.args.get('limit'))
+
+    last_match = func.max(Note.created_at)
+    query = (
+        db.session.query(Note.patient_id, func.count(Note.id), last_match)
+        .filter(*conditions)
+    )
+    if from_dt:
+        query = query.filter(Note.created_at >= from_dt)
+    if to_dt:
+        query = query.filter(Note.created_at <= to_dt)
+    if ward:
+        query = query.join(Patient, Patient.id == Note.patient_id).filter(Patient.ward == ward)
+    rows = query.group_by(Note.patient_id).order_by(last_match.desc()).limit(limit + 1).all()
+    truncated = len(rows) > limit
+    rows = rows[:limit]
+
+    patients = {patient.id: patient for patient in Patient.query.filter(Patient.id.in_([row[0] for row in rows]))}
+    data = []
+    for patient_id, matches, last_at in rows:
+        patient = patients.get(patient_id)
+        if patient is None:
+            continue
+        item = PATIENT_SCHEMA.dump(patient)
+        item['matching_notes'] = matches
+        item['last_match_at'] = isoformat(last_at)
+        data.append(item)
+    return success_response(data, meta={'count': len(data), 'limit': limit, 'truncated': truncated})
+
+
+@patients_bp.get('')
+@token_required()
+def list_patients():
+    fields = requested_fields(PATIENT_SCHEMA)
+    q = request.args.get('q')
+    ward = (request.args.get('ward') or '').strip() or None
+    bed = (request.args.get('bed') or '').strip() or None
+    limit = _parse_limit(request.args.get('limit'))
+    try:
+        patients, next_cursor, mode = search_patients(
+            db.session,
+            q=q,
+            ward=ward,
+            bed=bed,
+            limit=limit,
+            cursor=request.args.get('cursor'),
+        )
+    except InvalidCursorError as exc:
+        raise APIError('invalid_cursor', code='bad_request', status_code=400) from exc
+
+    meta = {'count': len(patients), 'limit': limit, 'next_cursor': next_cursor, 'mode': mode}
+    return success_response(PATIENT_SCHEMA.dump_many(patients, fields), meta=meta)
+
+
 @patients_bp.post('')
 @token_required()
 def create_patient():
@@ -43,6 +168,8 @@ def create_patient():
         bed=payload.get('bed'),
     )
     db.session.add(patient)
+    db.session.flush()
+    init_latest_state(patient)
     db.session.commit()
     return success_response(patient.to_dict(), status_code=201)
 
@@ -50,25 +177,29 @@ def create_patient():
 @patients_bp.get('/<int:patient_id>')
 @token_required()
 def get_patient(patient_id: int):
+    fields = requested_fields(PATIENT_SCHEMA)
     patient = Patient.query.get(patient_id)
     if not patient:
         raise NotFoundError('patient_not_found')
-    return success_response(patient.to_dict())
+    return success_response(PATIENT_SCHEMA.dump(patient, fields))
 
 
 @patients_bp.get('/<int:patient_id>/notes')
 @token_required()
 def list_patient_notes(patient_id: int):
+    fields = requested_fields(NOTE_SCHEMA)
     patient = Patient.query.get(patient_id)
     if not patient:
         raise NotFoundError('patient_not_found')
 
-    query = Note.query.filter_by(patient_id=patient_id).order_by(Note.created_at.desc())
+    query = Note.query.filter_by(patient_id=patient_id)
 
     from_param = request.args.get('from')
     to_param = request.args.get('to')
     alerts_only = request.args.get('alerts_only') in {'1', 'true', 'True'}
     signed_only = request.args.get('signed_only') in {'1', 'true', 'True'}
+    limit = _parse_limit(request.args.get('limit'))
+    cursor = _decode_cursor(request.args.get('cursor'))
 
     if from_param:
         from_dt = _parse_datetime(from_param)
@@ -78,19 +209,56 @@ def list_patient_notes(patient_id: int):
         to_dt = _parse_datetime(to_param)
         if to_dt:
             query = query.filter(Note.created_at <= to_dt)
+    if signed_only:
+        query = query.filter(Note.signed == 1)
+    if alerts_only:
+        query = query.filter(has_json_items(Note.alerts))
+    if cursor:
+        cursor_at, cursor_id = cursor
+        query = query.filter(or_(
+            Note.created_at < cursor_at,
+            and_(Note.created_at == cursor_at, Note.id < cursor_id),
+        ))
 
-    notes: List[Dict[str, Any]] = []
-    for note in query:
-        note_dict = note.to_dict()
-        if alerts_only and not note_dict.get('alerts'):
-            continue
-        if signed_only and not note_dict.get('signed'):
-            continue
-        notes.append(note_dict)
+    query = query.order_by(Note.created_at.desc(), Note.id.desc()).limit(limit + 1)
+    rows = query.all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    notes: List[Dict[str, Any]] = NOTE_SCHEMA.dump_many(rows, fields)
+    next_cursor = _encode_cursor(rows[-1]) if has_more and rows else None
 
-    meta = {'count': len(notes)}
+    meta = {'count': len(notes), 'limit': limit, 'next_cursor': next_cursor}
     data = {
         'patient': patient.to_dict(),
         'notes': notes,
     }
     return success_response(data, meta=meta)
+
+
+@patients_bp.get('/<int:patient_id>/risk')
+@token_required()
+def get_patient_risk(patient_id: int):
+    patient = Patient.query.get(patient_id)
+    if not patient:
+        raise NotFoundError('patient_not_found')
+
+    # Only notes near or above what this process has already folded in are
+    # read, and never more than one window's worth; the overlap below the
+    # watermark picks up notes that committed out of id order.
+    state = risk_registry.get(patient_id)
+    since = state.last_note_id - CATCH_UP_OVERLAP if state is not None else 0
+    rows = (
+        db.session.query(Note.id, Note.vitals, Note.created_at)
+        .filter(Note.patient_id == patient_id, Note.id > since)
+        .order_by(Note.id.desc())
+        .limit(risk_registry.window)
+        .all()
+    )
+    state = risk_registry.catch_up(
+        patient_id,
+        [(note_id, load_json(vitals), created_at) for note_id, vitals, created_at in reversed(rows)],
+    )
+
+    data = {'patient_id': str(patient_id), 'window': risk_registry.window, **state.snapshot()}
+    return success_response(data)
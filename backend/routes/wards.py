@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+from flask import Blueprint, request
+from ..db import db
+from ..models import Patient, PatientLatestState
+from ..models.note import has_json_items
+from . import success_response, token_required
+
+
+wards_bp = Blueprint('wards', __name__)
+
+
+@wards_bp.get('/<ward>/summary')
+@token_required()
+def ward_summary(ward: str):
+    alerts_only = request.args.get('alerts_only') in {'1', 'true', 'True'}
+
+    query = (
+        db.session.query(PatientLatestState, Patient.name, Patient.mrn)
+        .join(Patient, Patient.id == PatientLatestState.patient_id)
+        .filter(PatientLatestState.ward == ward)
+    )
+    if alerts_only:
+        query = query.filter(has_json_items(PatientLatestState.latest_alerts))
+    rows = query.order_by(PatientLatestState.bed.asc(), PatientLatestState.patient_id.asc()).all()
+
+    patients = []
+    for state, name, mrn in rows:
+        item = state.to_dict()
+        item['name'] = name
+        item['mrn'] = mrn
+        patients.append(item)
+
+    meta = {
+        'count': len(patients),
+        'with_alerts': sum(1 for item in patients if item['latest_alerts']),
+        'unsigned_notes': sum(item['unsigned_count'] for item in patients),
+    }
+    return success_response({'ward': ward, 'patients': patients}, meta=meta)
@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+import statistics
+import time
+from typing import Callable, Dict, List, Sequence
+
+
+def percentile(samples: Sequence[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def measure(fn: Callable[[], object], *, repeat: int, warmup: int = 3) -> List[float]:
+    for _ in range(warmup):
+        fn()
+    samples: List[float] = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000.0)
+    return samples
+
+
+def summarize(samples: Sequence[float]) -> Dict[str, float]:
+    return {
+        'n': len(samples),
+        'mean_ms': statistics.fmean(samples) if samples else 0.0,
+        'p50_ms': percentile(samples, 50),
+        'p99_ms': percentile(samples, 99),
+    }
+
+
+def print_summary(label: str, samples: Sequence[float]) -> None:
+    stats = summarize(samples)
+    print(f"{label:<40} n={stats['n']:<6} mean={stats['mean_ms']:.3f}ms "
+          f"p50={stats['p50_ms']:.3f}ms p99={stats['p99_ms']:.3f}ms")
@@ -0,0 +1,47 @@
+"""Backfill the typed vitals columns added by migration 0006.
+
+Run after deploying the dual-writing code (rows written since then are
+already populated); safe to interrupt and resume with --after:
+
+    python -m backend.scripts.backfill_note_vitals --url mysql+pymysql://... --chunk 2000 --pause 0.05
+"""
+from __future__ import annotations
+
+import argparse
+import time
+
+from ..config import settings
+from ..db import make_engine
+from ..services.vitals_backfill import backfill_vitals
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default=settings.MYSQL_URL)
+    parser.add_argument('--chunk', type=int, default=2000)
+    parser.add_argument('--pause', type=float, default=0.05, help='seconds to sleep between chunks')
+    parser.add_argument('--after', type=int, default=0, help='resume after this note id')
+    parser.add_argument('--until', type=int, default=None, help='stop at this note id (default: current max)')
+    args = parser.parse_args()
+
+    engine = make_engine(args.url)
+    started = time.perf_counter()
+
+    def progress(last_id: int, updated: int) -> None:
+        print(f'through note id {last_id}: {updated} rows updated', end='\r', flush=True)
+
+    updated = backfill_vitals(
+        engine,
+        chunk_size=args.chunk,
+        pause_seconds=args.pause,
+        after_id=args.after,
+        until_id=args.until,
+        on_chunk=progress,
+    )
+    engine.dispose()
+    print()
+    print(f'updated {updated} notes in {time.perf_counter() - started:.1f}s')
+
+
+if __name__ == '__main__':  # pragma: no cover
+    main()
@@ -0,0 +1,50 @@
+"""Recompute patients.search_name / name_initials for existing rows.
+
+Run once after migration 0005 (safe to re-run; rows are walked in id order):
+
+    python -m backend.scripts.backfill_patient_search_keys --url mysql+pymysql://...
+"""
+from __future__ import annotations
+
+import argparse
+
+from sqlalchemy import text
+
+from ..config import settings
+from ..db import make_engine
+from ..models.patient import name_initials, normalize_search_text
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default=settings.MYSQL_URL)
+    parser.add_argument('--batch', type=int, default=5000)
+    args = parser.parse_args()
+
+    engine = make_engine(args.url)
+    select_batch = text('SELECT id, name FROM patients WHERE id > :after ORDER BY id LIMIT :batch')
+    update_row = text('UPDATE patients SET search_name = :search_name, name_initials = :name_initials WHERE id = :id')
+    after = 0
+    updated = 0
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(select_batch, {'after': after, 'batch': args.batch}).all()
+            if not rows:
+                break
+            conn.execute(update_row, [
+                {
+                    'id': patient_id,
+                    'search_name': normalize_search_text(name)[:100],
+                    'name_initials': name_initials(name)[:100],
+                }
+                for patient_id, name in rows
+            ])
+        after = rows[-1][0]
+        updated += len(rows)
+        print(f'updated {updated} patients', end='\r', flush=True)
+    print()
+    engine.dispose()
+
+
+if __name__ == '__main__':  # pragma: no cover
+    main()
@@ -0,0 +1,69 @@
+"""Compare per-dict detect_alerts with the vectorized batch engine.
+
+    python -m backend.scripts.bench_alerts --rows 1000000
+"""
+from __future__ import annotations
+
+import argparse
+import time
+
+import numpy as np
+
+from ..services.alerts import alert_codes, detect_alerts, detect_alerts_batch
+
+
+def _columns(rows: int) -> dict:
+    rng = np.random.default_rng(42)
+    columns = {
+        'temp': rng.normal(37.0, 0.8, rows).round(1),
+        'hr': rng.integers(40, 150, rows).astype(np.float64),
+        'rr': rng.integers(10, 30, rows).astype(np.float64),
+        'bp_sys': rng.integers(80, 200, rows).astype(np.float64),
+        'bp_dia': rng.integers(50, 120, rows).astype(np.float64),
+        'spo2': rng.integers(85, 101, rows).astype(np.float64),
+    }
+    # Knock out ~5% of readings to exercise the missing-value path.
+    for values in columns.values():
+        values[rng.random(rows) < 0.05] = np.nan
+    return columns
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    columns = _columns(args.rows)
+    names = list(columns)
+    dicts = [
+        {name: (None if np.isnan(value) else float(value)) for name, value in zip(names, row)}
+        for row in zip(*(columns[name].tolist() for name in names))
+    ]
+
+    started = time.perf_counter()
+    scalar = [detect_alerts(vitals) for vitals in dicts]
+    scalar_elapsed = time.perf_counter() - started
+
+    started = time.perf_counter()
+    mask = detect_alerts_batch(columns)
+    batch_elapsed = time.perf_counter() - started
+
+    started = time.perf_counter()
+    codes = alert_codes(mask)
+    decode_elapsed = time.perf_counter() - started
+
+    flagged_scalar = sum(1 for alerts in scalar if alerts)
+    flagged_batch = int(np.count_nonzero(mask))
+    assert flagged_scalar == flagged_batch, (flagged_scalar, flagged_batch)
+    assert len(codes) == args.rows
+
+    print(f'rows:                     {args.rows}')
+    print(f'detect_alerts (per dict): {scalar_elapsed:.3f}s  ({args.rows / scalar_elapsed:,.0f} rows/sec)')
+    print(f'detect_alerts_batch:      {batch_elapsed:.3f}s  ({args.rows / batch_elapsed:,.0f} rows/sec)')
+    print(f'alert_codes decode:       {decode_elapsed:.3f}s')
+    print(f'speedup (evaluate only):  {scalar_elapsed / batch_elapsed:.1f}x')
+    print(f'rows with alerts:         {flagged_batch}')
+
+
+if __name__ == '__main__':  # pragma: no cover
+    main()
@@ -0,0 +1,87 @@
+"""Measure per-request auth cost with and without the verified-token cache.
+
+    python -m backend.scripts.bench_auth --requests 20000 --tokens 50
+
+``--tokens`` distinct tokens are cycled through, like the bursts of small
+requests one page of the frontend sends with each user's token.
+
+The app is registered with ``db`` on ``--url`` (a temporary SQLite database
+by default), so the revocation list polls its real store: the "after" rows
+include the poll a lookup runs whenever the list is stale. ``--revoked``
+revocations are seeded first, and one poll is also timed on its own. That
+is the cost the background poller pays every AUTH refresh interval.
+"""
+from __future__ import annotations
+
+import argparse
+import itertools
+import os
+import tempfile
+import time
+import uuid
+
+from flask import Flask
+
+from .. import routes
+from ..db import db, engine_options
+from ..models import RevokedToken
+from ..routes import authenticate, decode_token, issue_token, revoke_token, token_required
+from ._common import measure, print_summary
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=20000)
+    parser.add_argument('--tokens', type=int, default=50)
+    parser.add_argument('--revoked', type=int, default=1000)
+    parser.add_argument('--url', help='database for the revocation store (default: temporary SQLite)')
+    args = parser.parse_args()
+
+    tokens = [issue_token(f'user{index}', 'nurse')['token'] for index in range(args.tokens)]
+    url = args.url or f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='carenotes-bench-auth-'), 'auth.db')}"
+    app = Flask(__name__)
+    app.config.update(SQLALCHEMY_DATABASE_URI=url, SQLALCHEMY_ENGINE_OPTIONS=engine_options(url))
+    db.init_app(app)
+
+    @app.get('/ping')
+    @token_required()
+    def ping():
+        return 'ok'
+
+    cache = routes.token_cache
+    if cache is None:
+        print('AUTH_CACHE_SIZE=0: the cached rows below measure the uncached path')
+
+    revocations = routes.revoked_tokens
+    with app.test_request_context():
+        RevokedToken.__table__.create(db.engine, checkfirst=True)
+        expires_at = time.time() + routes.TOKEN_TTL_SECONDS
+        for _ in range(args.revoked):
+            revoke_token(str(uuid.uuid4()), expires_at)
+        if revocations.store is not None:
+            print_summary('revocation poll (store.since)', measure(
+                lambda: revocations.store.since(0.0, time.time()), repeat=min(args.requests, 200),
+            ))
+
+        cycle = itertools.cycle(tokens)
+        print_summary('jwt.decode + AuthContext (before)', measure(
+            lambda: routes.AuthContext(username='', role='', payload=decode_token(next(cycle))),
+            repeat=args.requests,
+        ))
+        cycle = itertools.cycle(tokens)
+        print_summary('authenticate, cached (after)', measure(
+            lambda: authenticate(next(cycle)), repeat=args.requests,
+        ))
+
+    client = app.test_client()
+    for label, active in (('GET /ping, no cache', None), ('GET /ping, cached', cache)):
+        routes.token_cache = active
+        headers = itertools.cycle([{'Authorization': f'Bearer {token}'} for token in tokens])
+        print_summary(label, measure(lambda: client.get('/ping', headers=next(headers)), repeat=args.requests))
+    routes.token_cache = cache
+
+    print(routes.auth_metrics())
+
+
+if __name__ == '__main__':  # pragma: no cover
+    main()
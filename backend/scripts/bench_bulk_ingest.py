@@ -0,0 +1,78 @@
+"""Compare rows/sec for POST /notes (one note per request) and POST /notes/bulk.
+
+    python -m backend.scripts.bench_bulk_ingest --base http://127.0.0.1:5000/api --patient 1 --rows 2000
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import time
+from typing import Any, Dict, List
+
+import requests
+
+
+def _login(base: str) -> str:
+    response = requests.post(f'{base}/auth/login', json={'username': 'nurse', 'password': 'Passw0rd!'}, timeout=10)
+    response.raise_for_status()
+    return response.json()['data']['token']
+
+
+def _rows(patient_id: int, count: int) -> List[Dict[str, Any]]:
+    rng = random.Random(7)
+    return [
+        {
+            'patient_id': patient_id,
+            'vitals': {'temp': round(rng.uniform(36.0, 38.5), 1), 'hr': rng.randint(55, 130), 'spo2': rng.randint(88, 100)},
+            'pain_score': rng.randint(0, 10),
+            'subjective': 'bench',
+            'signed': rng.random() < 0.5,
+        }
+        for _ in range(count)
+    ]
+
+
+def _report(label: str, count: int, elapsed: float) -> None:
+    print(f'{label:<28} {count} rows in {elapsed:.2f}s  ->  {count / elapsed:.1f} rows/sec')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--base', default='http://127.0.0.1:5000/api')
+    parser.add_argument('--patient', type=int, required=True)
+    parser.add_argument('--rows', type=int, default=2000)
+    parser.add_argument('--single-rows', type=int, default=None, help='rows for the single-note path (default: --rows)')
+    args = parser.parse_args()
+
+    session = requests.Session()
+    session.headers['Authorization'] = f'Bearer {_login(args.base)}'
+
+    single = _rows(args.patient, args.single_rows or args.rows)
+    started = time.perf_counter()
+    for row in single:
+        session.post(f'{args.base}/notes', json=row, timeout=30).raise_for_status()
+    _report('POST /notes', len(single), time.perf_counter() - started)
+
+    rows = _rows(args.patient, args.rows)
+    started = time.perf_counter()
+    response = session.post(f'{args.base}/notes/bulk', json=rows, timeout=600)
+    response.raise_for_status()
+    _report('POST /notes/bulk (json)', len(rows), time.perf_counter() - started)
+    print('  meta:', response.json().get('meta'))
+
+    body = '\n'.join(json.dumps(row) for row in rows).encode('utf-8')
+    started = time.perf_counter()
+    response = session.post(
+        f'{args.base}/notes/bulk',
+        data=body,
+        headers={'Content-Type': 'application/x-ndjson'},
+        timeout=600,
+    )
+    response.raise_for_status()
+    _report('POST /notes/bulk (ndjson)', len(rows), time.perf_counter() - started)
+    print('  meta:', response.json().get('meta'))
+
+
+if __name__ == '__main__':  # pragma: no cover
+    main()
@@ -0,0 +1,94 @@
+"""Measure columnar export throughput (rows/sec).
+
+Synthetic rows, no database (isolates decode + encode):
+
+    python -m backend.scripts.bench_columnar_export --rows 500000
+
+Against a real database, into a scratch directory (full export each run):
+
+    python -m backend.scripts.bench_columnar_export --url mysql+pymysql://... --out /tmp/columnar
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import shutil
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Iterator, List, Tuple
+
+from sqlalchemy.orm import Session
+
+from ..db import make_engine
+from ..services.columnar_export import FORMATS, export_columnar, write_batches
+from ..services.note_export import stream_ndjson
+
+
+def _batches(rows: int, batch_size: int) -> Iterator[List[Tuple]]:
+    rng = random.Random(11)
+    start = datetime(2024, 1, 1)
+    meds = json.dumps([{'name': '头孢曲松', 'dose': '2g', 'route': 'iv', 'time': '08:00'}])
+    for offset in range(0, rows, batch_size):
+        batch = []
+        for index in range(offset, min(rows, offset + batch_size)):
+            vitals = json.dumps({
+                'temp': round(rng.uniform(36.0, 39.0), 1), 'hr': rng.randint(50, 140), 'rr': rng.randint(12, 28),
+                'bp_sys': rng.randint(90, 170), 'bp_dia': rng.randint(50, 100), 'spo2': rng.randint(88, 100),
+            })
+            batch.append((
+                index + 1, 1 + index % 20000, f'MRN{index % 20000:08d}', f'W{index % 40}', str(index % 60), None,
+                start + timedelta(minutes=index), index % 2, vitals, rng.randint(0, 10), 500, 400,
+                's', 'o', 'a', 'p', json.dumps([]), meds,
+            ))
+        yield batch
+
+
+def _report(label: str, rows: int, elapsed: float, extra: str = '') -> None:
+    print(f'{label:<24} {rows} rows in {elapsed:.2f}s  ->  {rows / elapsed:,.0f} rows/sec {extra}')
+
+
+def _size(root: Path) -> str:
+    total = sum(path.stat().st_size for path in root.rglob('*') if path.is_file())
+    return f'({total / 1024 / 1024:.1f} MiB)'
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=500_000)
+    parser.add_argument('--batch', type=int, default=5000)
+    parser.add_argument('--url', help='benchmark a full export from this database instead of synthetic rows')
+    parser.add_argument('--out', help='output directory for --url runs (wiped per format)')
+    args = parser.parse_args()
+
+    if args.url:
+        engine = make_engine(args.url)
+        base = Path(args.out or tempfile.mkdtemp(prefix='carenotes-columnar-'))
+        for output_format in sorted(FORMATS):
+            target = base / output_format
+            shutil.rmtree(target, ignore_errors=True)
+            with Session(engine) as session:
+                summary = export_columnar(session, target, output_format=output_format,
+                                          batch_size=args.batch, full=True, settle_seconds=0)
+            _report(f'db -> {output_format}', summary.rows, summary.elapsed_seconds or 1e-9, _size(target))
+        engine.dispose()
+        return
+
+    started = time.perf_counter()
+    size = sum(len(chunk) for chunk in stream_ndjson(_batches(args.rows, args.batch)))
+    _report('ndjson (baseline)', args.rows, time.perf_counter() - started, f'({size / 1024 / 1024:.1f} MiB)')
+
+    for output_format in sorted(FORMATS):
+        target = Path(tempfile.mkdtemp(prefix=f'carenotes-{output_format}-'))
+        try:
+            started = time.perf_counter()
+            rows, _, files = write_batches(_batches(args.rows, args.batch), target, output_format)
+            _report(output_format, rows, time.perf_counter() - started, f'{_size(target)} {len(files)} files')
+        finally:
+            shutil.rmtree(target, ignore_errors=True)
+
+
+if __name__ == '__main__':  # pragma: no cover
+    main()
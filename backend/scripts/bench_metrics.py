@@ -0,0 +1,71 @@
+"""Measure the per-request cost of the metrics hooks.
+
+    python -m backend.scripts.bench_metrics --requests 20000
+
+Reports the cost of the timing middleware around a bare WSGI callable and
+the end-to-end difference on a trivial route served through the test client
+with and without ``instrument_app``. The budget is 50us per request.
+"""
+from __future__ import annotations
+
+import argparse
+import statistics
+import sys
+
+from flask import Flask
+from werkzeug.test import EnvironBuilder
+
+from .. import metrics
+from ._common import measure, print_summary
+
+BUDGET_US = 50.0
+
+
+def _app(instrumented: bool) -> Flask:
+    app = Flask(__name__)
+
+    @app.get('/ping/<int:item>')
+    def ping(item: int):
+        return 'ok'
+
+    if instrumented:
+        metrics.instrument_app(app)
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=20000)
+    args = parser.parse_args()
+
+    def bare(environ, start_response):
+        start_response('200 OK', [])
+        return [b'ok']
+
+    def noop(status, headers, exc_info=None):
+        return None
+
+    environ = EnvironBuilder(path='/ping/1').get_environ()
+    wrapped = metrics.RequestMetricsMiddleware(bare)
+    bare_samples = measure(lambda: bare(dict(environ), noop), repeat=args.requests, warmup=100)
+    wrapped_samples = measure(lambda: wrapped(dict(environ), noop), repeat=args.requests, warmup=100)
+    print_summary('bare WSGI callable', bare_samples)
+    print_summary('with RequestMetricsMiddleware', wrapped_samples)
+
+    results = {}
+    for instrumented in (False, True):
+        client = _app(instrumented).test_client()
+        label = 'GET /ping, instrumented' if instrumented else 'GET /ping, plain'
+        samples = measure(lambda: client.get('/ping/1'), repeat=args.requests, warmup=100)
+        print_summary(label, samples)
+        results[instrumented] = statistics.median(samples)
+
+    hook_us = (statistics.median(wrapped_samples) - statistics.median(bare_samples)) * 1000.0
+    delta_us = (results[True] - results[False]) * 1000.0
+    print(f'middleware cost p50: {hook_us:.1f}us  end-to-end delta p50: {delta_us:.1f}us  budget: {BUDGET_US:.0f}us')
+    if hook_us > BUDGET_US:
+        sys.exit(1)
+
+
+if __name__ == '__main__':  # pragma: no cover
+    main()
@@ -0,0 +1,127 @@
+"""Seed a scratch database with synthetic patients and benchmark GET /api/patients?q= queries.
+
+Usage (from the repository root, against a throwaway database):
+
+    python -m backend.scripts.bench_patient_search --url mysql+pymysql://u:p@localhost/carenotes_bench --seed
+    python -m backend.scripts.bench_patient_search --url ...
+
+The statements are the ones the endpoint issues (``build_search_query``);
+the target is p99 < 20ms per page at 500k patients.
+"""
+from __future__ import annotations
+
+import argparse
+import random
+from typing import Dict, List
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..db import make_engine
+from ..migrate import upgrade
+from ..models.patient import name_initials, normalize_search_text
+from ..services.patient_search import search_patients
+from ._common import measure, percentile, print_summary
+
+
+TARGET_P99_MS = 20.0
+
+_SURNAMES = '王李张刘陈杨黄赵吴周徐孙马朱胡郭何高林罗郑梁谢宋唐许韩冯邓曹彭曾肖田董袁潘于蒋蔡余杜叶程苏魏吕丁任沈'
+_GIVEN = '伟芳娜秀英敏静丽强磊军洋勇艳杰娟涛明超秀兰霞平刚桂英华建国文辉鑫宇浩然子涵欣怡梓轩'
+_LATIN = ('John', 'Mary', 'David', 'Sarah', 'Michael', 'Emma', 'Daniel', 'Olivia')
+
+
+def _name(rng: random.Random) -> str:
+    if rng.random() < 0.1:
+        return f'{rng.choice(_LATIN)} {rng.choice(_LATIN)}son'
+    return rng.choice(_SURNAMES) + ''.join(rng.choice(_GIVEN) for _ in range(rng.randint(1, 2)))
+
+
+def seed(engine: Engine, *, patients: int, batch: int = 5000) -> None:
+    rng = random.Random(42)
+    insert_patient = text(
+        'INSERT INTO patients (name, mrn, ward, bed, search_name, name_initials) '
+        'VALUES (:name, :mrn, :ward, :bed, :search_name, :name_initials)'
+    )
+    written = 0
+    while written < patients:
+        size = min(batch, patients - written)
+        rows: List[Dict[str, object]] = []
+        for offset in range(size):
+            index = written + offset
+            name = _name(rng)
+            rows.append({
+                'name': name,
+                'mrn': f'MRN{index:08d}',
+                'ward': f'W{index % 40}',
+                'bed': str(index % 60),
+                'search_name': normalize_search_text(name),
+                'name_initials': name_initials(name),
+            })
+        with engine.begin() as conn:
+            conn.execute(insert_patient, rows)
+        written += size
+        print(f'seeded {written}/{patients} patients', end='\r', flush=True)
+    print()
+
+
+_CASES = {
+    'mrn prefix': {'q': 'MRN0004'},
+    'mrn exact': {'q': 'MRN00000042'},
+    'hanzi name prefix': {'q': '王'},
+    'hanzi full name': {'q': '张伟'},
+    'pinyin initials (1)': {'q': 'w'},
+    'pinyin initials (2)': {'q': 'zw'},
+    'latin name prefix': {'q': 'mary e'},
+    'ward census': {'ward': 'W5'},
+    'ward + bed prefix': {'ward': 'W5', 'bed': '1'},
+    'initials within ward': {'q': 'l', 'ward': 'W7'},
+}
+
+
+def run(engine: Engine, *, repeat: int, limit: int) -> bool:
+    ok = True
+    with Session(engine) as session:
+        for label, params in _CASES.items():
+            def page() -> None:
+                search_patients(session, limit=limit, **params)
+                session.expunge_all()
+
+            samples = measure(page, repeat=repeat)
+            print_summary(label, samples)
+            if percentile(samples, 99) > TARGET_P99_MS:
+                print(f'  !! p99 above {TARGET_P99_MS:.0f}ms target')
+                ok = False
+
+            # A second page exercises the keyset cursor.
+            _, cursor, _ = search_patients(session, limit=limit, **params)
+            if cursor:
+                samples = measure(lambda: search_patients(session, limit=limit, cursor=cursor, **params), repeat=repeat)
+                print_summary(f'{label} (page 2)', samples)
+    return ok
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default=settings.MYSQL_URL)
+    parser.add_argument('--seed', action='store_true', help='insert synthetic patients before benchmarking')
+    parser.add_argument('--patients', type=int, default=500_000)
+    parser.add_argument('--limit', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    engine = make_engine(args.url)
+    upgrade(engine)
+    if args.seed:
+        seed(engine, patients=args.patients)
+    with engine.connect() as conn:
+        print(f"patients: {conn.execute(text('SELECT COUNT(*) FROM patients')).scalar()}")
+    ok = run(engine, repeat=args.repeat, limit=args.limit)
+    engine.dispose()
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':  # pragma: no cover
+    raise SystemExit(main())
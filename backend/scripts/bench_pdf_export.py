@@ -0,0 +1,67 @@
+"""Compare per-note PDF rendering with the single-pass patient packet.
+
+    python -m backend.scripts.bench_pdf_export --notes 200
+"""
+from __future__ import annotations
+
+import argparse
+import tempfile
+import time
+from typing import Any, Dict, List
+
+from ..services.pdf import generate_note_pdf, generate_notes_pdf, generate_notes_zip
+
+
+def _fake_notes(count: int) -> List[Dict[str, Any]]:
+    return [
+        {
+            'id': str(index + 1),
+            'patient_id': '1',
+            'encounter_id': '1',
+            'created_at': f'2024-01-01T{index % 24:02d}:00:00Z',
+            'vitals': {'temp': 37.2, 'hr': 88, 'rr': 18, 'bp_sys': 128, 'bp_dia': 76, 'spo2': 97},
+            'pain_score': 2,
+            'intake_ml': 800,
+            'output_ml': 650,
+            'subjective': '患者诉轻微头痛',
+            'objective': '神志清楚，生命体征平稳',
+            'assessment': '病情稳定',
+            'plan': '继续观察，按时服药',
+            'med_given': [{'name': '对乙酰氨基酚', 'dose': '0.5g', 'route': 'PO', 'time': '2024-01-01T08:00:00'}],
+            'alerts': [],
+            'signed': True,
+        }
+        for index in range(count)
+    ]
+
+
+def _report(label: str, count: int, elapsed: float) -> None:
+    print(f'{label:<28} {count} notes in {elapsed:.2f}s  ->  {count / elapsed:.1f} notes/sec')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--notes', type=int, default=200)
+    args = parser.parse_args()
+
+    patient = {'id': '1', 'name': '测试患者', 'gender': 'F', 'mrn': 'MRN0001', 'ward': '5', 'bed': '12'}
+    notes = _fake_notes(args.notes)
+
+    started = time.perf_counter()
+    for note in notes:
+        generate_note_pdf(note, patient=patient)
+    _report('per-note (N layouts)', len(notes), time.perf_counter() - started)
+
+    with tempfile.TemporaryFile() as spool:
+        started = time.perf_counter()
+        generate_notes_pdf(notes, patient=patient, target=spool)
+        _report('packet pdf (1 layout)', len(notes), time.perf_counter() - started)
+
+    with tempfile.TemporaryFile() as spool:
+        started = time.perf_counter()
+        generate_notes_zip(notes, patient=patient, target=spool)
+        _report('packet zip (1 layout)', len(notes), time.perf_counter() - started)
+
+
+if __name__ == '__main__':  # pragma: no cover
+    main()
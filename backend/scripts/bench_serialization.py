@@ -0,0 +1,99 @@
+"""Compare per-row to_dict + stdlib json with the compiled schema serializer.
+
+    python -m backend.scripts.bench_serialization --rows 5000
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+
+from ..models import Note
+from ..models.note import NOTE_SCHEMA
+from ..serialization import dumps, isoformat, load_json, orjson
+from ._common import measure, print_summary
+
+
+def _notes(count: int) -> List[Note]:
+    """Transient Note instances (never added to a session)."""
+    rng = random.Random(3)
+    start = datetime(2024, 1, 1)
+    notes = []
+    for index in range(count):
+        note = Note(
+            id=index + 1,
+            patient_id=rng.randint(1, 500),
+            encounter_id=None,
+            created_at=start + timedelta(minutes=index),
+            pain_score=rng.randint(0, 10),
+            intake_ml=500,
+            output_ml=400,
+            subjective='患者诉夜间睡眠差，偶有头晕。' * 3,
+            objective='神志清，精神可，双肺呼吸音清。',
+            assessment='生命体征平稳。',
+            plan='继续观察，按时巡视。',
+            signed=1,
+            transcript=None,
+        )
+        note.set_json_fields(
+            vitals={'temp': 37.2, 'hr': rng.randint(50, 140), 'rr': 18, 'bp_sys': 120, 'bp_dia': 80, 'spo2': 97},
+            med_given=[{'name': '对乙酰氨基酚', 'dose': '0.5g'}],
+            alerts=[],
+        )
+        notes.append(note)
+    return notes
+
+
+def _legacy_to_dict(note: Any) -> Dict[str, Any]:
+    """The hand-written Note.to_dict this layer replaced."""
+    return {
+        'id': str(note.id) if note.id is not None else None,
+        'patient_id': str(note.patient_id) if note.patient_id is not None else None,
+        'encounter_id': str(note.encounter_id) if note.encounter_id is not None else None,
+        'created_at': isoformat(note.created_at),
+        'vitals': load_json(note.vitals) or {'temp': None, 'hr': None, 'rr': None, 'bp_sys': None, 'bp_dia': None, 'spo2': None},
+        'pain_score': note.pain_score,
+        'intake_ml': note.intake_ml,
+        'output_ml': note.output_ml,
+        'subjective': note.subjective,
+        'objective': note.objective,
+        'assessment': note.assessment,
+        'plan': note.plan,
+        'med_given': load_json(note.med_given) or [],
+        'alerts': load_json(note.alerts) or [],
+        'signed': bool(note.signed),
+        'transcript': note.transcript,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    notes = _notes(args.rows)
+    print(f'rows: {args.rows}  orjson: {"yes" if orjson is not None else "no (stdlib fallback)"}')
+
+    def legacy() -> bytes:
+        payload = {'ok': True, 'data': {'notes': [_legacy_to_dict(note) for note in notes]}}
+        return json.dumps(payload).encode('utf-8')
+
+    def schema_full() -> bytes:
+        return dumps({'ok': True, 'data': {'notes': NOTE_SCHEMA.dump_many(notes)}})
+
+    def schema_projected() -> bytes:
+        return dumps({'ok': True, 'data': {'notes': NOTE_SCHEMA.dump_many(notes, ('id', 'created_at', 'vitals'))}})
+
+    for label, fn in (('to_dict + json.dumps', legacy),
+                      ('schema + dumps', schema_full),
+                      ('schema + dumps ?fields=id,created_at,vitals', schema_projected)):
+        samples = measure(fn, repeat=args.repeat)
+        print_summary(label, samples)
+        print(f'  body: {len(fn()):,} bytes')
+
+
+if __name__ == '__main__':  # pragma: no cover
+    main()
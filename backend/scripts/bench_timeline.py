@@ -0,0 +1,157 @@
+"""Seed a scratch database with synthetic notes and benchmark the timeline/audit queries.
+
+Usage (from the repository root, against a throwaway database):
+
+    python -m backend.scripts.bench_timeline --url mysql+pymysql://u:p@localhost/carenotes_bench --seed
+    python -m backend.scripts.bench_timeline --url ...
+
+Each query is timed twice: once with the migration indexes hidden via
+``IGNORE INDEX`` (the "before" plan) and once as MySQL would normally plan it.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from ..config import settings
+from ..db import make_engine
+from ..migrate import upgrade
+from ._common import measure, print_summary
+
+
+NOTE_INDEXES = 'ix_notes_patient_created, ix_notes_patient_signed'
+AUDIT_INDEXES = 'ix_audit_events_entity'
+PATIENT_INDEXES = 'ix_patients_mrn, ix_patients_ward_bed'
+
+
+def seed(engine: Engine, *, notes: int, patients: int, batch: int = 5000) -> None:
+    rng = random.Random(42)
+    start = datetime(2024, 1, 1)
+    with engine.begin() as conn:
+        conn.execute(
+            text('INSERT INTO patients (name, mrn, ward, bed) VALUES (:name, :mrn, :ward, :bed)'),
+            [
+                {'name': f'Bench {i}', 'mrn': f'MRN{i:08d}', 'ward': f'W{i % 40}', 'bed': str(i % 60)}
+                for i in range(patients)
+            ],
+        )
+        first_id = conn.execute(text('SELECT MIN(id) FROM patients WHERE mrn = :mrn'), {'mrn': 'MRN00000000'}).scalar()
+
+    insert_note = text(
+        'INSERT INTO notes (patient_id, created_at, vitals, alerts, signed, subjective) '
+        'VALUES (:patient_id, :created_at, :vitals, :alerts, :signed, :subjective)'
+    )
+    insert_audit = text(
+        'INSERT INTO audit_events (user, action, entity, entity_id, at) '
+        'VALUES (:user, :action, :entity, :entity_id, :at)'
+    )
+    written = 0
+    while written < notes:
+        size = min(batch, notes - written)
+        note_rows: List[Dict[str, object]] = []
+        audit_rows: List[Dict[str, object]] = []
+        for offset in range(size):
+            # Skew towards a handful of long-stay patients so their timelines get deep.
+            if rng.random() < 0.3:
+                patient_id = first_id + rng.randrange(min(patients, 20))
+            else:
+                patient_id = first_id + rng.randrange(patients)
+            created_at = start + timedelta(minutes=rng.randrange(60 * 24 * 365))
+            hr = rng.randint(45, 140)
+            note_rows.append({
+                'patient_id': patient_id,
+                'created_at': created_at,
+                'vitals': json.dumps({'temp': round(rng.uniform(35.5, 39.5), 1), 'hr': hr, 'spo2': rng.randint(85, 100)}),
+                'alerts': json.dumps(['心率异常 ≥120bpm'] if hr >= 120 else []),
+                'signed': rng.randint(0, 1),
+                'subjective': 'bench',
+            })
+            audit_rows.append({
+                'user': 'bench', 'action': 'create', 'entity': 'note',
+                'entity_id': written + offset + 1, 'at': created_at,
+            })
+        with engine.begin() as conn:
+            conn.execute(insert_note, note_rows)
+            conn.execute(insert_audit, audit_rows)
+        written += size
+        print(f'seeded {written}/{notes} notes', end='\r', flush=True)
+    print()
+
+
+def _queries(patient_id: int, since: datetime) -> Dict[str, tuple[str, str, Dict[str, object]]]:
+    return {
+        'timeline page': (
+            'notes',
+            'SELECT * FROM notes {hint} WHERE patient_id = :pid AND created_at >= :since '
+            'ORDER BY created_at DESC, id DESC LIMIT 51',
+            {'pid': patient_id, 'since': since},
+        ),
+        'timeline signed_only': (
+            'notes',
+            'SELECT * FROM notes {hint} WHERE patient_id = :pid AND signed = 1 '
+            'ORDER BY created_at DESC, id DESC LIMIT 51',
+            {'pid': patient_id},
+        ),
+        'audit by entity': (
+            'audit',
+            "SELECT * FROM audit_events {hint} WHERE entity = 'note' AND entity_id = :eid ORDER BY at DESC",
+            {'eid': 12345},
+        ),
+        'patient by mrn': (
+            'patients',
+            'SELECT * FROM patients {hint} WHERE mrn = :mrn',
+            {'mrn': 'MRN00000042'},
+        ),
+        'ward census': (
+            'patients',
+            "SELECT * FROM patients {hint} WHERE ward = 'W5' ORDER BY bed",
+            {},
+        ),
+    }
+
+
+def run(engine: Engine, *, repeat: int) -> None:
+    hints = {
+        'notes': f'IGNORE INDEX ({NOTE_INDEXES})',
+        'audit': f'IGNORE INDEX ({AUDIT_INDEXES})',
+        'patients': f'IGNORE INDEX ({PATIENT_INDEXES})',
+    }
+    with engine.connect() as conn:
+        patient_id = conn.execute(text('SELECT MIN(id) FROM patients')).scalar()
+        since = datetime(2024, 6, 1)
+        for label, (table, sql, params) in _queries(patient_id, since).items():
+            for phase, hint in (('before', hints[table]), ('after', '')):
+                statement = text(sql.format(hint=hint))
+                plan = conn.execute(text('EXPLAIN ' + sql.format(hint=hint)), params).mappings().all()
+                for row in plan:
+                    print(f"  [{phase}] {label}: type={row.get('type')} key={row.get('key')} "
+                          f"rows={row.get('rows')} extra={row.get('Extra')}")
+                samples = measure(lambda: conn.execute(statement, params).fetchall(), repeat=repeat)
+                print_summary(f'{label} ({phase})', samples)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default=settings.MYSQL_URL)
+    parser.add_argument('--seed', action='store_true', help='insert synthetic rows before benchmarking')
+    parser.add_argument('--notes', type=int, default=1_000_000)
+    parser.add_argument('--patients', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    engine = make_engine(args.url)
+    upgrade(engine)
+    if args.seed:
+        seed(engine, notes=args.notes, patients=args.patients)
+    run(engine, repeat=args.repeat)
+    engine.dispose()
+
+
+if __name__ == '__main__':  # pragma: no cover
+    main()
@@ -0,0 +1,145 @@
+"""Check that the streaming note export holds at most one batch in memory.
+
+    python -m backend.scripts.check_export_memory --rows 200000 --batch 1000
+
+Seeds ``--rows`` notes into a SQLite database (``--db``, a temporary file by
+default; an existing file with enough notes is reused) and streams them the
+way the /api/export/notes.* endpoints do: ``build_export_query`` ->
+``iter_batches`` (stream_results + yield_per + partitions) -> the NDJSON/CSV
+generators. Each format runs twice, over the first ten batches (``until_id``)
+and over every row. The script fails if a partition exceeds the batch size,
+rows go missing, more than one batch is ever alive at once, or peak traced
+memory grows with the row count rather than the batch size.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import tempfile
+import tracemalloc
+import weakref
+from datetime import datetime, timedelta
+from typing import Any, Callable, Iterator, Optional, Sequence, Tuple
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from ..db import db, make_engine
+from ..models import Note, Patient
+from ..serialization import dump_json
+from ..services.note_export import build_export_query, iter_batches, stream_csv, stream_ndjson
+
+SEED_CHUNK = 5000
+PATIENTS = 500
+
+
+class _Batch(list):
+    """A list that can be weak-referenced, so live batches can be counted."""
+
+
+class _BatchCounter:
+    def __init__(self, batches: Iterator[Sequence[Any]], batch_size: int) -> None:
+        self.batches = batches
+        self.batch_size = batch_size
+        self.rows = 0
+        self.alive = 0
+        self.max_alive = 0
+        self.max_partition = 0
+
+    def _released(self) -> None:
+        self.alive -= 1
+
+    def __iter__(self) -> Iterator[_Batch]:
+        for partition in self.batches:
+            batch = _Batch(partition)
+            del partition
+            self.rows += len(batch)
+            self.max_partition = max(self.max_partition, len(batch))
+            self.alive += 1
+            self.max_alive = max(self.max_alive, self.alive)
+            weakref.finalize(batch, self._released)
+            yield batch
+            del batch
+
+
+def _seed(engine: Engine, rows: int) -> None:
+    db.metadata.create_all(engine, tables=[Patient.__table__, Note.__table__])
+    with engine.begin() as conn:
+        existing = conn.execute(select(func.count()).select_from(Note.__table__)).scalar_one()
+        if existing >= rows:
+            return
+        if not conn.execute(select(func.count()).select_from(Patient.__table__)).scalar_one():
+            conn.execute(insert(Patient.__table__), [
+                {'id': index, 'name': f'患者{index}', 'mrn': f'MRN{index:08d}', 'ward': 'W5', 'bed': str(index % 60)}
+                for index in range(1, PATIENTS + 1)
+            ])
+    start = datetime(2024, 1, 1)
+    vitals = dump_json({'temp': 37.1, 'hr': 88, 'spo2': 97})
+    meds = dump_json([{'name': '对乙酰氨基酚', 'dose': '0.5g', 'route': 'po', 'time': '08:00'}])
+    alerts = dump_json(['心率异常 ≥120bpm'])
+    for offset in range(existing, rows, SEED_CHUNK):
+        with engine.begin() as conn:
+            conn.execute(insert(Note.__table__), [
+                {'patient_id': 1 + index % PATIENTS, 'created_at': start + timedelta(seconds=index),
+                 'signed': index % 2, 'vitals': vitals, 'temp': 37.1, 'hr': 88, 'spo2': 97,
+                 'pain_score': 3, 'intake_ml': 500, 'output_ml': 400,
+                 'subjective': '患者夜间睡眠差', 'objective': '神志清', 'assessment': '平稳', 'plan': '继续观察',
+                 'alerts': alerts, 'med_given': meds}
+                for index in range(offset, min(offset + SEED_CHUNK, rows))
+            ])
+
+
+def _run(engine: Engine, stream: Callable, batch_size: int, until_id: Optional[int]) -> Tuple[int, int, _BatchCounter]:
+    with Session(engine) as session:
+        tracemalloc.start()
+        counter = _BatchCounter(iter_batches(session, build_export_query(until_id=until_id), batch_size), batch_size)
+        written = 0
+        for chunk in stream(iter(counter)):
+            written += len(chunk)
+            del chunk
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return written, peak, counter
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=200_000)
+    parser.add_argument('--batch', type=int, default=1000)
+    parser.add_argument('--db', default=os.path.join(tempfile.gettempdir(), 'carenotes-export-memory.db'))
+    args = parser.parse_args()
+
+    engine = make_engine(f'sqlite:///{args.db}')
+    _seed(engine, args.rows)
+    with engine.connect() as conn:
+        first_id, last_id = conn.execute(select(func.min(Note.id), func.max(Note.id))).one()
+        total = conn.execute(select(func.count()).select_from(Note.__table__)).scalar_one()
+    small_until = first_id + args.batch * 10 - 1
+
+    ok = True
+    for label, stream in (('ndjson', stream_ndjson), ('csv', stream_csv)):
+        _, small_peak, _ = _run(engine, stream, args.batch, small_until)
+        written, peak, counter = _run(engine, stream, args.batch, None)
+        print(f'{label:<7} rows={counter.rows} bytes={written:,} peak={peak / 1024:.0f}KiB '
+              f'(10 batches: {small_peak / 1024:.0f}KiB) max_live_batches={counter.max_alive} '
+              f'max_partition={counter.max_partition}')
+        if counter.rows != total:
+            print(f'  !! streamed {counter.rows} of {total} rows (ids {first_id}..{last_id})')
+            ok = False
+        if counter.max_partition > args.batch:
+            print(f'  !! a partition held {counter.max_partition} rows (batch {args.batch})')
+            ok = False
+        if counter.max_alive > 1:
+            print(f'  !! {counter.max_alive} batches were alive at once')
+            ok = False
+        if peak > small_peak * 1.5:
+            print('  !! peak memory grew with row count')
+            ok = False
+    engine.dispose()
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':  # pragma: no cover
+    sys.exit(main())
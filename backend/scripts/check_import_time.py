@@ -0,0 +1,78 @@
+"""Check that importing the backend stays fast and free of heavy dependencies.
+
+    python -m backend.scripts.check_import_time --budget-ms 1000 --runs 3
+
+Runs ``python -X importtime -c "import backend.app"`` in fresh interpreters
+and keeps the fastest run (the first one may be compiling bytecode). The
+script fails if that run exceeds the budget, or if any of HEAVY_MODULES was
+imported: those belong behind first use, not in every worker's startup.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import subprocess
+import sys
+from pathlib import Path
+from typing import List, Set, Tuple
+
+TARGET = 'backend.app'
+HEAVY_MODULES = ('openai', 'weasyprint', 'reportlab', 'pyarrow', 'numpy', 'pypinyin')
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+
+# (self us, cumulative us, module)
+Entry = Tuple[int, int, str]
+
+
+def _import_entries(target: str) -> Tuple[List[Entry], Set[str]]:
+    # importtime also lists imports that failed (an optional dependency that is
+    # not installed), so what actually got loaded is read from sys.modules.
+    script = f"import sys, {target}; print(' '.join(sorted({{name.split('.')[0] for name in sys.modules}})))"
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', script],
+        cwd=PROJECT_ROOT, env={**os.environ, 'PYTHONPATH': str(PROJECT_ROOT)},
+        capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        errors = [line for line in result.stderr.splitlines() if not line.startswith('import time:')]
+        raise SystemExit(f'import {target} failed:\n' + '\n'.join(errors[-20:]))
+    entries: List[Entry] = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        entries.append((int(self_us), int(cumulative_us), name.strip()))
+    return entries, set(result.stdout.split())
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--budget-ms', type=float, default=1000.0)
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--top', type=int, default=15)
+    args = parser.parse_args()
+
+    runs = [_import_entries(TARGET) for _ in range(max(args.runs, 1))]
+    totals = [next(cumulative for _, cumulative, name in entries if name == TARGET) for entries, _ in runs]
+    best = min(range(len(runs)), key=totals.__getitem__)
+    (entries, loaded), total_ms = runs[best], totals[best] / 1000.0
+
+    print(f'import {TARGET}: {total_ms:.1f}ms (best of {len(runs)}: '
+          f"{', '.join(f'{total / 1000.0:.0f}' for total in totals)}ms)  budget: {args.budget_ms:.0f}ms")
+    print('slowest imports (cumulative):')
+    for _, cumulative, name in sorted(entries, key=lambda entry: entry[1], reverse=True)[1:args.top + 1]:
+        print(f'  {cumulative / 1000.0:8.1f}ms  {name}')
+
+    ok = True
+    heavy = sorted(loaded & set(HEAVY_MODULES))
+    if heavy:
+        print(f"  !! imported at startup: {', '.join(heavy)}")
+        ok = False
+    if total_ms > args.budget_ms:
+        print(f'  !! {total_ms:.1f}ms is over the {args.budget_ms:.0f}ms budget')
+        ok = False
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':  # pragma: no cover
+    sys.exit(main())
@@ -0,0 +1,136 @@
+"""Check the parse cache end to end with the LLM call stubbed out.
+
+    python -m backend.scripts.check_parse_cache
+
+Drives ``parse_note`` and ``parse_note_async`` with ``_invoke_llm`` /
+``_invoke_llm_async`` replaced by a counter, so no request leaves the
+process, and checks that: equivalent texts share one LLM call; the SQLite
+tier answers for another worker (a fresh cache on the same file) and still
+works with the memory tier off; ``use_cache=False`` and failed calls are
+never served from or written to the cache. The script fails if any check does.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import sys
+import tempfile
+from typing import Callable, List
+
+from ..config import settings
+from ..services import llm_parse
+from ..services.parse_cache import ParseResultCache, build_parse_cache, cache_key
+
+RESULT = {'vitals': {'temp': 36.8, 'hr': 88}, 'med_given': [], 'alerts': []}
+
+
+class StubLLM:
+    def __init__(self) -> None:
+        self.calls = 0
+        self.fail = False
+
+    def __call__(self, text: str, model_override: str | None = None) -> str:
+        self.calls += 1
+        if self.fail:
+            raise ConnectionError('stubbed upstream failure')
+        return json.dumps(RESULT, ensure_ascii=False)
+
+    async def call_async(self, text: str, model_override: str | None = None) -> str:
+        return self(text, model_override)
+
+
+def _use(cache: ParseResultCache) -> ParseResultCache:
+    llm_parse.parse_cache = cache
+    return cache
+
+
+def check_equivalent_texts(stub: StubLLM, workdir: str) -> str | None:
+    cache = _use(build_parse_cache(max_entries=16, ttl_seconds=60))
+    first = llm_parse.parse_note('体温 36.8，心率 88')
+    second = llm_parse.parse_note('  体温　36.8，心率\t88 ')  # full-width space, extra whitespace
+    if first != RESULT or second != RESULT:
+        return f'unexpected result {second!r}'
+    if stub.calls != 1:
+        return f'{stub.calls} LLM calls for equivalent texts, expected 1'
+    if cache.stats.memory_hits != 1:
+        return f'memory_hits={cache.stats.memory_hits}, expected 1'
+    return None
+
+
+def check_persistent_tier(stub: StubLLM, workdir: str) -> str | None:
+    path = os.path.join(workdir, 'parse-cache.db')
+    _use(build_parse_cache(max_entries=0, ttl_seconds=60, sqlite_path=path, persistent_max_entries=100))
+    llm_parse.parse_note('血压 120/80')
+    other_worker = _use(build_parse_cache(max_entries=0, ttl_seconds=60, sqlite_path=path, persistent_max_entries=100))
+    if llm_parse.parse_note('血压 120/80') != RESULT:
+        return 'persistent hit returned a different result'
+    if stub.calls != 1:
+        return f'{stub.calls} LLM calls across workers, expected 1'
+    if other_worker.persistent is None or other_worker.stats.persistent_hits != 1:
+        return 'memory tier off disabled the persistent tier'
+    return None
+
+
+def check_async_path(stub: StubLLM, workdir: str) -> str | None:
+    path = os.path.join(workdir, 'parse-cache-async.db')
+    cache = _use(build_parse_cache(max_entries=16, ttl_seconds=60, sqlite_path=path, persistent_max_entries=100))
+
+    async def run() -> List[dict]:
+        return [await llm_parse.parse_note_async('呼吸 18'), await llm_parse.parse_note_async('呼吸 18')]
+
+    results = asyncio.run(run())
+    if results != [RESULT, RESULT] or stub.calls != 1:
+        return f'{stub.calls} LLM calls on the async path, expected 1'
+    if cache.persistent.get(cache_key('呼吸 18', settings.OPENAI_PARSE_MODEL, llm_parse.PROMPT_VERSION)) is None:
+        return 'async store did not reach the persistent tier'
+    return None
+
+
+def check_bypass_and_failures(stub: StubLLM, workdir: str) -> str | None:
+    cache = _use(build_parse_cache(max_entries=16, ttl_seconds=60))
+    llm_parse.parse_note('血氧 97', use_cache=False)
+    llm_parse.parse_note('血氧 97', use_cache=False)
+    if stub.calls != 2 or len(cache.memory):
+        return 'use_cache=False read or wrote the cache'
+    stub.fail = True
+    try:
+        llm_parse.parse_note('体温 39')
+    except RuntimeError:
+        pass
+    else:
+        return 'a failed LLM call did not raise'
+    stub.fail = False
+    calls = stub.calls
+    llm_parse.parse_note('体温 39')
+    if stub.calls != calls + 1:
+        return 'a failed LLM call was cached'
+    return None
+
+
+CHECKS: List[Callable[[StubLLM, str], str | None]] = [
+    check_equivalent_texts,
+    check_persistent_tier,
+    check_async_path,
+    check_bypass_and_failures,
+]
+
+
+def main() -> int:
+    original = (llm_parse._invoke_llm, llm_parse._invoke_llm_async, llm_parse.parse_cache)
+    failed = 0
+    try:
+        with tempfile.TemporaryDirectory(prefix='carenotes-parse-cache-') as workdir:
+            for check in CHECKS:
+                stub = StubLLM()
+                llm_parse._invoke_llm, llm_parse._invoke_llm_async = stub, stub.call_async
+                error = check(stub, workdir)
+                failed += error is not None
+                print(f"{'FAIL' if error else 'ok  '} {check.__name__}" + (f': {error}' if error else ''))
+    finally:
+        llm_parse._invoke_llm, llm_parse._invoke_llm_async, llm_parse.parse_cache = original
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':  # pragma: no cover
+    sys.exit(main())
@@ -0,0 +1,52 @@
+"""Incrementally export notes as Parquet / Arrow IPC partitioned by ward and month.
+
+    python -m backend.scripts.export_columnar --out /data/carenotes/vitals
+    python -m backend.scripts.export_columnar --out /data/... --format arrow --full
+
+Only notes newer than the watermark stored in ``<out>/_watermark.json`` are
+read; the watermark advances once every partition file has been written.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..db import make_engine
+from ..services.columnar_export import DEFAULT_SETTLE_SECONDS, FORMATS, export_columnar
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default=settings.MYSQL_URL)
+    parser.add_argument('--out', default=settings.COLUMNAR_EXPORT_DIR, required=not settings.COLUMNAR_EXPORT_DIR)
+    parser.add_argument('--format', choices=sorted(FORMATS), default=settings.COLUMNAR_EXPORT_FORMAT)
+    parser.add_argument('--batch', type=int, default=5000)
+    parser.add_argument('--full', action='store_true', help='ignore the watermark and export every note')
+    parser.add_argument('--settle-seconds', type=int, default=DEFAULT_SETTLE_SECONDS)
+    args = parser.parse_args()
+
+    engine = make_engine(args.url)
+
+    def progress(rows: int, last_note_id: int) -> None:
+        print(f'exported {rows} rows (note id {last_note_id})', end='\r', flush=True)
+
+    with Session(engine) as session:
+        summary = export_columnar(
+            session,
+            args.out,
+            output_format=args.format,
+            batch_size=args.batch,
+            full=args.full,
+            settle_seconds=args.settle_seconds,
+            on_batch=progress,
+        )
+    engine.dispose()
+    print()
+    print(json.dumps(summary.to_dict(), indent=2))
+
+
+if __name__ == '__main__':  # pragma: no cover
+    main()
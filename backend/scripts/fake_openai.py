@@ -0,0 +1,180 @@
+"""A local stand-in for the OpenAI API, for load tests.
+
+    python -m backend.scripts.fake_openai --port 8788 --latency-ms 300
+
+Answers the two calls the backend makes (``POST /v1/audio/transcriptions``
+and ``POST /v1/responses``) after a fixed delay, and records how many
+requests it held at once: the concurrency the API actually achieved. Point
+the API at it with ``OPENAI_BASE_URL=http://127.0.0.1:8788/v1``.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import threading
+import time
+from typing import Dict, Optional, Set, Tuple
+
+PARSED_NOTE = {
+    'vitals': {'temp': 36.8, 'hr': 88, 'rr': 18, 'bp_sys': 128, 'bp_dia': 82, 'spo2': 97},
+    'pain_score': 2,
+    'intake_ml': 500,
+    'output_ml': 300,
+    'subjective': '患者诉轻微头痛',
+    'objective': '神志清楚，生命体征平稳',
+    'assessment': '病情稳定',
+    'plan': '继续观察',
+    'med_given': [],
+    'alerts': [],
+}
+TRANSCRIPT = '体温三十六点八度，心率八十八，血压一百二十八比八十二，患者诉轻微头痛。'
+
+
+class FakeOpenAI:
+    """HTTP/1.1 keep-alive server on its own event loop thread."""
+
+    def __init__(self, latency: float, host: str = '127.0.0.1', port: int = 0) -> None:
+        self.latency = latency
+        self.host = host
+        self.port = port
+        self.requests = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._thread: Optional[threading.Thread] = None
+        self._connections: Set['asyncio.Task[None]'] = set()
+
+    @property
+    def url(self) -> str:
+        return f'http://{self.host}:{self.port}/v1'
+
+    def reset(self) -> None:
+        self.requests = 0
+        self.peak_in_flight = self.in_flight
+
+    def start(self) -> 'FakeOpenAI':
+        ready = threading.Event()
+
+        def run() -> None:
+            self._loop = asyncio.new_event_loop()
+            self._server = self._loop.run_until_complete(
+                asyncio.start_server(self._handle, self.host, self.port, backlog=4096))
+            self.port = self._server.sockets[0].getsockname()[1]
+            ready.set()
+            self._loop.run_forever()
+            self._loop.close()
+
+        self._thread = threading.Thread(target=run, name='fake-openai', daemon=True)
+        self._thread.start()
+        ready.wait()
+        return self
+
+    def stop(self) -> None:
+        if self._loop is not None:
+            asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop).result(timeout=5)
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
+
+    async def _shutdown(self) -> None:
+        self._server.close()
+        for task in list(self._connections):  # idle keep-alive connections
+            task.cancel()
+        await asyncio.gather(*self._connections, return_exceptions=True)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        task = asyncio.current_task()
+        self._connections.add(task)
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, _ = request_line.decode('latin-1').split(' ', 2)
+                headers: Dict[str, str] = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                if headers.get('transfer-encoding', '').lower() == 'chunked':
+                    await self._skip_chunked(reader)
+                else:
+                    await reader.readexactly(int(headers.get('content-length') or 0))
+
+                self.requests += 1
+                self.in_flight += 1
+                self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+                try:
+                    await asyncio.sleep(self.latency)
+                finally:
+                    self.in_flight -= 1
+
+                status, content_type, payload = self._reply(method, target.split('?', 1)[0])
+                writer.write(
+                    f'HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n'
+                    f'Content-Length: {len(payload)}\r\n\r\n'.encode('latin-1') + payload
+                )
+                await writer.drain()
+                if headers.get('connection', '').lower() == 'close':
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            pass  # cancelled: an idle connection at shutdown
+        finally:
+            self._connections.discard(task)
+            writer.close()
+
+    @staticmethod
+    async def _skip_chunked(reader: asyncio.StreamReader) -> None:
+        while True:
+            size = int((await reader.readline()).split(b';', 1)[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                return
+
+    @staticmethod
+    def _reply(method: str, path: str) -> Tuple[str, str, bytes]:
+        if method == 'POST' and path.endswith('/audio/transcriptions'):
+            return '200 OK', 'text/plain; charset=utf-8', TRANSCRIPT.encode('utf-8')
+        if method == 'POST' and path.endswith('/responses'):
+            text = json.dumps(PARSED_NOTE, ensure_ascii=False)
+            body = {
+                'id': 'resp_fake',
+                'object': 'response',
+                'created_at': int(time.time()),
+                'model': 'fake',
+                'status': 'completed',
+                'output': [{
+                    'type': 'message',
+                    'id': 'msg_fake',
+                    'role': 'assistant',
+                    'status': 'completed',
+                    'content': [{'type': 'output_text', 'text': text, 'annotations': []}],
+                }],
+            }
+            return '200 OK', 'application/json', json.dumps(body, ensure_ascii=False).encode('utf-8')
+        error = {'error': {'message': f'not faked: {method} {path}', 'type': 'invalid_request_error'}}
+        return '404 Not Found', 'application/json', json.dumps(error).encode('utf-8')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8788)
+    parser.add_argument('--latency-ms', type=float, default=300.0)
+    args = parser.parse_args()
+
+    server = FakeOpenAI(args.latency_ms / 1000.0, args.host, args.port).start()
+    print(f'fake OpenAI API on {server.url} ({args.latency_ms:.0f}ms per call); Ctrl+C to stop')
+    try:
+        while True:
+            time.sleep(5)
+            print(f'requests={server.requests} in_flight={server.in_flight} peak={server.peak_in_flight}')
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == '__main__':  # pragma: no cover
+    main()
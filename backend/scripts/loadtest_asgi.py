@@ -0,0 +1,225 @@
+"""Compare per-process request capacity: threaded WSGI vs the ASGI mode.
+
+    python -m backend.scripts.loadtest_asgi --latency-ms 300 --levels 16,64,256 --threads 16
+
+Both modes serve the same app in this process against a local fake OpenAI
+server (see ``fake_openai``). WSGI mode models the synchronous server:
+``--threads`` threads, each holding its request for the whole upstream
+call. ASGI mode drives ``backend.asgi`` from one event loop. The clients are
+identical in both: ``C`` concurrent clients sending requests back to back.
+
+For every concurrency level the run prints throughput, p50/p99 latency and
+the peak number of OpenAI calls the fake server held at once, which is the
+concurrency the process actually reached. ``--endpoints note`` adds the
+async DB read path (a note is seeded into ``--url``, a temporary SQLite
+database by default, which needs aiosqlite). The run fails if any request
+does not return 200.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, Dict, List, Tuple
+
+from werkzeug.test import EnvironBuilder
+
+from ..config import settings
+from ._common import percentile
+from .fake_openai import FakeOpenAI
+
+# (method, path, headers, body)
+Request = Tuple[str, str, List[Tuple[str, str]], bytes]
+ENDPOINTS = ('parse', 'transcribe', 'note')
+_BOUNDARY = 'carenotes-loadtest'
+
+
+def _multipart(field: str, filename: str, content: bytes) -> bytes:
+    return (
+        f'--{_BOUNDARY}\r\nContent-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+        f'Content-Type: application/octet-stream\r\n\r\n'.encode('utf-8')
+        + content + f'\r\n--{_BOUNDARY}--\r\n'.encode('utf-8')
+    )
+
+
+def _request(kind: str, index: int, token: str, note_id: int) -> Request:
+    auth = ('Authorization', f'Bearer {token}')
+    if kind == 'parse':
+        # A distinct text per request, so the parse cache never answers.
+        body = json.dumps({'text': f'体温三十六点八度，心率八十八。#{index}'}, ensure_ascii=False).encode('utf-8')
+        return 'POST', '/api/notes/parse', [auth, ('Content-Type', 'application/json')], body
+    if kind == 'transcribe':
+        body = _multipart('file', 'audio.webm', os.urandom(2048))
+        return 'POST', '/api/notes/transcribe', [auth, ('Content-Type', f'multipart/form-data; boundary={_BOUNDARY}')], body
+    return 'GET', f'/api/notes/{note_id}', [auth], b''
+
+
+def _call_wsgi(app: Callable, request: Request) -> int:
+    method, path, headers, body = request
+    environ = EnvironBuilder(method=method, path=path, headers=headers, data=body).get_environ()
+    status: List[str] = []
+
+    def start_response(status_line: str, response_headers: object, exc_info: object = None) -> None:
+        status.append(status_line)
+
+    iterable = app(environ, start_response)
+    try:
+        for _ in iterable:
+            pass
+    finally:
+        close = getattr(iterable, 'close', None)
+        if close is not None:
+            close()
+    return int(status[0][:3])
+
+
+async def _call_asgi(app: Callable, request: Request) -> int:
+    method, target, headers, body = request
+    path, _, query = target.partition('?')
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': method,
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode('utf-8'),
+        'query_string': query.encode('latin-1'),
+        'root_path': '',
+        'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers],
+        'client': ('127.0.0.1', 0),
+        'server': ('127.0.0.1', 80),
+    }
+    pending = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    done = asyncio.Event()
+    status: List[int] = []
+
+    async def receive() -> Dict[str, object]:
+        if pending:
+            return pending.pop()
+        await done.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(message: Dict[str, object]) -> None:
+        if message['type'] == 'http.response.start':
+            status.append(message['status'])
+        elif not message.get('more_body'):
+            done.set()
+
+    await app(scope, receive, send)
+    return status[0]
+
+
+async def _run_level(call: Callable[[Request], Awaitable[int]], make_request: Callable[[int], Request],
+                     concurrency: int, per_client: int) -> Tuple[List[float], Counter, float]:
+    counter = itertools.count()
+    samples: List[float] = []
+    statuses: Counter = Counter()
+
+    async def client() -> None:
+        for _ in range(per_client):
+            request = make_request(next(counter))
+            started = time.perf_counter()
+            try:
+                statuses[await call(request)] += 1
+            except Exception as exc:  # a crash is a failed request, not a failed run
+                statuses[type(exc).__name__] += 1
+            samples.append((time.perf_counter() - started) * 1000.0)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return samples, statuses, time.perf_counter() - started
+
+
+def _seed_note(app: object) -> int:
+    from ..db import db
+    from ..models import Note, Patient
+
+    with app.app_context():
+        db.create_all()
+        patient = Patient(name='压测患者', ward='LT', bed='01')
+        note = Note(patient=patient, subjective='loadtest', plan='observe')
+        note.set_json_fields(vitals={'hr': 88, 'temp': 36.8}, med_given=[], alerts=[])
+        db.session.add(note)
+        db.session.commit()
+        return note.id
+
+
+async def _main(args: argparse.Namespace) -> int:
+    from ..app import create_app
+    from ..asgi import create_asgi_app
+    from ..routes import issue_token
+
+    fake = FakeOpenAI(args.latency_ms / 1000.0).start()
+    settings.openai_base_url = fake.url
+    settings.openai_api_key = 'loadtest'  # never send a real key, even to a local server
+    settings.mysql_url = args.url or f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='carenotes-loadtest-'), 'api.db')}"
+    app = create_app()
+    kinds = args.endpoints
+    note_id = _seed_note(app) if 'note' in kinds else 0
+    token = issue_token('loadtest', 'nurse')['token']
+
+    def make_request(index: int) -> Request:
+        return _request(kinds[index % len(kinds)], index, token, note_id)
+
+    loop = asyncio.get_running_loop()
+    threads = ThreadPoolExecutor(max_workers=args.threads, thread_name_prefix='wsgi-server')
+    asgi_app = create_asgi_app(app)
+    modes = {
+        'wsgi': lambda request: loop.run_in_executor(threads, _call_wsgi, app, request),
+        'asgi': lambda request: _call_asgi(asgi_app, request),
+    }
+
+    print(f"endpoints={','.join(kinds)} upstream latency={args.latency_ms:.0f}ms wsgi threads={args.threads}")
+    failed = 0
+    best: Dict[str, Tuple[int, float]] = {}
+    try:
+        for mode, call in modes.items():
+            await _run_level(call, make_request, min(8, args.levels[0]), 1)  # warm up clients and pools
+            for concurrency in args.levels:
+                fake.reset()
+                samples, statuses, elapsed = await _run_level(call, make_request, concurrency, args.per_client)
+                rps = len(samples) / elapsed
+                errors = sum(count for status, count in statuses.items() if status != 200)
+                failed += errors
+                peak, top = best.get(mode, (0, 0.0))
+                best[mode] = (max(peak, fake.peak_in_flight), max(top, rps))
+                print(f'{mode:<4} c={concurrency:<5} n={len(samples):<6} {rps:8.1f} req/s  '
+                      f'p50={percentile(samples, 50):8.1f}ms p99={percentile(samples, 99):8.1f}ms  '
+                      f'upstream peak={fake.peak_in_flight:<5} errors={errors}'
+                      + (f' {dict(statuses)}' if errors else ''))
+    finally:
+        await asgi_app.aclose()
+        threads.shutdown(wait=False)
+        fake.stop()
+
+    for mode, (peak, rps) in best.items():
+        print(f'{mode}: up to {peak} concurrent upstream calls, {rps:.1f} req/s per process')
+    return 0 if failed == 0 else 1
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--latency-ms', type=float, default=300.0)
+    parser.add_argument('--levels', type=lambda raw: [int(item) for item in raw.split(',')], default=[16, 64, 256])
+    parser.add_argument('--per-client', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=settings.ASGI_WSGI_THREADS)
+    parser.add_argument('--endpoints', type=lambda raw: [item for item in raw.split(',') if item],
+                        default=['parse', 'transcribe'])
+    parser.add_argument('--url', help='database for --endpoints note (default: temporary SQLite)')
+    args = parser.parse_args()
+    unknown = set(args.endpoints) - set(ENDPOINTS)
+    if unknown:
+        parser.error(f"unknown endpoints: {', '.join(sorted(unknown))}")
+    return asyncio.run(_main(args))
+
+
+if __name__ == '__main__':  # pragma: no cover
+    sys.exit(main())
@@ -0,0 +1,81 @@
+"""Check that patient reads stay fast while PDF exports are running.
+
+Start the API, create a patient with a few notes, then:
+
+    python -m backend.scripts.loadtest_export --base http://127.0.0.1:5000/api --patient 1
+
+The script measures GET /patients/<id> latency on its own, then again while
+``--exporters`` threads keep requesting the patient packet export.
+"""
+from __future__ import annotations
+
+import argparse
+import threading
+import time
+from collections import Counter
+from typing import List
+
+import requests
+
+from ._common import print_summary
+
+
+def _login(base: str) -> str:
+    response = requests.post(f'{base}/auth/login', json={'username': 'admin', 'password': 'Passw0rd!'}, timeout=10)
+    response.raise_for_status()
+    return response.json()['data']['token']
+
+
+def _probe(session: requests.Session, url: str, duration: float) -> List[float]:
+    samples: List[float] = []
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        session.get(url, timeout=30).raise_for_status()
+        samples.append((time.perf_counter() - started) * 1000.0)
+    return samples
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--base', default='http://127.0.0.1:5000/api')
+    parser.add_argument('--patient', type=int, required=True)
+    parser.add_argument('--exporters', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=20.0)
+    args = parser.parse_args()
+
+    token = _login(args.base)
+    headers = {'Authorization': f'Bearer {token}'}
+    probe_session = requests.Session()
+    probe_session.headers.update(headers)
+    probe_url = f'{args.base}/patients/{args.patient}'
+    export_url = f'{args.base}/export/patients/{args.patient}'
+
+    print_summary('GET /patients/<id> idle', _probe(probe_session, probe_url, args.duration / 2))
+
+    stop = threading.Event()
+    statuses: Counter = Counter()
+    lock = threading.Lock()
+
+    def exporter() -> None:
+        session = requests.Session()
+        session.headers.update(headers)
+        while not stop.is_set():
+            status = session.get(export_url, timeout=120).status_code
+            with lock:
+                statuses[status] += 1
+
+    threads = [threading.Thread(target=exporter, daemon=True) for _ in range(args.exporters)]
+    for thread in threads:
+        thread.start()
+    try:
+        print_summary('GET /patients/<id> under export load', _probe(probe_session, probe_url, args.duration))
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join(timeout=120)
+    print('export responses by status:', dict(statuses))
+
+
+if __name__ == '__main__':  # pragma: no cover
+    main()
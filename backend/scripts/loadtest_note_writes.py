@@ -0,0 +1,62 @@
+"""Measure POST /notes latency under concurrent writers.
+
+Run once with AUDIT_BUFFERED=0 and once with AUDIT_BUFFERED=1 to compare:
+
+    python -m backend.scripts.loadtest_note_writes --base http://127.0.0.1:5000/api --patient 1
+"""
+from __future__ import annotations
+
+import argparse
+import threading
+import time
+from typing import List
+
+import requests
+
+from ._common import print_summary
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--base', default='http://127.0.0.1:5000/api')
+    parser.add_argument('--patient', type=int, required=True)
+    parser.add_argument('--writers', type=int, default=16)
+    parser.add_argument('--per-writer', type=int, default=100)
+    args = parser.parse_args()
+
+    login = requests.post(f'{args.base}/auth/login', json={'username': 'nurse', 'password': 'Passw0rd!'}, timeout=10)
+    login.raise_for_status()
+    token = login.json()['data']['token']
+
+    samples: List[float] = []
+    lock = threading.Lock()
+
+    def writer() -> None:
+        session = requests.Session()
+        session.headers['Authorization'] = f'Bearer {token}'
+        local: List[float] = []
+        for _ in range(args.per_writer):
+            started = time.perf_counter()
+            session.post(
+                f'{args.base}/notes',
+                json={'patient_id': args.patient, 'vitals': {'hr': 80}, 'subjective': 'loadtest'},
+                timeout=30,
+            ).raise_for_status()
+            local.append((time.perf_counter() - started) * 1000.0)
+        with lock:
+            samples.extend(local)
+
+    threads = [threading.Thread(target=writer) for _ in range(args.writers)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    print_summary(f'POST /notes x{args.writers} writers', samples)
+    print(f'throughput: {len(samples) / elapsed:.1f} writes/sec')
+
+
+if __name__ == '__main__':  # pragma: no cover
+    main()
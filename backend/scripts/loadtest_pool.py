@@ -0,0 +1,126 @@
+"""Check that the connection pool does not leak under sustained read traffic.
+
+Start the API (ideally with a small DB_POOL_SIZE / DB_MAX_OVERFLOW so leaks
+show up quickly), create a patient with a few notes, then:
+
+    python -m backend.scripts.loadtest_pool --base http://127.0.0.1:5000/api --patient 1 --requests 10000
+
+Each worker cycles through a mix of read endpoints, including one that
+returns 404, so error paths are covered as well. Pool counters from
+GET /api/db/pool are read before and after. The run fails (exit code 1) if
+any request failed with a server error, if a connection is still checked out
+afterwards, or if checkouts and checkins do not match.
+"""
+from __future__ import annotations
+
+import argparse
+import itertools
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, List
+
+import requests
+
+from ._common import print_summary
+
+
+def _login(base: str) -> str:
+    response = requests.post(f'{base}/auth/login', json={'username': 'admin', 'password': 'Passw0rd!'}, timeout=10)
+    response.raise_for_status()
+    return response.json()['data']['token']
+
+
+def _pool(session: requests.Session, base: str) -> Dict[str, Dict[str, Any]]:
+    response = session.get(f'{base}/db/pool', timeout=10)
+    response.raise_for_status()
+    return response.json()['data']
+
+
+def _paths(patient: int, ward: str) -> List[str]:
+    return [
+        f'/patients?limit=20&ward={ward}',
+        f'/patients/{patient}',
+        f'/patients/{patient}/notes?limit=20',
+        f'/wards/{ward}/summary',
+        f'/notes/vitals?patient_id={patient}&hr_min=0&limit=50',
+        '/patients/999999999',
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--base', default='http://127.0.0.1:5000/api')
+    parser.add_argument('--patient', type=int, required=True)
+    parser.add_argument('--ward', default='A')
+    parser.add_argument('--requests', type=int, default=10000)
+    parser.add_argument('--workers', type=int, default=32)
+    args = parser.parse_args()
+
+    token = _login(args.base)
+    admin = requests.Session()
+    admin.headers['Authorization'] = f'Bearer {token}'
+    before = _pool(admin, args.base)
+
+    paths = _paths(args.patient, args.ward)
+    counter = itertools.count()
+    samples: List[float] = []
+    statuses: Counter = Counter()
+    lock = threading.Lock()
+
+    def worker() -> None:
+        session = requests.Session()
+        session.headers['Authorization'] = f'Bearer {token}'
+        local: List[float] = []
+        local_statuses: Counter = Counter()
+        while True:
+            index = next(counter)
+            if index >= args.requests:
+                break
+            started = time.perf_counter()
+            response = session.get(args.base + paths[index % len(paths)], timeout=60)
+            local.append((time.perf_counter() - started) * 1000.0)
+            local_statuses[response.status_code] += 1
+        with lock:
+            samples.extend(local)
+            statuses.update(local_statuses)
+
+    threads = [threading.Thread(target=worker) for _ in range(args.workers)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    after = _pool(admin, args.base)
+    print_summary(f'GET mix x{args.workers} workers', samples)
+    print(f'throughput: {len(samples) / elapsed:.1f} req/sec  statuses: {dict(sorted(statuses.items()))}')
+
+    failures: List[str] = []
+    if statuses.get(500) or statuses.get(503):
+        failures.append(f'server errors: {statuses.get(500, 0) + statuses.get(503, 0)}')
+    for name, stats in after.items():
+        base = before.get(name, {})
+        checkouts = stats['checkouts'] - base.get('checkouts', 0)
+        checkins = stats['checkins'] - base.get('checkins', 0)
+        connects = stats['connects'] - base.get('connects', 0)
+        invalidations = stats['invalidations'] - base.get('invalidations', 0)
+        print(f"[{name}] checkouts={checkouts} checkins={checkins} connects={connects} "
+              f"invalidations={invalidations} checked_out_now={stats.get('checkedout')} "
+              f"max_checked_out={stats['max_checked_out']} capacity={stats.get('capacity')} "
+              f"mean_hold={stats['mean_hold_ms']}ms")
+        if stats.get('checkedout'):
+            failures.append(f'{name}: {stats["checkedout"]} connections still checked out')
+        if checkouts != checkins:
+            failures.append(f'{name}: {checkouts} checkouts vs {checkins} checkins')
+
+    if failures:
+        print('LEAK: ' + '; '.join(failures))
+        sys.exit(1)
+    print('no connection leak detected')
+
+
+if __name__ == '__main__':  # pragma: no cover
+    main()
@@ -0,0 +1,39 @@
+"""Bring the SQLite note search index (NOTE_SEARCH_PATH) up to date with the notes table.
+
+Run after restoring a database or before starting workers on a fresh host
+(safe to re-run; only notes missing from the index are read):
+
+    python -m backend.scripts.reindex_notes --path /var/lib/carenotes/search.db
+"""
+from __future__ import annotations
+
+import argparse
+import time
+
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..db import make_engine
+from ..services.note_search import SQLiteNoteIndex, build_note_index
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default=settings.MYSQL_URL)
+    parser.add_argument('--path', default=settings.NOTE_SEARCH_PATH, required=not settings.NOTE_SEARCH_PATH)
+    args = parser.parse_args()
+
+    index = build_note_index(args.path)
+    if not isinstance(index.backend, SQLiteNoteIndex):
+        raise SystemExit('SQLite FTS5 is unavailable; the in-process index cannot be built ahead of time')
+    engine = make_engine(args.url)
+    started = time.perf_counter()
+    with Session(engine) as session:
+        indexed = index.catch_up(session)
+    engine.dispose()
+    print(f'indexed {indexed} notes in {time.perf_counter() - started:.1f}s '
+          f'({index.backend.count()} in {args.path})')
+
+
+if __name__ == '__main__':  # pragma: no cover
+    main()
@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+try:  # optional: 3-10x faster encoding of large list responses
+    import orjson
+except ModuleNotFoundError:  # pragma: no cover - optional dependency
+    orjson = None
+
+
+def isoformat(value: datetime | None) -> str | None:
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        return value.replace(tzinfo=None).isoformat(timespec='seconds') + 'Z'
+    return value.astimezone().isoformat(timespec='seconds')
+
+
+def load_json(value: Any) -> Any:
+    """Decode a JSON column; values are stored as JSON text (see ``dump_json``)."""
+    if value is None:
+        return None
+    if isinstance(value, (dict, list)):
+        return value
+    try:
+        return orjson.loads(value) if orjson is not None else json.loads(value)
+    except (TypeError, ValueError):
+        return value
+
+
+def dump_json(value: Any) -> Any:
+    if value in (None, ''):
+        return None
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    return value
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return isoformat(value)
+    if isinstance(value, date):
+        return value.isoformat()
+    return str(value)
+
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+    def dumps(value: Any) -> bytes:
+        """Serialize to UTF-8 JSON bytes."""
+        return orjson.dumps(value, default=_default, option=_ORJSON_OPTIONS)
+else:  # pragma: no cover - exercised when orjson is not installed
+    _ENCODER = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'), default=_default)
+
+    def dumps(value: Any) -> bytes:
+        """Serialize to UTF-8 JSON bytes."""
+        return _ENCODER.encode(value).encode('utf-8')
+
+
+# -- column encoders ---------------------------------------------------------
+
+def id_str(value: Any) -> str | None:
+    return str(value) if value is not None else None
+
+
+def boolean(value: Any) -> bool:
+    return bool(value)
+
+
+def date_iso(value: Any) -> str | None:
+    return value.isoformat() if isinstance(value, date) else None
+
+
+def json_or(default: Callable[[], Any]) -> Callable[[Any], Any]:
+    """Decode a JSON column, substituting a fresh ``default()`` for empty values."""
+    def encode(value: Any) -> Any:
+        return load_json(value) or default()
+    return encode
+
+
+@dataclass(frozen=True)
+class Field:
+    name: str
+    encode: Optional[Callable[[Any], Any]] = None
+    attr: Optional[str] = None
+
+
+class UnknownFieldError(ValueError):
+    pass
+
+
+class Schema:
+    """Column-to-JSON mapping for one model, compiled once per projection.
+
+    Each projection is turned into a generated function that reads the
+    attributes and applies the encoders in a single dict literal, so there is
+    no per-field loop or ``to_dict`` indirection on the hot path.
+    """
+
+    def __init__(self, fields: Sequence[Field]) -> None:
+        self.fields = tuple(fields)
+        self.names = tuple(field.name for field in self.fields)
+        self._by_name = {field.name: field for field in self.fields}
+        self._compiled: Dict[Tuple[str, ...], Callable[[Any], Dict[str, Any]]] = {}
+
+    def project(self, names: Optional[Iterable[str]]) -> Tuple[str, ...]:
+        if names is None:
+            return self.names
+        wanted = tuple(dict.fromkeys(names))
+        unknown = [name for name in wanted if name not in self._by_name]
+        if unknown:
+            raise UnknownFieldError(','.join(unknown))
+        return wanted
+
+    def serializer(self, names: Optional[Iterable[str]] = None) -> Callable[[Any], Dict[str, Any]]:
+        projection = self.project(names)
+        compiled = self._compiled.get(projection)
+        if compiled is None:
+            compiled = self._compile(projection)
+            self._compiled[projection] = compiled
+        return compiled
+
+    def _compile(self, projection: Tuple[str, ...]) -> Callable[[Any], Dict[str, Any]]:
+        namespace: Dict[str, Any] = {}
+        items: List[str] = []
+        for index, name in enumerate(projection):
+            field = self._by_name[name]
+            attr = field.attr or field.name
+            if not attr.isidentifier():
+                raise ValueError(f'invalid attribute name: {attr!r}')
+            read = f'obj.{attr}'
+            if field.encode is not None:
+                namespace[f'_e{index}'] = field.encode
+                read = f'_e{index}({read})'
+            items.append(f'{name!r}: {read}')
+        source = 'def serialize(obj):\n    return {' + ', '.join(items) + '}\n'
+        exec(compile(source, f'<schema {",".join(projection)}>', 'exec'), namespace)
+        return namespace['serialize']
+
+    def dump(self, obj: Any, names: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        return self.serializer(names)(obj)
+
+    def dump_many(self, objs: Iterable[Any], names: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+        serialize = self.serializer(names)
+        return [serialize(obj) for obj in objs]
+
+
+def parse_fields(value: Optional[str]) -> Optional[Tuple[str, ...]]:
+    """Split a ``?fields=a,b,c`` parameter; ``None`` means every field."""
+    if not value:
+        return None
+    names = tuple(name.strip() for name in value.split(',') if name.strip())
+    return names or None
+
+
+__all__ = [
+    'Field',
+    'Schema',
+    'UnknownFieldError',
+    'boolean',
+    'date_iso',
+    'dump_json',
+    'dumps',
+    'id_str',
+    'isoformat',
+    'json_or',
+    'load_json',
+    'parse_fields',
+]
@@ -1,13 +1,35 @@
 ﻿from __future__ import annotations
 
-from .stt import transcribe_openai
-from .llm_parse import parse_note
-from .alerts import detect_alerts
-from .pdf import generate_note_pdf
-
-__all__ = [
-    'transcribe_openai',
-    'parse_note',
-    'detect_alerts',
-    'generate_note_pdf',
-]
+from importlib import import_module
+from typing import Any
+
+# Re-exports resolve on first attribute access, so importing one light
+# submodule (token_cache, parse_cache) does not pull in the OpenAI SDK,
+# NumPy or the PDF stack through this package.
+_EXPORTS = {
+    'transcribe_openai': '.stt',
+    'transcribe_openai_async': '.stt',
+    'transcribe_file': '.stt',
+    'transcribe_file_async': '.stt',
+    'spool_upload': '.stt',
+    'stitch_transcripts': '.stt',
+    'parse_note': '.llm_parse',
+    'parse_note_async': '.llm_parse',
+    'detect_alerts': '.alerts',
+    'detect_alerts_batch': '.alerts',
+    'generate_note_pdf': '.pdf',
+    'generate_notes_pdf': '.pdf',
+    'generate_notes_zip': '.pdf',
+}
+
+
+def __getattr__(name: str) -> Any:
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    value = getattr(import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+__all__ = list(_EXPORTS)
@@ -1,20 +1,71 @@
 ﻿from __future__ import annotations
 
-from typing import Dict, List, Optional
-
-
-_ALERT_MESSAGES = {
-    'temp_high': '体温异常 ≥38°C',
-    'temp_low': '体温异常 ≤35°C',
-    'hr_high': '心率异常 ≥120bpm',
-    'hr_low': '心率异常 ≤50bpm',
-    'bp_sys_high': '收缩压异常 ≥180mmHg',
-    'bp_sys_low': '收缩压异常 ≤90mmHg',
-    'bp_dia_high': '舒张压异常 ≥110mmHg',
-    'spo2_low': '血氧饱和度 ≤92%',
+import json
+import operator
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Mapping, Optional, Sequence, Tuple
+
+from ..config import settings
+from ..lazy import optional_import
+
+
+VITAL_FIELDS = ('temp', 'hr', 'rr', 'bp_sys', 'bp_dia', 'spo2')
+
+_OPERATORS: Dict[str, Callable[[float, float], bool]] = {
+    '>=': operator.ge,
+    '<=': operator.le,
+    '>': operator.gt,
+    '<': operator.lt,
 }
 
 
+@dataclass(frozen=True, slots=True)
+class AlertRule:
+    code: str
+    field: str
+    op: str
+    threshold: float
+    message: str
+
+
+DEFAULT_RULES: Tuple[AlertRule, ...] = (
+    AlertRule('temp_high', 'temp', '>=', 38.0, '体温异常 ≥38°C'),
+    AlertRule('temp_low', 'temp', '<=', 35.0, '体温异常 ≤35°C'),
+    AlertRule('hr_high', 'hr', '>=', 120, '心率异常 ≥120bpm'),
+    AlertRule('hr_low', 'hr', '<=', 50, '心率异常 ≤50bpm'),
+    AlertRule('bp_sys_high', 'bp_sys', '>=', 180, '收缩压异常 ≥180mmHg'),
+    AlertRule('bp_sys_low', 'bp_sys', '<=', 90, '收缩压异常 ≤90mmHg'),
+    AlertRule('bp_dia_high', 'bp_dia', '>=', 110, '舒张压异常 ≥110mmHg'),
+    AlertRule('spo2_low', 'spo2', '<=', 92, '血氧饱和度 ≤92%'),
+)
+
+
+def load_rules(path: str | Path) -> Tuple[AlertRule, ...]:
+    """Load a rule table from JSON: a list of {code, field, op, threshold, message}."""
+    raw = json.loads(Path(path).read_text(encoding='utf-8-sig'))
+    rules = []
+    for item in raw:
+        rule = AlertRule(
+            code=item['code'],
+            field=item['field'],
+            op=item['op'],
+            threshold=float(item['threshold']),
+            message=item['message'],
+        )
+        if rule.op not in _OPERATORS:
+            raise ValueError(f'invalid_alert_operator: {rule.op}')
+        if rule.field not in VITAL_FIELDS:
+            raise ValueError(f'invalid_alert_field: {rule.field}')
+        rules.append(rule)
+    if len(rules) > 64:
+        raise ValueError('too_many_alert_rules')
+    return tuple(rules)
+
+
+ALERT_RULES: Tuple[AlertRule, ...] = load_rules(settings.ALERT_RULES_PATH) if settings.ALERT_RULES_PATH else DEFAULT_RULES
+
+
 def _ensure_float(value: Optional[float | int]) -> Optional[float]:
     if value is None:
         return None
@@ -24,40 +75,21 @@ def _ensure_float(value: Optional[float | int]) -> Optional[float]:
         return None
 
 
-def detect_alerts(vitals: Optional[Dict[str, Optional[float | int]]]) -> List[str]:
+def detect_alerts(
+    vitals: Optional[Dict[str, Optional[float | int]]],
+    rules: Sequence[AlertRule] | None = None,
+) -> List[str]:
     if not vitals:
         return []
 
     alerts: List[str] = []
-
-    temp = _ensure_float(vitals.get('temp'))
-    if temp is not None:
-        if temp >= 38.0:
-            alerts.append(_ALERT_MESSAGES['temp_high'])
-        if temp <= 35.0:
-            alerts.append(_ALERT_MESSAGES['temp_low'])
-
-    hr = _ensure_float(vitals.get('hr'))
-    if hr is not None:
-        if hr >= 120:
-            alerts.append(_ALERT_MESSAGES['hr_high'])
-        if hr <= 50:
-            alerts.append(_ALERT_MESSAGES['hr_low'])
-
-    bp_sys = _ensure_float(vitals.get('bp_sys'))
-    if bp_sys is not None:
-        if bp_sys >= 180:
-            alerts.append(_ALERT_MESSAGES['bp_sys_high'])
-        if bp_sys <= 90:
-            alerts.append(_ALERT_MESSAGES['bp_sys_low'])
-
-    bp_dia = _ensure_float(vitals.get('bp_dia'))
-    if bp_dia is not None and bp_dia >= 110:
-        alerts.append(_ALERT_MESSAGES['bp_dia_high'])
-
-    spo2 = _ensure_float(vitals.get('spo2'))
-    if spo2 is not None and spo2 <= 92:
-        alerts.append(_ALERT_MESSAGES['spo2_low'])
+    values: Dict[str, Optional[float]] = {}
+    for rule in ALERT_RULES if rules is None else rules:
+        if rule.field not in values:
+            values[rule.field] = _ensure_float(vitals.get(rule.field))
+        value = values[rule.field]
+        if value is not None and _OPERATORS[rule.op](value, rule.threshold):
+            alerts.append(rule.message)
 
     seen = set()
     deduped = []
@@ -68,4 +100,70 @@ def detect_alerts(vitals: Optional[Dict[str, Optional[float | int]]]) -> List[st
     return deduped
 
 
-__all__ = ['detect_alerts']
+def _numpy():
+    # Only the batch engine needs NumPy; the per-note path never imports it.
+    np = optional_import('numpy')
+    if np is None:
+        raise RuntimeError('numpy_unavailable')
+    return np
+
+
+def _as_float_column(np, values, size: int):
+    if values is None:
+        return np.full(size, np.nan)
+    column = np.asarray(values, dtype=np.float64)
+    if column.shape != (size,):
+        raise ValueError('vitals_column_shape_mismatch')
+    return column
+
+
+def detect_alerts_batch(columns: Mapping[str, Sequence[float]], rules: Sequence[AlertRule] | None = None):
+    """Evaluate every rule over columnar vitals.
+
+    ``columns`` maps vital names to equal-length arrays (NaN marks a missing
+    reading). Returns a ``uint64`` array with bit ``i`` set when rule ``i``
+    fired for that row; decode it with :func:`alert_codes`.
+    """
+    np = _numpy()
+    rules = tuple(ALERT_RULES if rules is None else rules)
+    if len(rules) > 64:
+        raise ValueError('too_many_alert_rules')
+    sizes = {len(values) for values in columns.values()}
+    if len(sizes) > 1:
+        raise ValueError('vitals_column_shape_mismatch')
+    size = sizes.pop() if sizes else 0
+
+    arrays = {field: _as_float_column(np, columns.get(field), size) for field in {rule.field for rule in rules}}
+    mask = np.zeros(size, dtype=np.uint64)
+    # NaN compares False under every operator, so missing readings never fire.
+    with np.errstate(invalid='ignore'):
+        for bit, rule in enumerate(rules):
+            fired = _OPERATORS[rule.op](arrays[rule.field], rule.threshold)
+            mask |= fired.astype(np.uint64) << np.uint64(bit)
+    return mask
+
+
+def alert_codes(mask, rules: Sequence[AlertRule] | None = None) -> List[List[str]]:
+    """Expand a mask from :func:`detect_alerts_batch` into per-row rule codes."""
+    rules = tuple(ALERT_RULES if rules is None else rules)
+    decoded: Dict[int, List[str]] = {}
+    result: List[List[str]] = []
+    for value in _numpy().asarray(mask).tolist():
+        codes = decoded.get(value)
+        if codes is None:
+            codes = [rule.code for bit, rule in enumerate(rules) if value >> bit & 1]
+            decoded[value] = codes
+        result.append(codes)
+    return result
+
+
+__all__ = [
+    'AlertRule',
+    'ALERT_RULES',
+    'DEFAULT_RULES',
+    'VITAL_FIELDS',
+    'alert_codes',
+    'detect_alerts',
+    'detect_alerts_batch',
+    'load_rules',
+]
@@ -0,0 +1,213 @@
+from __future__ import annotations
+
+import atexit
+import json
+import logging
+import os
+import queue
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, TYPE_CHECKING
+
+from sqlalchemy import event, insert
+from sqlalchemy.exc import SQLAlchemyError
+
+from ..config import settings
+from ..db import db, db_now
+from ..models import AuditEvent
+from ..models.audit import audit_row
+
+if TYPE_CHECKING:  # pragma: no cover - hints only
+    from flask import Flask
+
+
+logger = logging.getLogger(__name__)
+
+_PENDING_KEY = 'carenotes_pending_audits'
+_NOW_KEY = 'carenotes_audit_now'
+
+
+class BufferedAuditWriter:
+    """Batches audit_events inserts across requests on a background thread.
+
+    Rows are handed over only after the request's transaction commits. The
+    queue is bounded; when it is full the row is written synchronously
+    instead. Rows the database refuses (a failed synchronous write, or
+    whatever is still pending when the writer stops) are appended to an
+    NDJSON file in ``spill_dir`` and inserted by the next writer to start,
+    so they are delayed rather than lost.
+    """
+
+    def __init__(self, *, max_queue: int, batch_size: int, flush_interval: float,
+                 spill_dir: str | Path) -> None:
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.spill_dir = Path(spill_dir)
+        self._queue: 'queue.Queue[Dict[str, Any]]' = queue.Queue(maxsize=max_queue)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._app: Optional['Flask'] = None
+        self.written = 0
+        self.fallbacks = 0
+        self.spilled = 0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def init_app(self, app: 'Flask') -> None:
+        if self.running:
+            return
+        self._app = app
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='carenotes-audit-writer', daemon=True)
+        self._thread.start()
+        if not event.contains(db.session, 'after_commit', _after_commit):
+            event.listen(db.session, 'after_commit', _after_commit)
+            event.listen(db.session, 'after_rollback', _after_rollback)
+        atexit.register(self.close)
+
+    def submit(self, row: Dict[str, Any]) -> None:
+        if self.running and not self._stop.is_set():
+            try:
+                self._queue.put_nowait(row)
+                return
+            except queue.Full:
+                pass
+        self.fallbacks += 1
+        if not self._write([row]):
+            self._spill([row])
+
+    def _drain(self, limit: int) -> List[Dict[str, Any]]:
+        rows: List[Dict[str, Any]] = []
+        while len(rows) < limit:
+            try:
+                rows.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return rows
+
+    def _write(self, rows: List[Dict[str, Any]]) -> bool:
+        try:
+            with self._app.app_context():
+                with db.engine.begin() as conn:
+                    conn.execute(insert(AuditEvent.__table__), rows)
+        except SQLAlchemyError:
+            logger.exception('audit flush failed; %d rows kept for retry', len(rows))
+            return False
+        self.written += len(rows)
+        return True
+
+    def _spill(self, rows: List[Dict[str, Any]]) -> None:
+        lines = ''.join(
+            json.dumps({**row, 'at': row['at'].isoformat() if row.get('at') else None}, ensure_ascii=False) + '\n'
+            for row in rows
+        )
+        # One file per process: workers never interleave writes in the same file.
+        path = self.spill_dir / f'audit-{os.getpid()}.ndjson'
+        try:
+            self.spill_dir.mkdir(parents=True, exist_ok=True)
+            with open(path, 'a', encoding='utf-8') as handle:
+                handle.write(lines)
+        except OSError:
+            logger.exception('audit spill to %s failed; %d rows lost: %r', path, len(rows), rows)
+            return
+        self.spilled += len(rows)
+        logger.error('audit write failed; %d rows spilled to %s', len(rows), path)
+
+    def _replay_spill(self) -> None:
+        """Insert rows spilled by earlier processes, claiming each file by renaming it."""
+        if not self.spill_dir.is_dir():
+            return
+        for path in sorted(self.spill_dir.glob('audit-*.ndjson')):
+            claimed = path.with_name(f'replay-{os.getpid()}-{time.time_ns()}.ndjson')
+            try:
+                os.replace(path, claimed)
+            except FileNotFoundError:  # another worker claimed it first
+                continue
+            try:
+                with open(claimed, encoding='utf-8') as handle:
+                    rows = [json.loads(line) for line in handle if line.strip()]
+                for row in rows:
+                    row['at'] = datetime.fromisoformat(row['at']) if row.get('at') else None
+            except (OSError, ValueError):
+                # Left under its claimed name, which is never replayed again.
+                logger.exception('unreadable audit spill file kept as %s', claimed)
+                continue
+            for start in range(0, len(rows), self.batch_size):
+                batch = rows[start:start + self.batch_size]
+                if not self._write(batch):
+                    self._spill(rows[start:])
+                    break
+            else:
+                logger.warning('replayed %d spilled audit rows from %s', len(rows), path.name)
+            claimed.unlink()
+
+    def _run(self) -> None:
+        self._replay_spill()
+        pending: List[Dict[str, Any]] = []
+        while True:
+            stopping = self._stop.wait(self.flush_interval)
+            pending.extend(self._drain(self.batch_size - len(pending)))
+            while pending and self._write(pending):
+                pending = self._drain(self.batch_size)
+            if stopping:
+                if pending:
+                    self._spill(pending + self._drain(self._queue.qsize()))
+                return
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Flush everything queued so far and stop the writer thread."""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def stats(self) -> Dict[str, int]:
+        return {'queued': self._queue.qsize(), 'written': self.written, 'fallbacks': self.fallbacks,
+                'spilled': self.spilled}
+
+
+audit_writer = BufferedAuditWriter(
+    max_queue=settings.AUDIT_BUFFER_SIZE,
+    batch_size=settings.AUDIT_BATCH_SIZE,
+    flush_interval=settings.AUDIT_FLUSH_INTERVAL_MS / 1000.0,
+    spill_dir=settings.AUDIT_SPILL_DIR or os.path.join(tempfile.gettempdir(), 'carenotes-audit-spill'),
+)
+
+
+def record_audit(*, user: Optional[str], action: str, entity: str, entity_id: Optional[int], diff: Any = None) -> None:
+    """Record an audit event for the current unit of work.
+
+    By default the row is added to the caller's session and commits together
+    with the entity it describes. With the buffered writer running it is held
+    on the session and queued once that transaction commits; its ``at`` is
+    read from the database clock (once per transaction), as the column
+    default would be.
+    """
+    row = audit_row(user=user, action=action, entity=entity, entity_id=entity_id, diff=diff)
+    if audit_writer.running:
+        info = db.session.info
+        if _NOW_KEY not in info:
+            info[_NOW_KEY] = db_now(db.session)
+        info.setdefault(_PENDING_KEY, []).append({**row, 'at': info[_NOW_KEY]})
+        return
+    db.session.add(AuditEvent(**row))
+
+
+def _after_commit(session) -> None:
+    session.info.pop(_NOW_KEY, None)
+    for row in session.info.pop(_PENDING_KEY, None) or ():
+        audit_writer.submit(row)
+
+
+def _after_rollback(session) -> None:
+    session.info.pop(_NOW_KEY, None)
+    session.info.pop(_PENDING_KEY, None)
+
+
+__all__ = ['BufferedAuditWriter', 'audit_writer', 'record_audit']
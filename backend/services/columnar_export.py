@@ -0,0 +1,380 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, TYPE_CHECKING
+from urllib.parse import quote
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from ..db import db_now
+from ..lazy import is_available, optional_import
+from ..models import Note
+from ..serialization import load_json
+from .alerts import VITAL_FIELDS
+from .note_export import MED_FIELDS, build_export_query, iter_batches
+
+if TYPE_CHECKING:  # pragma: no cover - hints only
+    import pyarrow as pa
+
+
+logger = logging.getLogger(__name__)
+
+FORMATS = {'parquet': '.parquet', 'arrow': '.arrow'}
+WATERMARK_FILE = '_watermark.json'
+
+# Notes newer than this are left for the next run: a transaction that is still
+# open may hold a lower note id, and the watermark must never jump past it.
+# The guard assumes no write transaction stays open longer than this, and that
+# created_at is set at insert time (by the database, or from db_now()). Bulk
+# rows whose client-supplied created_at is older than the settle window count
+# as settled as soon as they commit.
+DEFAULT_SETTLE_SECONDS = 60
+
+
+class ColumnarExportUnavailable(RuntimeError):
+    pass
+
+
+class ExportInProgressError(RuntimeError):
+    pass
+
+
+def columnar_export_available() -> bool:
+    """Whether pyarrow is installed, without importing it."""
+    return is_available('pyarrow')
+
+
+def _pyarrow() -> Any:
+    # Optional and only needed here; imported by the first export, not the app.
+    pa = optional_import('pyarrow')
+    if pa is None:
+        raise ColumnarExportUnavailable('pyarrow_not_installed')
+    return pa
+
+
+def arrow_schema() -> 'pa.Schema':
+    pa = _pyarrow()
+    med_type = pa.struct([(name, pa.string()) for name in MED_FIELDS])
+    return pa.schema([
+        ('note_id', pa.int64()),
+        ('patient_id', pa.int64()),
+        ('mrn', pa.string()),
+        ('ward', pa.string()),
+        ('bed', pa.string()),
+        ('encounter_id', pa.int64()),
+        ('created_at', pa.timestamp('s')),
+        ('signed', pa.bool_()),
+        *((f'vitals_{name}', pa.float64()) for name in VITAL_FIELDS),
+        ('pain_score', pa.int32()),
+        ('intake_ml', pa.int32()),
+        ('output_ml', pa.int32()),
+        ('alerts', pa.list_(pa.string())),
+        ('med_given_count', pa.int32()),
+        ('med_given', pa.list_(med_type)),
+    ])
+
+
+def _as_float(value: Any) -> Optional[float]:
+    if value in (None, ''):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _as_int(value: Any) -> Optional[int]:
+    if value in (None, ''):
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _partition_key(ward: Optional[str], created_at: Optional[datetime]) -> Tuple[str, str]:
+    month = created_at.strftime('%Y-%m') if created_at else 'unknown'
+    return (ward or '__null__', month)
+
+
+def decode_batch(batch: Sequence[Sequence[Any]]) -> Dict[Tuple[str, str], Dict[str, List[Any]]]:
+    """Split one batch of export rows into per-(ward, month) column lists."""
+    groups: Dict[Tuple[str, str], Dict[str, List[Any]]] = {}
+    vital_columns = [f'vitals_{name}' for name in VITAL_FIELDS]
+    for row in batch:
+        (note_id, patient_id, mrn, ward, bed, encounter_id, created_at, signed, vitals,
+         pain_score, intake_ml, output_ml, _subjective, _objective, _assessment, _plan, alerts, med_given) = row[:18]
+        key = _partition_key(ward, created_at)
+        columns = groups.get(key)
+        if columns is None:
+            columns = groups[key] = {name: [] for name in arrow_column_names()}
+
+        vitals = load_json(vitals)
+        if not isinstance(vitals, dict):
+            vitals = {}
+        alerts = load_json(alerts)
+        if not isinstance(alerts, list):
+            alerts = [alerts] if alerts else []
+        meds = load_json(med_given)
+        if not isinstance(meds, list):
+            meds = []
+        meds = [med if isinstance(med, dict) else {'name': med} for med in meds]
+
+        columns['note_id'].append(note_id)
+        columns['patient_id'].append(patient_id)
+        columns['mrn'].append(mrn)
+        columns['ward'].append(ward)
+        columns['bed'].append(bed)
+        columns['encounter_id'].append(encounter_id)
+        columns['created_at'].append(created_at)
+        columns['signed'].append(bool(signed))
+        for name, column in zip(VITAL_FIELDS, vital_columns):
+            columns[column].append(_as_float(vitals.get(name)))
+        columns['pain_score'].append(_as_int(pain_score))
+        columns['intake_ml'].append(_as_int(intake_ml))
+        columns['output_ml'].append(_as_int(output_ml))
+        columns['alerts'].append([str(item) for item in alerts])
+        columns['med_given_count'].append(len(meds))
+        columns['med_given'].append([
+            {name: (None if med.get(name) is None else str(med.get(name))) for name in MED_FIELDS}
+            for med in meds
+        ])
+    return groups
+
+
+def arrow_column_names() -> Tuple[str, ...]:
+    return (
+        'note_id', 'patient_id', 'mrn', 'ward', 'bed', 'encounter_id', 'created_at', 'signed',
+        *(f'vitals_{name}' for name in VITAL_FIELDS),
+        'pain_score', 'intake_ml', 'output_ml', 'alerts', 'med_given_count', 'med_given',
+    )
+
+
+class PartitionedWriter:
+    """One open file per ``ward=<w>/month=<yyyy-mm>`` partition for the whole run.
+
+    Files are written under a ``.tmp`` name and renamed on ``close()``, so an
+    interrupted run never leaves a partial file where readers would find it.
+    """
+
+    def __init__(self, root: Path, output_format: str, run_id: str) -> None:
+        if output_format not in FORMATS:
+            raise ValueError(f'invalid_format: {output_format}')
+        self.root = root
+        self.output_format = output_format
+        self.run_id = run_id
+        self.schema = arrow_schema()
+        self._writers: Dict[Tuple[str, str], Tuple[Any, Any, Path]] = {}
+
+    def _path(self, key: Tuple[str, str]) -> Path:
+        ward, month = key
+        directory = self.root / f'ward={quote(ward, safe="")}' / f'month={month}'
+        directory.mkdir(parents=True, exist_ok=True)
+        return directory / f'part-{self.run_id}{FORMATS[self.output_format]}'
+
+    def _writer(self, key: Tuple[str, str]) -> Any:
+        entry = self._writers.get(key)
+        if entry is None:
+            final_path = self._path(key)
+            temp_path = final_path.with_name(final_path.name + '.tmp')
+            if self.output_format == 'parquet':
+                writer = optional_import('pyarrow.parquet').ParquetWriter(
+                    str(temp_path), self.schema, compression='zstd',
+                )
+                sink = None
+            else:
+                pa = _pyarrow()
+                sink = pa.OSFile(str(temp_path), 'wb')
+                writer = optional_import('pyarrow.ipc').new_file(sink, self.schema)
+            entry = (writer, sink, final_path)
+            self._writers[key] = entry
+        return entry[0]
+
+    def write(self, groups: Dict[Tuple[str, str], Dict[str, List[Any]]]) -> None:
+        pa = _pyarrow()
+        for key, columns in groups.items():
+            table = pa.Table.from_pydict(columns, schema=self.schema)
+            self._writer(key).write_table(table)
+
+    def close(self) -> List[Path]:
+        paths: List[Path] = []
+        for writer, sink, final_path in self._writers.values():
+            writer.close()
+            if sink is not None:
+                sink.close()
+            os.replace(final_path.with_name(final_path.name + '.tmp'), final_path)
+            paths.append(final_path)
+        self._writers.clear()
+        return paths
+
+    def abort(self) -> None:
+        for writer, sink, final_path in self._writers.values():
+            try:
+                writer.close()
+                if sink is not None:
+                    sink.close()
+            finally:
+                final_path.with_name(final_path.name + '.tmp').unlink(missing_ok=True)
+        self._writers.clear()
+
+
+def read_watermark(root: Path) -> Dict[str, Any]:
+    try:
+        return json.loads((root / WATERMARK_FILE).read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return {'last_note_id': 0}
+
+
+def _write_watermark(root: Path, data: Dict[str, Any]) -> None:
+    temp_path = root / (WATERMARK_FILE + '.tmp')
+    temp_path.write_text(json.dumps(data, indent=2), encoding='utf-8')
+    os.replace(temp_path, root / WATERMARK_FILE)
+
+
+def _upper_bound(session: Session, after_id: int, settle_seconds: int) -> int:
+    """Highest note id that is safe to export up to.
+
+    That is the newest note created before the settle cutoff: ids are handed
+    out in insert order, so every lower id was inserted earlier still and its
+    transaction has had the whole window to commit. (The smallest *visible*
+    unsettled id is no bound: an uncommitted note below it is invisible.)
+    """
+    statement = select(Note.id)
+    if settle_seconds > 0:
+        cutoff = db_now(session) - timedelta(seconds=settle_seconds)
+        statement = statement.where(Note.created_at <= cutoff)
+    # Walks the primary key down from the newest note; only the notes inside
+    # the settle window are skipped.
+    settled = session.execute(statement.order_by(Note.id.desc()).limit(1)).scalar()
+    return max(settled or 0, after_id)
+
+
+@dataclass
+class ExportSummary:
+    run_id: str
+    output_format: str
+    from_note_id: int
+    to_note_id: int
+    rows: int = 0
+    files: List[str] = field(default_factory=list)
+    elapsed_seconds: float = 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.elapsed_seconds if self.elapsed_seconds else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data['rows_per_second'] = round(self.rows_per_second, 1)
+        return data
+
+
+def write_batches(
+    batches: Iterable[Sequence[Sequence[Any]]],
+    root: Path,
+    output_format: str,
+    *,
+    run_id: Optional[str] = None,
+    on_batch: Optional[Callable[[int, int], None]] = None,
+) -> Tuple[int, int, List[Path]]:
+    """Write pre-fetched batches; returns ``(rows, last_note_id, files)``."""
+    writer = PartitionedWriter(root, output_format, run_id or uuid.uuid4().hex[:12])
+    rows = 0
+    last_note_id = 0
+    try:
+        for batch in batches:
+            if not batch:
+                continue
+            writer.write(decode_batch(batch))
+            rows += len(batch)
+            last_note_id = batch[-1][0]
+            del batch
+            if on_batch is not None:
+                on_batch(rows, last_note_id)
+    except BaseException:
+        writer.abort()
+        raise
+    return rows, last_note_id, writer.close()
+
+
+_run_lock = threading.Lock()
+
+
+def export_columnar(
+    session: Session,
+    root: str | Path,
+    *,
+    output_format: str = 'parquet',
+    batch_size: int = 5000,
+    full: bool = False,
+    settle_seconds: int = DEFAULT_SETTLE_SECONDS,
+    on_batch: Optional[Callable[[int, int], None]] = None,
+) -> ExportSummary:
+    """Export notes newer than the watermark in ``root`` and advance it.
+
+    ``full=True`` ignores the watermark and re-exports everything (into new
+    part files; clear the directory first if a clean snapshot is wanted).
+    """
+    _pyarrow()
+    if output_format not in FORMATS:
+        raise ValueError(f'invalid_format: {output_format}')
+    if not _run_lock.acquire(blocking=False):
+        raise ExportInProgressError('export_in_progress')
+    try:
+        root = Path(root)
+        root.mkdir(parents=True, exist_ok=True)
+        after_id = 0 if full else int(read_watermark(root).get('last_note_id') or 0)
+        upper_id = _upper_bound(session, after_id, settle_seconds)
+        summary = ExportSummary(uuid.uuid4().hex[:12], output_format, after_id, after_id)
+        if upper_id <= after_id:
+            return summary
+
+        started = time.perf_counter()
+        statement = build_export_query(after_id=after_id, until_id=upper_id)
+        rows, last_note_id, files = write_batches(
+            iter_batches(session, statement, batch_size),
+            root,
+            output_format,
+            run_id=summary.run_id,
+            on_batch=on_batch,
+        )
+        summary.elapsed_seconds = time.perf_counter() - started
+        summary.rows = rows
+        summary.to_note_id = upper_id
+        summary.files = [str(path.relative_to(root)) for path in files]
+        # Every id up to upper_id has been read (gaps are deleted/rolled-back ids).
+        _write_watermark(root, {
+            'last_note_id': upper_id,
+            'last_exported_note_id': last_note_id or None,
+            'exported_at': datetime.now().isoformat(timespec='seconds'),
+            'format': output_format,
+            'rows': rows,
+        })
+        logger.info('columnar export %s: %d rows in %.1fs', summary.run_id, rows, summary.elapsed_seconds)
+        return summary
+    finally:
+        _run_lock.release()
+
+
+__all__ = [
+    'ColumnarExportUnavailable',
+    'ExportInProgressError',
+    'ExportSummary',
+    'FORMATS',
+    'PartitionedWriter',
+    'arrow_schema',
+    'columnar_export_available',
+    'decode_batch',
+    'export_columnar',
+    'read_watermark',
+    'write_batches',
+]
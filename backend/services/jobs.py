@@ -0,0 +1,327 @@
+from __future__ import annotations
+
+import json
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, List, Optional, Sequence
+
+from ..config import settings
+
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_SUCCEEDED = 'succeeded'
+JOB_FAILED = 'failed'
+FINISHED_STATES = {JOB_SUCCEEDED, JOB_FAILED}
+
+JobHandler = Callable[[Any, Callable[[Any], None]], Any]
+
+
+class QueueFullError(RuntimeError):
+    pass
+
+
+def _percentile(samples: Sequence[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+
+@dataclass(slots=True)
+class Job:
+    id: str
+    kind: str
+    user: Optional[str]
+    status: str = JOB_QUEUED
+    result: Any = None
+    error: Optional[Dict[str, str]] = None
+    submitted_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    progress: Any = None
+    revision: int = 0
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATES
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'result': self.result,
+            'error': self.error,
+            'submitted_at': self.submitted_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'progress': self.progress,
+        }
+
+
+class MemoryJobStore:
+    """Default store: job state lives in this process only."""
+
+    def __init__(self, ttl_seconds: int) -> None:
+        self.ttl_seconds = ttl_seconds
+        self._jobs: Dict[str, Job] = {}
+        self._cond = threading.Condition()
+
+    def save(self, job: Job) -> None:
+        with self._cond:
+            self._jobs[job.id] = job
+            self._cond.notify_all()
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._cond:
+            return self._jobs.get(job_id)
+
+    def wait(self, job_id: str, *, since_revision: int, timeout: float) -> Optional[Job]:
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                job = self._jobs.get(job_id)
+                if job is None or job.revision != since_revision:
+                    return job
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return job
+                self._cond.wait(remaining)
+
+    def prune(self) -> None:
+        cutoff = time.time() - self.ttl_seconds
+        with self._cond:
+            expired = [job_id for job_id, job in self._jobs.items() if job.finished and (job.finished_at or 0) < cutoff]
+            for job_id in expired:
+                del self._jobs[job_id]
+
+
+class SQLiteJobStore:
+    """File-backed store so every worker process on the host can answer status polls."""
+
+    def __init__(self, path: str | Path, ttl_seconds: int, poll_interval: float = 0.25) -> None:
+        self.path = str(path)
+        self.ttl_seconds = ttl_seconds
+        self.poll_interval = poll_interval
+        self._local = threading.local()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS jobs ('
+                '  id TEXT PRIMARY KEY,'
+                '  kind TEXT NOT NULL,'
+                '  user TEXT,'
+                '  status TEXT NOT NULL,'
+                '  result TEXT,'
+                '  error TEXT,'
+                '  submitted_at REAL NOT NULL,'
+                '  started_at REAL,'
+                '  finished_at REAL,'
+                '  progress TEXT,'
+                '  revision INTEGER NOT NULL DEFAULT 0'
+                ')'
+            )
+            self._local.conn = conn
+        return conn
+
+    def save(self, job: Job) -> None:
+        self._conn().execute(
+            'INSERT OR REPLACE INTO jobs '
+            '(id, kind, user, status, result, error, submitted_at, started_at, finished_at, progress, revision) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (
+                job.id, job.kind, job.user, job.status,
+                json.dumps(job.result, ensure_ascii=False) if job.result is not None else None,
+                json.dumps(job.error, ensure_ascii=False) if job.error is not None else None,
+                job.submitted_at, job.started_at, job.finished_at,
+                json.dumps(job.progress, ensure_ascii=False) if job.progress is not None else None,
+                job.revision,
+            ),
+        )
+
+    def get(self, job_id: str) -> Optional[Job]:
+        row = self._conn().execute(
+            'SELECT id, kind, user, status, result, error, submitted_at, started_at, finished_at, progress, revision '
+            'FROM jobs WHERE id = ?',
+            (job_id,),
+        ).fetchone()
+        if row is None:
+            return None
+        return Job(
+            id=row[0], kind=row[1], user=row[2], status=row[3],
+            result=json.loads(row[4]) if row[4] is not None else None,
+            error=json.loads(row[5]) if row[5] is not None else None,
+            submitted_at=row[6], started_at=row[7], finished_at=row[8],
+            progress=json.loads(row[9]) if row[9] is not None else None,
+            revision=row[10],
+        )
+
+    def wait(self, job_id: str, *, since_revision: int, timeout: float) -> Optional[Job]:
+        deadline = time.monotonic() + timeout
+        while True:
+            job = self.get(job_id)
+            if job is None or job.revision != since_revision or time.monotonic() >= deadline:
+                return job
+            time.sleep(self.poll_interval)
+
+    def prune(self) -> None:
+        cutoff = time.time() - self.ttl_seconds
+        self._conn().execute('DELETE FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?', (cutoff,))
+
+
+class JobQueue:
+    """Bounded worker pool for slow provider calls (Whisper, LLM parsing)."""
+
+    def __init__(self, store: MemoryJobStore | SQLiteJobStore, *, workers: int, max_queue: int,
+                 latency_window: int = 1024) -> None:
+        self.store = store
+        self.workers = workers
+        self._queue: 'queue.Queue[tuple[Job, Any]]' = queue.Queue(maxsize=max_queue)
+        self._handlers: Dict[str, JobHandler] = {}
+        self._threads: List[threading.Thread] = []
+        self._start_lock = threading.Lock()
+        self._metrics_lock = threading.Lock()
+        self._running = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._wait_ms: Deque[float] = deque(maxlen=latency_window)
+        self._run_ms: Deque[float] = deque(maxlen=latency_window)
+
+    def register(self, kind: str, handler: JobHandler) -> None:
+        self._handlers[kind] = handler
+
+    def _ensure_started(self) -> None:
+        if self._threads:
+            return
+        with self._start_lock:
+            if self._threads:
+                return
+            for index in range(self.workers):
+                thread = threading.Thread(target=self._worker, name=f'carenotes-job-{index}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, kind: str, payload: Any, *, user: Optional[str] = None) -> Job:
+        if kind not in self._handlers:
+            raise KeyError(kind)
+        self._ensure_started()
+        self.store.prune()
+        job = Job(id=uuid.uuid4().hex, kind=kind, user=user)
+        self._publish(job)
+        try:
+            self._queue.put_nowait((job, payload))
+        except queue.Full as exc:
+            with self._metrics_lock:
+                self._rejected += 1
+            job.status = JOB_FAILED
+            job.error = {'code': 'too_many_requests', 'message': 'queue_full'}
+            job.finished_at = time.time()
+            self._publish(job)
+            raise QueueFullError('queue_full') from exc
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self.store.get(job_id)
+
+    def wait(self, job_id: str, *, since_revision: int, timeout: float) -> Optional[Job]:
+        return self.store.wait(job_id, since_revision=since_revision, timeout=timeout)
+
+    def _publish(self, job: Job) -> None:
+        job.revision += 1
+        self.store.save(job)
+
+    def _worker(self) -> None:
+        while True:
+            job, payload = self._queue.get()
+            job.status = JOB_RUNNING
+            job.started_at = time.time()
+            self._publish(job)
+
+            def report(progress: Any, job: Job = job) -> None:
+                job.progress = progress
+                self._publish(job)
+
+            with self._metrics_lock:
+                self._running += 1
+                self._wait_ms.append((job.started_at - job.submitted_at) * 1000.0)
+            try:
+                job.result = self._handlers[job.kind](payload, report)
+                job.status = JOB_SUCCEEDED
+            except ValueError as exc:
+                job.status = JOB_FAILED
+                job.error = {'code': 'bad_request', 'message': str(exc)}
+            except Exception as exc:  # handlers surface provider failures as RuntimeError
+                job.status = JOB_FAILED
+                job.error = {'code': 'server_error', 'message': str(exc)}
+            finally:
+                job.finished_at = time.time()
+                with self._metrics_lock:
+                    self._running -= 1
+                    self._run_ms.append((job.finished_at - job.started_at) * 1000.0)
+                    if job.status == JOB_SUCCEEDED:
+                        self._completed += 1
+                    else:
+                        self._failed += 1
+                self._publish(job)
+                self._queue.task_done()
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._metrics_lock:
+            wait_ms = list(self._wait_ms)
+            run_ms = list(self._run_ms)
+            data = {
+                'workers': self.workers,
+                'queue_depth': self._queue.qsize(),
+                'queue_capacity': self._queue.maxsize,
+                'running': self._running,
+                'completed': self._completed,
+                'failed': self._failed,
+                'rejected': self._rejected,
+            }
+        data['wait_ms'] = {'p50': _percentile(wait_ms, 50), 'p99': _percentile(wait_ms, 99)}
+        data['run_ms'] = {'p50': _percentile(run_ms, 50), 'p99': _percentile(run_ms, 99)}
+        return data
+
+
+def build_job_queue(*, workers: int, max_queue: int, ttl_seconds: int, sqlite_path: Optional[str] = None) -> JobQueue:
+    store: MemoryJobStore | SQLiteJobStore
+    if sqlite_path:
+        store = SQLiteJobStore(sqlite_path, ttl_seconds)
+    else:
+        store = MemoryJobStore(ttl_seconds)
+    return JobQueue(store, workers=workers, max_queue=max_queue)
+
+
+job_queue = build_job_queue(
+    workers=settings.JOB_WORKERS,
+    max_queue=settings.JOB_QUEUE_SIZE,
+    ttl_seconds=settings.JOB_RESULT_TTL,
+    sqlite_path=settings.JOB_STORE_PATH,
+)
+
+
+__all__ = [
+    'Job',
+    'JobQueue',
+    'MemoryJobStore',
+    'SQLiteJobStore',
+    'QueueFullError',
+    'build_job_queue',
+    'job_queue',
+    'JOB_QUEUED',
+    'JOB_RUNNING',
+    'JOB_SUCCEEDED',
+    'JOB_FAILED',
+]
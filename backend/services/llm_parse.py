@@ -1,12 +1,15 @@
 ﻿from __future__ import annotations
 
+import hashlib
 import json
 from typing import Any, Dict
 
-from openai import OpenAI
 from tenacity import retry, stop_after_attempt, wait_fixed
 
 from ..config import settings
+from ..metrics import timed_call
+from .openai_client import get_async_openai_client, get_openai_client
+from .parse_cache import build_parse_cache, cache_key
 
 
 SYSTEM_PROMPT = (
@@ -23,27 +26,35 @@ SYSTEM_PROMPT = (
     '  "alerts":[字符串\n]}\n'
     '规则：不得编造；未提及填null；中文口语数词需转数字（“九十七”→97）。'
 )
+PROMPT_VERSION = hashlib.sha256(SYSTEM_PROMPT.encode('utf-8')).hexdigest()[:12]
 
-_client = OpenAI(api_key=settings.OPENAI_API_KEY)
+parse_cache = build_parse_cache(
+    max_entries=settings.PARSE_CACHE_SIZE,
+    ttl_seconds=settings.PARSE_CACHE_TTL,
+    sqlite_path=settings.PARSE_CACHE_PATH,
+    persistent_max_entries=settings.PARSE_CACHE_PERSISTENT_SIZE,
+)
 
 
-@retry(stop=stop_after_attempt(3), wait=wait_fixed(1))
-def _invoke_llm(text: str, model_override: str | None = None) -> str:
-    model_name = model_override or settings.OPENAI_PARSE_MODEL
-    response = _client.responses.create(
-        model=model_name,
-        messages=[
+def _llm_request(text: str, model_override: str | None) -> Dict[str, Any]:
+    # Responses API: the messages go in ``input`` and JSON mode is a text format.
+    return {
+        'model': model_override or settings.OPENAI_PARSE_MODEL,
+        'input': [
             {
                 'role': 'system',
-                'content': [{'type': 'text', 'text': SYSTEM_PROMPT}],
+                'content': [{'type': 'input_text', 'text': SYSTEM_PROMPT}],
             },
             {
                 'role': 'user',
-                'content': [{'type': 'text', 'text': text}],
+                'content': [{'type': 'input_text', 'text': text}],
             },
         ],
-        response_format={'type': 'json_object'},
-    )
+        'text': {'format': {'type': 'json_object'}},
+    }
+
+
+def _response_text(response: Any) -> str:
     try:
         message = response.output[0]
         content = message.content[0].text
@@ -52,16 +63,60 @@ def _invoke_llm(text: str, model_override: str | None = None) -> str:
     return content
 
 
-def parse_note(text: str) -> Dict[str, Any]:
+@retry(stop=stop_after_attempt(3), wait=wait_fixed(1))
+@timed_call('openai', 'parse')  # inside the retry: one sample per attempt
+def _invoke_llm(text: str, model_override: str | None = None) -> str:
+    return _response_text(get_openai_client().responses.create(**_llm_request(text, model_override)))
+
+
+@retry(stop=stop_after_attempt(3), wait=wait_fixed(1))
+@timed_call('openai', 'parse')
+async def _invoke_llm_async(text: str, model_override: str | None = None) -> str:
+    return _response_text(await get_async_openai_client().responses.create(**_llm_request(text, model_override)))
+
+
+def _decode(raw: str) -> Dict[str, Any]:
     try:
-        raw = _invoke_llm(text)
-        data = json.loads(raw)
+        return json.loads(raw)
     except json.JSONDecodeError as exc:
         raise RuntimeError('llm_parse_failed_json') from exc
+
+
+def parse_note(text: str, *, use_cache: bool = True) -> Dict[str, Any]:
+    key = cache_key(text, settings.OPENAI_PARSE_MODEL, PROMPT_VERSION)
+    if use_cache:
+        cached = parse_cache.get(key)
+        if cached is not None:
+            return json.loads(cached)
+
+    try:
+        raw = _invoke_llm(text)
+    except Exception as exc:
+        raise RuntimeError(str(exc)) from exc
+    data = _decode(raw)
+
+    if use_cache:
+        parse_cache.set(key, json.dumps(data, ensure_ascii=False))
+    return data
+
+
+async def parse_note_async(text: str, *, use_cache: bool = True) -> Dict[str, Any]:
+    """:func:`parse_note` on the SDK's async client, for the ASGI server."""
+    key = cache_key(text, settings.OPENAI_PARSE_MODEL, PROMPT_VERSION)
+    if use_cache:
+        cached = await parse_cache.aget(key)
+        if cached is not None:
+            return json.loads(cached)
+
+    try:
+        raw = await _invoke_llm_async(text)
     except Exception as exc:
         raise RuntimeError(str(exc)) from exc
+    data = _decode(raw)
 
+    if use_cache:
+        await parse_cache.aset(key, json.dumps(data, ensure_ascii=False))
     return data
 
 
-__all__ = ['parse_note', 'SYSTEM_PROMPT']
+__all__ = ['parse_note', 'parse_note_async', 'parse_cache', 'SYSTEM_PROMPT', 'PROMPT_VERSION']
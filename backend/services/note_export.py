@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import csv
+import io
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import Select
+
+from ..models import Note, Patient
+from ..serialization import dumps, isoformat, load_json
+from .alerts import VITAL_FIELDS
+
+
+MED_FIELDS = ('name', 'dose', 'route', 'time')
+TEXT_FIELDS = ('subjective', 'objective', 'assessment', 'plan')
+
+# Flat, fixed column set shared by the NDJSON and CSV exports.
+BASE_COLUMNS: tuple[str, ...] = (
+    'id', 'patient_id', 'mrn', 'ward', 'bed', 'encounter_id', 'created_at', 'signed',
+    *(f'vitals_{field}' for field in VITAL_FIELDS),
+    'pain_score', 'intake_ml', 'output_ml',
+    *TEXT_FIELDS,
+    'alerts',
+    'med_given_count',
+    *(f'med_given_{field}' for field in MED_FIELDS),
+)
+
+
+def export_columns(include_transcript: bool = False) -> tuple[str, ...]:
+    return BASE_COLUMNS + (('transcript',) if include_transcript else ())
+
+
+def build_export_query(
+    *,
+    ward: Optional[str] = None,
+    patient_id: Optional[int] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    signed_only: bool = False,
+    include_transcript: bool = False,
+    after_id: Optional[int] = None,
+    until_id: Optional[int] = None,
+) -> Select:
+    """Plain column tuples in id order, so no ORM instances pile up in the session."""
+    columns = [
+        Note.id, Note.patient_id, Patient.mrn, Patient.ward, Patient.bed, Note.encounter_id,
+        Note.created_at, Note.signed, Note.vitals, Note.pain_score, Note.intake_ml, Note.output_ml,
+        Note.subjective, Note.objective, Note.assessment, Note.plan, Note.alerts, Note.med_given,
+    ]
+    if include_transcript:
+        columns.append(Note.transcript)
+    statement = select(*columns).join(Patient, Patient.id == Note.patient_id)
+    if ward:
+        statement = statement.where(Patient.ward == ward)
+    if patient_id:
+        statement = statement.where(Note.patient_id == patient_id)
+    if since:
+        statement = statement.where(Note.created_at >= since)
+    if until:
+        statement = statement.where(Note.created_at <= until)
+    if signed_only:
+        statement = statement.where(Note.signed == 1)
+    if after_id:
+        statement = statement.where(Note.id > after_id)
+    if until_id:
+        statement = statement.where(Note.id <= until_id)
+    return statement.order_by(Note.id.asc())
+
+
+def iter_batches(session: Session, statement: Select, batch_size: int) -> Iterator[Sequence[Any]]:
+    """Server-side cursor: only ``batch_size`` rows are fetched from the driver at a time."""
+    result = session.execute(statement.execution_options(stream_results=True, yield_per=batch_size))
+    try:
+        for partition in result.partitions(batch_size):
+            yield partition
+            # Drop our reference before the driver fetches the next batch.
+            del partition
+    finally:
+        result.close()
+
+
+def _joined(values: Iterable[Any]) -> str:
+    return '; '.join('' if value is None else str(value) for value in values)
+
+
+def flatten_row(row: Sequence[Any], include_transcript: bool = False) -> List[Any]:
+    (note_id, patient_id, mrn, ward, bed, encounter_id, created_at, signed, vitals,
+     pain_score, intake_ml, output_ml, subjective, objective, assessment, plan, alerts, med_given) = row[:18]
+
+    vitals = load_json(vitals)
+    if not isinstance(vitals, dict):
+        vitals = {}
+    alerts = load_json(alerts)
+    if not isinstance(alerts, list):
+        alerts = [alerts] if alerts else []
+    meds = load_json(med_given)
+    if not isinstance(meds, list):
+        meds = []
+    meds = [med if isinstance(med, dict) else {'name': med} for med in meds]
+
+    values: List[Any] = [
+        note_id, patient_id, mrn, ward, bed, encounter_id, isoformat(created_at), bool(signed),
+        *(vitals.get(field) for field in VITAL_FIELDS),
+        pain_score, intake_ml, output_ml,
+        subjective, objective, assessment, plan,
+        _joined(alerts),
+        len(meds),
+        *(_joined(med.get(field) for med in meds) for field in MED_FIELDS),
+    ]
+    if include_transcript:
+        values.append(row[18])
+    return values
+
+
+def stream_ndjson(batches: Iterable[Sequence[Any]], include_transcript: bool = False) -> Iterator[bytes]:
+    """One chunk per batch; each line is a flat JSON object keyed by ``export_columns``."""
+    columns = export_columns(include_transcript)
+    for batch in batches:
+        chunk = b''.join(
+            dumps(dict(zip(columns, flatten_row(row, include_transcript)))) + b'\n'
+            for row in batch
+        )
+        del batch
+        yield chunk
+
+
+def stream_csv(batches: Iterable[Sequence[Any]], include_transcript: bool = False) -> Iterator[bytes]:
+    """UTF-8 (with BOM, for Excel) CSV; header first, then one chunk per batch."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(export_columns(include_transcript))
+    yield ('\ufeff' + buffer.getvalue()).encode('utf-8')
+    for batch in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(flatten_row(row, include_transcript) for row in batch)
+        del batch
+        yield buffer.getvalue().encode('utf-8')
+
+
+def export_filters_summary(**filters: Any) -> Dict[str, Any]:
+    return {key: (isoformat(value) if isinstance(value, datetime) else value)
+            for key, value in filters.items() if value not in (None, False, '')}
+
+
+__all__ = [
+    'BASE_COLUMNS',
+    'build_export_query',
+    'export_columns',
+    'export_filters_summary',
+    'flatten_row',
+    'iter_batches',
+    'stream_csv',
+    'stream_ndjson',
+]
@@ -0,0 +1,444 @@
+from __future__ import annotations
+
+import heapq
+import logging
+import math
+import re
+import sqlite3
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Set, Tuple, TYPE_CHECKING
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..db import db
+from ..models import Note, Patient
+from .parse_cache import normalize_text
+
+if TYPE_CHECKING:  # pragma: no cover - hints only
+    from flask import Flask
+
+
+logger = logging.getLogger(__name__)
+
+SEARCH_FIELDS = ('subjective', 'objective', 'assessment', 'plan', 'transcript')
+
+# Runs of CJK ideographs, or runs of Latin letters/digits (after NFKC + lower).
+_TOKEN_RE = re.compile(r'[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+|[a-z0-9]+')
+
+# BM25 parameters (same defaults as SQLite FTS5's bm25()).
+_K1 = 1.2
+_B = 0.75
+
+# Note ids are allocated before commit, so a lower id can become visible after
+# a higher one was already indexed; catch-up re-checks this many ids below the
+# watermark for stragglers.
+CATCH_UP_OVERLAP = 500
+CATCH_UP_BATCH = 1000
+
+
+def _is_cjk(char: str) -> bool:
+    return char >= '\u3400'
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Index-side tokens: CJK unigrams + bigrams, Latin/digit words as-is."""
+    if not text:
+        return []
+    tokens: List[str] = []
+    for match in _TOKEN_RE.finditer(normalize_text(text).lower()):
+        run = match.group(0)
+        if _is_cjk(run[0]):
+            tokens.extend(run)
+            tokens.extend(run[index:index + 2] for index in range(len(run) - 1))
+        else:
+            tokens.append(run)
+    return tokens
+
+
+def query_terms(query: Optional[str]) -> List[str]:
+    """Query-side terms; every term must match.
+
+    Multi-character CJK runs are matched by their bigrams only (a single
+    character falls back to its unigram), which keeps ``跌倒`` from matching
+    every note that merely contains ``跌``.
+    """
+    if not query:
+        return []
+    terms: List[str] = []
+    for match in _TOKEN_RE.finditer(normalize_text(query).lower()):
+        run = match.group(0)
+        if _is_cjk(run[0]) and len(run) > 1:
+            terms.extend(run[index:index + 2] for index in range(len(run) - 1))
+        else:
+            terms.append(run)
+    return list(dict.fromkeys(terms))
+
+
+def _naive(value: Optional[datetime]) -> Optional[datetime]:
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone().replace(tzinfo=None)
+
+
+@dataclass(frozen=True)
+class NoteDocument:
+    note_id: int
+    patient_id: int
+    ward: Optional[str]
+    created_at: datetime
+    tokens: Tuple[str, ...]
+
+    @classmethod
+    def build(cls, note_id: int, patient_id: int, ward: Optional[str], created_at: Optional[datetime],
+              texts: Iterable[Optional[str]]) -> 'NoteDocument':
+        tokens: List[str] = []
+        for text in texts:
+            tokens.extend(tokenize(text))
+        return cls(note_id, patient_id, ward, _naive(created_at) or datetime.now().replace(microsecond=0), tuple(tokens))
+
+    @classmethod
+    def from_note(cls, note: Note, ward: Optional[str]) -> 'NoteDocument':
+        # The write paths set created_at before flush, so reading it here does
+        # not go back to the database.
+        texts = (getattr(note, field, None) for field in SEARCH_FIELDS)
+        return cls.build(note.id, note.patient_id, ward, note.created_at, texts)
+
+
+@dataclass(frozen=True)
+class SearchFilters:
+    patient_id: Optional[int] = None
+    ward: Optional[str] = None
+    since: Optional[datetime] = None
+    until: Optional[datetime] = None
+
+
+class MemoryNoteIndex:
+    """In-process inverted index with BM25 ranking; rebuilt by catch-up on start.
+
+    Each worker holds its own copy, so only the newest ``capacity`` notes are
+    kept; older ones are evicted lowest id first. Set NOTE_SEARCH_PATH to
+    search the full history.
+    """
+
+    name = 'memory'
+
+    def __init__(self, capacity: Optional[int] = None) -> None:
+        self.capacity = capacity if capacity and capacity > 0 else None
+        self._postings: Dict[str, Dict[int, int]] = {}
+        self._docs: Dict[int, Tuple[int, Optional[str], datetime, int, Tuple[str, ...]]] = {}
+        self._ids: List[int] = []  # min-heap of indexed ids, for eviction
+        self._total_length = 0
+        self._lock = threading.RLock()
+
+    def _remove(self, note_id: int) -> None:
+        previous = self._docs.pop(note_id, None)
+        if previous is None:
+            return
+        self._total_length -= previous[3]
+        for term in set(previous[4]):
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(note_id, None)
+                if not postings:
+                    del self._postings[term]
+
+    def add(self, documents: Iterable[NoteDocument]) -> None:
+        with self._lock:
+            for document in documents:
+                self._remove(document.note_id)
+                counts: Dict[str, int] = {}
+                for token in document.tokens:
+                    counts[token] = counts.get(token, 0) + 1
+                for term, count in counts.items():
+                    self._postings.setdefault(term, {})[document.note_id] = count
+                self._docs[document.note_id] = (
+                    document.patient_id, document.ward, document.created_at,
+                    len(document.tokens), tuple(counts),
+                )
+                self._total_length += len(document.tokens)
+                if self.capacity is not None:
+                    heapq.heappush(self._ids, document.note_id)
+            if self.capacity is not None:
+                while len(self._docs) > self.capacity and self._ids:
+                    # Stale heap entries (already removed ids) are skipped by _remove.
+                    self._remove(heapq.heappop(self._ids))
+
+    def missing(self, note_ids: Sequence[int]) -> Set[int]:
+        with self._lock:
+            return {note_id for note_id in note_ids if note_id not in self._docs}
+
+    def watermark(self) -> int:
+        with self._lock:
+            return max(self._docs, default=0)
+
+    def count(self) -> int:
+        return len(self._docs)
+
+    def _matches(self, note_id: int, filters: SearchFilters) -> bool:
+        patient_id, ward, created_at, _, _ = self._docs[note_id]
+        if filters.patient_id is not None and patient_id != filters.patient_id:
+            return False
+        if filters.ward is not None and ward != filters.ward:
+            return False
+        if filters.since is not None and created_at < filters.since:
+            return False
+        if filters.until is not None and created_at > filters.until:
+            return False
+        return True
+
+    def search(self, terms: Sequence[str], filters: SearchFilters, *, limit: int, offset: int) -> List[Tuple[int, float]]:
+        with self._lock:
+            postings = [self._postings.get(term) for term in terms]
+            if not postings or any(not items for items in postings):
+                return []
+            postings.sort(key=len)
+            candidates = [note_id for note_id in postings[0] if all(note_id in items for items in postings[1:])]
+            total = len(self._docs)
+            average = self._total_length / total if total else 0.0
+            idf = [math.log(1.0 + (total - len(items) + 0.5) / (len(items) + 0.5)) for items in postings]
+            scored: List[Tuple[int, float]] = []
+            for note_id in candidates:
+                if not self._matches(note_id, filters):
+                    continue
+                length = self._docs[note_id][3]
+                norm = _K1 * (1.0 - _B + _B * length / average) if average else _K1
+                score = 0.0
+                for weight, items in zip(idf, postings):
+                    frequency = items[note_id]
+                    score += weight * frequency * (_K1 + 1.0) / (frequency + norm)
+                scored.append((note_id, score))
+        scored.sort(key=lambda hit: (-hit[1], -hit[0]))
+        return scored[offset:offset + limit]
+
+
+class SQLiteNoteIndex:
+    """FTS5-backed index in a local SQLite file, shared by all workers on the host."""
+
+    name = 'sqlite'
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = str(path)
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+            with self._init_lock:
+                if not self._initialized:
+                    # Tokens are pre-split by tokenize(); unicode61 only has to break on spaces.
+                    conn.execute(
+                        "CREATE VIRTUAL TABLE IF NOT EXISTS note_fts USING fts5("
+                        "  body, tokenize='unicode61 remove_diacritics 0')"
+                    )
+                    conn.execute(
+                        'CREATE TABLE IF NOT EXISTS note_meta ('
+                        '  note_id INTEGER PRIMARY KEY,'
+                        '  patient_id INTEGER NOT NULL,'
+                        '  ward TEXT,'
+                        '  created_at TEXT NOT NULL'
+                        ')'
+                    )
+                    conn.execute('CREATE INDEX IF NOT EXISTS ix_note_meta_patient ON note_meta (patient_id, created_at)')
+                    conn.execute('CREATE INDEX IF NOT EXISTS ix_note_meta_ward ON note_meta (ward, created_at)')
+                    conn.execute('CREATE INDEX IF NOT EXISTS ix_note_meta_created ON note_meta (created_at)')
+                    self._initialized = True
+        return conn
+
+    def add(self, documents: Iterable[NoteDocument]) -> None:
+        rows = [
+            (document.note_id, document.patient_id, document.ward,
+             document.created_at.isoformat(sep=' ', timespec='seconds'), ' '.join(document.tokens))
+            for document in documents
+        ]
+        if not rows:
+            return
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.executemany('DELETE FROM note_fts WHERE rowid = ?', [(row[0],) for row in rows])
+            conn.executemany('INSERT INTO note_fts (rowid, body) VALUES (?, ?)', [(row[0], row[4]) for row in rows])
+            conn.executemany(
+                'INSERT OR REPLACE INTO note_meta (note_id, patient_id, ward, created_at) VALUES (?, ?, ?, ?)',
+                [row[:4] for row in rows],
+            )
+        except sqlite3.Error:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+    def missing(self, note_ids: Sequence[int]) -> Set[int]:
+        if not note_ids:
+            return set()
+        placeholders = ','.join('?' * len(note_ids))
+        present = {
+            row[0] for row in self._conn().execute(
+                f'SELECT note_id FROM note_meta WHERE note_id IN ({placeholders})', list(note_ids),
+            )
+        }
+        return set(note_ids) - present
+
+    def watermark(self) -> int:
+        return self._conn().execute('SELECT COALESCE(MAX(note_id), 0) FROM note_meta').fetchone()[0]
+
+    def count(self) -> int:
+        return self._conn().execute('SELECT COUNT(*) FROM note_meta').fetchone()[0]
+
+    def search(self, terms: Sequence[str], filters: SearchFilters, *, limit: int, offset: int) -> List[Tuple[int, float]]:
+        match = ' AND '.join('"' + term.replace('"', '""') + '"' for term in terms)
+        clauses = ['note_fts MATCH ?']
+        params: List[object] = [match]
+        if filters.patient_id is not None:
+            clauses.append('m.patient_id = ?')
+            params.append(filters.patient_id)
+        if filters.ward is not None:
+            clauses.append('m.ward = ?')
+            params.append(filters.ward)
+        if filters.since is not None:
+            clauses.append('m.created_at >= ?')
+            params.append(filters.since.isoformat(sep=' ', timespec='seconds'))
+        if filters.until is not None:
+            clauses.append('m.created_at <= ?')
+            params.append(filters.until.isoformat(sep=' ', timespec='seconds'))
+        params.extend([limit, offset])
+        rows = self._conn().execute(
+            'SELECT m.note_id, bm25(note_fts) AS rank FROM note_fts '
+            'JOIN note_meta m ON m.note_id = note_fts.rowid '
+            f"WHERE {' AND '.join(clauses)} "
+            'ORDER BY rank ASC, m.note_id DESC LIMIT ? OFFSET ?',
+            params,
+        ).fetchall()
+        # bm25() is "lower is better"; flip it so callers see higher-is-better scores.
+        return [(note_id, -rank) for note_id, rank in rows]
+
+
+class NoteSearchIndex:
+    """Keeps a local index backend in step with the notes table.
+
+    Notes written by this worker are indexed as they commit. Notes from other
+    workers (or written before start) arrive through ``catch_up``, which runs
+    on a background thread every NOTE_SEARCH_CATCH_UP_SECONDS rather than in
+    the search request, or once via ``scripts/reindex_notes``.
+    """
+
+    def __init__(self, backend: MemoryNoteIndex | SQLiteNoteIndex) -> None:
+        self.backend = backend
+        self._catch_up_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def init_app(self, app: 'Flask', interval: float) -> None:
+        """Start the background catch-up thread (a first pass runs immediately)."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        if isinstance(self.backend, MemoryNoteIndex):
+            logger.warning('NOTE_SEARCH_PATH is not set: each worker indexes only its newest %s notes in memory',
+                           self.backend.capacity or 'all')
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(app, interval), name='carenotes-note-search', daemon=True)
+        self._thread.start()
+
+    def _run(self, app: 'Flask', interval: float) -> None:
+        while not self._stop.is_set():
+            try:
+                with app.app_context():
+                    self.catch_up()
+            except Exception:  # pragma: no cover - retried on the next tick
+                logger.exception('note search catch-up failed')
+            self._stop.wait(interval)
+
+    def close(self) -> None:
+        self._stop.set()
+
+    def index_notes(self, notes: Iterable[Note], wards: Mapping[int, Optional[str]]) -> None:
+        """Index freshly committed notes; failures are left to the next catch-up."""
+        try:
+            self.backend.add(NoteDocument.from_note(note, wards.get(note.patient_id)) for note in notes)
+        except Exception:  # pragma: no cover - index is best-effort on the write path
+            logger.exception('note search indexing failed')
+
+    def catch_up(self, session: Optional[Session] = None) -> int:
+        """Index notes written by other workers (or before this process started)."""
+        session = session if session is not None else db.session
+        indexed = 0
+        with self._catch_up_lock:
+            after = max(0, self.backend.watermark() - CATCH_UP_OVERLAP)
+            capacity = getattr(self.backend, 'capacity', None)
+            if capacity is not None:
+                # Notes the bounded index would evict straight away are not read.
+                latest = session.execute(select(func.max(Note.id))).scalar() or 0
+                after = max(after, latest - capacity)
+            while True:
+                ids = session.execute(
+                    select(Note.id).where(Note.id > after).order_by(Note.id.asc()).limit(CATCH_UP_BATCH)
+                ).scalars().all()
+                if not ids:
+                    break
+                after = ids[-1]
+                missing = self.backend.missing(ids)
+                if not missing:
+                    continue
+                # Only the indexed columns, not whole ORM rows.
+                rows = session.execute(
+                    select(Note.id, Note.patient_id, Patient.ward, Note.created_at,
+                           *(getattr(Note, field) for field in SEARCH_FIELDS))
+                    .join(Patient, Patient.id == Note.patient_id)
+                    .where(Note.id.in_(missing))
+                ).all()
+                self.backend.add(NoteDocument.build(*_document_row(row)) for row in rows)
+                indexed += len(rows)
+        return indexed
+
+    def search(self, query: str, filters: SearchFilters, *, limit: int, offset: int = 0) -> List[Tuple[int, float]]:
+        terms = query_terms(query)
+        if not terms:
+            return []
+        filters = SearchFilters(
+            patient_id=filters.patient_id,
+            ward=filters.ward,
+            since=_naive(filters.since),
+            until=_naive(filters.until),
+        )
+        return self.backend.search(terms, filters, limit=limit, offset=offset)
+
+
+def _document_row(row: Sequence[Any]) -> Tuple[Any, ...]:
+    note_id, patient_id, ward, created_at, *texts = row
+    return note_id, patient_id, ward, created_at, texts
+
+
+def build_note_index(path: Optional[str], memory_capacity: Optional[int] = None) -> NoteSearchIndex:
+    if not path:
+        return NoteSearchIndex(MemoryNoteIndex(memory_capacity))
+    backend = SQLiteNoteIndex(path)
+    try:
+        backend.watermark()
+    except sqlite3.OperationalError:
+        logger.warning('SQLite FTS5 unavailable; falling back to the in-process note index')
+        return NoteSearchIndex(MemoryNoteIndex(memory_capacity))
+    return NoteSearchIndex(backend)
+
+
+note_index = build_note_index(settings.NOTE_SEARCH_PATH, settings.NOTE_SEARCH_MEMORY_MAX_NOTES)
+
+
+__all__ = [
+    'MemoryNoteIndex',
+    'NoteDocument',
+    'NoteSearchIndex',
+    'SQLiteNoteIndex',
+    'SearchFilters',
+    'build_note_index',
+    'note_index',
+    'query_terms',
+    'tokenize',
+]
@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+import asyncio
+import weakref
+from functools import lru_cache
+from typing import Any
+
+from ..config import settings
+
+
+@lru_cache(maxsize=1)
+def get_openai_client() -> Any:
+    """The process-wide OpenAI client, built on first use.
+
+    The SDK import alone costs more than the rest of the app, so it is
+    deferred until a request actually transcribes or parses something.
+    """
+    from openai import OpenAI
+
+    return OpenAI(api_key=settings.OPENAI_API_KEY, base_url=settings.OPENAI_BASE_URL)
+
+
+_async_clients: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Any]' = weakref.WeakKeyDictionary()
+
+
+def get_async_openai_client() -> Any:
+    """The ``AsyncOpenAI`` client of the running event loop.
+
+    Its connection pool belongs to the loop it first ran on, so there is one
+    client per loop rather than one per process.
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        from openai import AsyncOpenAI
+
+        client = _async_clients[loop] = AsyncOpenAI(api_key=settings.OPENAI_API_KEY, base_url=settings.OPENAI_BASE_URL)
+    return client
+
+
+async def close_async_openai_client() -> None:
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.close()
+
+
+__all__ = ['close_async_openai_client', 'get_async_openai_client', 'get_openai_client']
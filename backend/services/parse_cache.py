@@ -0,0 +1,263 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Optional
+
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def normalize_text(text: str) -> str:
+    normalized = unicodedata.normalize('NFKC', text or '')
+    return _WHITESPACE_RE.sub(' ', normalized).strip()
+
+
+def cache_key(text: str, model: str, prompt_version: str) -> str:
+    digest = hashlib.sha256()
+    for part in (prompt_version, model, normalize_text(text)):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\x00')
+    return digest.hexdigest()
+
+
+@dataclass(slots=True)
+class CacheStats:
+    memory_hits: int = 0
+    persistent_hits: int = 0
+    misses: int = 0
+    stores: int = 0
+    evictions: int = 0
+
+    def to_dict(self) -> Dict[str, int]:
+        return {
+            'memory_hits': self.memory_hits,
+            'persistent_hits': self.persistent_hits,
+            'misses': self.misses,
+            'stores': self.stores,
+            'evictions': self.evictions,
+        }
+
+
+class LRUCache:
+    """Bounded in-process tier; values are serialized parse results (``json.dumps`` of the decoded dict)."""
+
+    def __init__(self, max_entries: int, ttl_seconds: int) -> None:
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._items: 'OrderedDict[str, tuple[float, str]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.time():
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str) -> int:
+        evicted = 0
+        with self._lock:
+            self._items[key] = (time.time() + self.ttl_seconds, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+                evicted += 1
+        return evicted
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+class SQLiteCache:
+    """Optional persistent tier shared by all workers on the host."""
+
+    def __init__(self, path: str | Path, max_entries: int, ttl_seconds: int) -> None:
+        self.path = str(path)
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+            with self._init_lock:
+                if not self._initialized:
+                    conn.execute(
+                        'CREATE TABLE IF NOT EXISTS parse_cache ('
+                        '  key TEXT PRIMARY KEY,'
+                        '  value TEXT NOT NULL,'
+                        '  expires_at REAL NOT NULL,'
+                        '  accessed_at REAL NOT NULL'
+                        ')'
+                    )
+                    conn.execute('CREATE INDEX IF NOT EXISTS ix_parse_cache_accessed ON parse_cache (accessed_at)')
+                    self._initialized = True
+        return conn
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        conn = self._conn()
+        row = conn.execute('SELECT value, expires_at FROM parse_cache WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        value, expires_at = row
+        if expires_at < now:
+            conn.execute('DELETE FROM parse_cache WHERE key = ?', (key,))
+            return None
+        conn.execute('UPDATE parse_cache SET accessed_at = ? WHERE key = ?', (now, key))
+        return value
+
+    def set(self, key: str, value: str) -> int:
+        now = time.time()
+        conn = self._conn()
+        conn.execute(
+            'INSERT OR REPLACE INTO parse_cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)',
+            (key, value, now + self.ttl_seconds, now),
+        )
+        return self._evict(conn, now)
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> int:
+        evicted = conn.execute('DELETE FROM parse_cache WHERE expires_at < ?', (now,)).rowcount
+        count = conn.execute('SELECT COUNT(*) FROM parse_cache').fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow > 0:
+            evicted += conn.execute(
+                'DELETE FROM parse_cache WHERE key IN ('
+                '  SELECT key FROM parse_cache ORDER BY accessed_at ASC LIMIT ?'
+                ')',
+                (overflow,),
+            ).rowcount
+        return max(evicted, 0)
+
+    def clear(self) -> None:
+        self._conn().execute('DELETE FROM parse_cache')
+
+
+@dataclass
+class ParseResultCache:
+    memory: Optional[LRUCache]
+    persistent: Optional[SQLiteCache] = None
+    stats: CacheStats = field(default_factory=CacheStats)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def get(self, key: str) -> Optional[str]:
+        value = self._get_memory(key)
+        if value is None and self.persistent is not None:
+            value = self._get_persistent(key)
+        if value is None:
+            self._count_miss()
+        return value
+
+    async def aget(self, key: str) -> Optional[str]:
+        """:meth:`get` for the event loop: the SQLite tier is read on a worker thread."""
+        value = self._get_memory(key)
+        if value is None and self.persistent is not None:
+            value = await asyncio.to_thread(self._get_persistent, key)
+        if value is None:
+            self._count_miss()
+        return value
+
+    def _get_memory(self, key: str) -> Optional[str]:
+        if self.memory is None:
+            return None
+        value = self.memory.get(key)
+        if value is not None:
+            with self._lock:
+                self.stats.memory_hits += 1
+        return value
+
+    def _get_persistent(self, key: str) -> Optional[str]:
+        value = self.persistent.get(key)
+        if value is not None:
+            evicted = self.memory.set(key, value) if self.memory is not None else 0
+            with self._lock:
+                self.stats.persistent_hits += 1
+                self.stats.evictions += evicted
+        return value
+
+    def _count_miss(self) -> None:
+        with self._lock:
+            self.stats.misses += 1
+
+    def set(self, key: str, value: str) -> None:
+        evicted = self.memory.set(key, value) if self.memory is not None else 0
+        if self.persistent is not None:
+            evicted += self.persistent.set(key, value)
+        self._count_store(evicted)
+
+    async def aset(self, key: str, value: str) -> None:
+        """:meth:`set` for the event loop: the SQLite tier is written on a worker thread."""
+        evicted = self.memory.set(key, value) if self.memory is not None else 0
+        if self.persistent is not None:
+            evicted += await asyncio.to_thread(self.persistent.set, key, value)
+        self._count_store(evicted)
+
+    def _count_store(self, evicted: int) -> None:
+        with self._lock:
+            self.stats.stores += 1
+            self.stats.evictions += evicted
+
+    def clear(self) -> None:
+        if self.memory is not None:
+            self.memory.clear()
+        if self.persistent is not None:
+            self.persistent.clear()
+        with self._lock:
+            self.stats = CacheStats()
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            data = self.stats.to_dict()
+        data['memory_entries'] = len(self.memory) if self.memory is not None else 0
+        return data
+
+
+def build_parse_cache(*, max_entries: int, ttl_seconds: int, sqlite_path: Optional[str] = None,
+                      persistent_max_entries: Optional[int] = None) -> ParseResultCache:
+    """Memory tier of ``max_entries`` plus, with ``sqlite_path``, a persistent tier.
+
+    The tiers are sized independently: ``max_entries=0`` turns the memory tier
+    off without shrinking the persistent one (``persistent_max_entries``,
+    default ten times the memory tier).
+    """
+    memory = LRUCache(max_entries, ttl_seconds) if max_entries > 0 else None
+    if persistent_max_entries is None:
+        persistent_max_entries = max_entries * 10
+    persistent = None
+    if sqlite_path and persistent_max_entries > 0:
+        persistent = SQLiteCache(sqlite_path, persistent_max_entries, ttl_seconds)
+    return ParseResultCache(memory=memory, persistent=persistent)
+
+
+__all__ = [
+    'CacheStats',
+    'LRUCache',
+    'SQLiteCache',
+    'ParseResultCache',
+    'build_parse_cache',
+    'cache_key',
+    'normalize_text',
+]
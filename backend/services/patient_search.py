@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+import base64
+import json
+import re
+from typing import Any, List, Optional, Tuple
+
+from sqlalchemy import and_, or_, select
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import Select
+
+from ..models import Patient
+from ..models.patient import normalize_search_text
+
+
+# Each mode walks exactly one index in key order, so a page costs one short
+# range scan no matter how many patients match the prefix.
+MODE_COLUMNS = {
+    'mrn': Patient.mrn,
+    'initials': Patient.name_initials,
+    'name': Patient.search_name,
+    'ward': Patient.bed,
+    'all': None,
+}
+
+_MRN_RE = re.compile(r'^[0-9a-z][0-9a-z\-_/]*$')
+_INITIALS_RE = re.compile(r'^[a-z]+$')
+
+
+class InvalidCursorError(ValueError):
+    pass
+
+
+def _escape_like(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def classify_query(q: Optional[str], ward: Optional[str] = None) -> Tuple[str, str]:
+    """Pick the search mode (and normalized key) for a type-ahead string."""
+    key = normalize_search_text(q)
+    if not key:
+        return ('ward' if ward else 'all'), ''
+    if _MRN_RE.match(key) and any(char.isdigit() for char in key):
+        return 'mrn', key
+    if _INITIALS_RE.match(key):
+        return 'initials', key
+    return 'name', key
+
+
+def encode_cursor(mode: str, key: Optional[str], patient_id: int) -> str:
+    raw = json.dumps([mode, key, patient_id], ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(value: Optional[str], mode: str) -> Optional[Tuple[Optional[str], int]]:
+    if not value:
+        return None
+    try:
+        padded = value + '=' * (-len(value) % 4)
+        cursor_mode, key, patient_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        if cursor_mode != mode or not isinstance(patient_id, int):
+            raise ValueError(cursor_mode)
+    except (ValueError, TypeError, UnicodeError) as exc:
+        raise InvalidCursorError('invalid_cursor') from exc
+    return key, patient_id
+
+
+def build_search_query(
+    *,
+    q: Optional[str] = None,
+    ward: Optional[str] = None,
+    bed: Optional[str] = None,
+    limit: int,
+    cursor: Optional[str] = None,
+) -> Tuple[Select, str]:
+    """Return ``(statement, mode)`` selecting up to ``limit + 1`` patients."""
+    mode, key = classify_query(q, ward)
+    column = MODE_COLUMNS[mode]
+    statement = select(Patient)
+
+    if mode in {'mrn', 'initials', 'name'}:
+        statement = statement.where(column.like(_escape_like(key) + '%', escape='\\'))
+    if ward:
+        statement = statement.where(Patient.ward == ward)
+    if bed:
+        if mode == 'ward':
+            statement = statement.where(Patient.bed.like(_escape_like(bed) + '%', escape='\\'))
+        else:
+            statement = statement.where(Patient.bed == bed)
+
+    after = decode_cursor(cursor, mode)
+    if after is not None:
+        after_key, after_id = after
+        if column is None:
+            statement = statement.where(Patient.id > after_id)
+        elif after_key is None:
+            statement = statement.where(or_(
+                and_(column.is_(None), Patient.id > after_id),
+                column.isnot(None),
+            ))
+        else:
+            statement = statement.where(or_(
+                column > after_key,
+                and_(column == after_key, Patient.id > after_id),
+            ))
+
+    order = [Patient.id.asc()] if column is None else [column.asc(), Patient.id.asc()]
+    return statement.order_by(*order).limit(limit + 1), mode
+
+
+def search_patients(
+    session: Session,
+    *,
+    q: Optional[str] = None,
+    ward: Optional[str] = None,
+    bed: Optional[str] = None,
+    limit: int,
+    cursor: Optional[str] = None,
+) -> Tuple[List[Patient], Optional[str], str]:
+    """Run one page of a patient search; returns ``(patients, next_cursor, mode)``."""
+    statement, mode = build_search_query(q=q, ward=ward, bed=bed, limit=limit, cursor=cursor)
+    rows = list(session.execute(statement).scalars())
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = None
+    if has_more and rows:
+        column = MODE_COLUMNS[mode]
+        last: Any = rows[-1]
+        next_cursor = encode_cursor(mode, getattr(last, column.key) if column is not None else None, last.id)
+    return rows, next_cursor, mode
+
+
+__all__ = [
+    'InvalidCursorError',
+    'MODE_COLUMNS',
+    'build_search_query',
+    'classify_query',
+    'search_patients',
+]
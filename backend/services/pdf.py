@@ -1,33 +1,47 @@
 from __future__ import annotations
 
+import zipfile
 from datetime import datetime
+from functools import lru_cache
 from io import BytesIO
 from pathlib import Path
-from typing import Any, Dict, List, Optional, TYPE_CHECKING
+from typing import Any, BinaryIO, Dict, Iterable, List, Optional, Tuple, TYPE_CHECKING
 
-from jinja2 import Environment, FileSystemLoader, select_autoescape
-
-try:  # Prefer HTML -> PDF rendering when available
-    from weasyprint import HTML  # type: ignore
-except ModuleNotFoundError:  # pragma: no cover - optional dependency
-    HTML = None  # type: ignore
-
-try:  # Lightweight fallback if WeasyPrint is unavailable
-    from reportlab.lib.pagesizes import A4  # type: ignore
-    from reportlab.pdfgen import canvas  # type: ignore
-except ModuleNotFoundError:  # pragma: no cover - optional dependency
-    A4 = None  # type: ignore
-    canvas = None  # type: ignore
+from ..lazy import optional_import
+from ..metrics import timed_call
 
 if TYPE_CHECKING:  # pragma: no cover - hints only
     from ..models import Note, Patient
 
 
 _TEMPLATE_ROOT = Path(__file__).resolve().parent.parent / 'templates' / 'pdf'
-_ENV = Environment(
-    loader=FileSystemLoader(str(_TEMPLATE_ROOT)),
-    autoescape=select_autoescape(['html', 'xml'])
-)
+
+
+# The renderers are imported on the first PDF, not with the app: WeasyPrint
+# alone takes longer to import than everything else the API needs.
+@lru_cache(maxsize=1)
+def _env() -> Any:
+    from jinja2 import Environment, FileSystemLoader, select_autoescape
+
+    return Environment(
+        loader=FileSystemLoader(str(_TEMPLATE_ROOT)),
+        autoescape=select_autoescape(['html', 'xml'])
+    )
+
+
+def _html_renderer() -> Any:
+    """WeasyPrint's ``HTML`` class (preferred), or ``None`` when not installed."""
+    weasyprint = optional_import('weasyprint')
+    return weasyprint.HTML if weasyprint is not None else None
+
+
+def _reportlab() -> Optional[Tuple[Any, Any]]:
+    """``(canvas module, A4)`` for the lightweight fallback, or ``None``."""
+    canvas = optional_import('reportlab.pdfgen.canvas')
+    pagesizes = optional_import('reportlab.lib.pagesizes')
+    if canvas is None or pagesizes is None:
+        return None
+    return canvas, pagesizes.A4
 
 _MISSING = '??'
 
@@ -77,12 +91,25 @@ def _fallback(value: Any) -> Any:
 
 
 def _render_with_reportlab(context: Dict[str, Any]) -> bytes:
-    if canvas is None or A4 is None:
+    return _render_many_with_reportlab([context])
+
+
+def _render_many_with_reportlab(contexts: List[Dict[str, Any]], target: Optional[BinaryIO] = None) -> bytes:
+    reportlab = _reportlab()
+    if reportlab is None:
         raise RuntimeError('pdf_renderer_unavailable')
 
-    buf = BytesIO()
-    pdf = canvas.Canvas(buf, pagesize=A4)
-    width, height = A4
+    canvas, page_size = reportlab
+    buf = target if target is not None else BytesIO()
+    pdf = canvas.Canvas(buf, pagesize=page_size)
+    for context in contexts:
+        _draw_reportlab_note(pdf, context, page_size)
+    pdf.save()
+    return b'' if target is not None else buf.getvalue()
+
+
+def _draw_reportlab_note(pdf: Any, context: Dict[str, Any], page_size: Tuple[float, float]) -> None:
+    width, height = page_size
     y = height - 40
 
     def line(text: str = '', step: int = 16) -> None:
@@ -97,7 +124,7 @@ def _render_with_reportlab(context: Dict[str, Any]) -> bytes:
     patient = context['patient']
 
     line(f"CareNotes - Note #{_fallback(note.get('id'))}", step=20)
-    line(f"Generated: {context['generated_at']}")
+    line(f"{'First rendered' if context.get('cached') else 'Generated'}: {context['generated_at']}")
     line(f"Patient: {patient.get('name', _MISSING)} (ID {patient.get('id', _MISSING)})")
     line(f"Ward/Bed: {patient.get('ward', _MISSING)} / {patient.get('bed', _MISSING)}")
     line(f"MRN: {patient.get('mrn', _MISSING)}  Gender: {patient.get('gender', _MISSING)}  DOB: {patient.get('dob', _MISSING)}")
@@ -136,21 +163,17 @@ def _render_with_reportlab(context: Dict[str, Any]) -> bytes:
         line('  (none)')
 
     pdf.showPage()
-    pdf.save()
-    return buf.getvalue()
 
 
-def generate_note_pdf(note: 'Note | Dict[str, Any]', *, patient: 'Patient | Dict[str, Any] | None' = None) -> bytes:
-    """Render the care note PDF using the bundled HTML template."""
+def _build_context(note: 'Note | Dict[str, Any]', patient_dict: Dict[str, Any], generated_at: str) -> Dict[str, Any]:
     note_dict = _as_dict(note)
-    patient_dict = _as_dict(patient)
 
     vitals = _normalize_vitals(note_dict.get('vitals') or {})
     medications = _normalize_medications(note_dict.get('med_given'))
     alerts = note_dict.get('alerts') or []
 
-    context = {
-        'generated_at': datetime.now().strftime('%Y-%m-%d %H:%M'),
+    return {
+        'generated_at': generated_at,
         'patient': patient_dict,
         'note': note_dict,
         'vitals': vitals,
@@ -165,12 +188,108 @@ def generate_note_pdf(note: 'Note | Dict[str, Any]', *, patient: 'Patient | Dict
         'alerts': alerts,
     }
 
-    if HTML is not None:
-        template = _ENV.get_template('note.html')
+
+@timed_call('pdf', 'note')
+def generate_note_pdf(
+    note: 'Note | Dict[str, Any]',
+    *,
+    patient: 'Patient | Dict[str, Any] | None' = None,
+    cached: bool = False,
+) -> bytes:
+    """Render the care note PDF using the bundled HTML template.
+
+    ``cached`` marks a render that will be served again from the PDF cache
+    until the note changes; its timestamp is labelled as the first render
+    time rather than the time of the download.
+    """
+    generated_at = datetime.now().strftime('%Y-%m-%d %H:%M')
+    context = _build_context(note, _as_dict(patient), generated_at)
+    context['cached'] = cached
+
+    html_renderer = _html_renderer()
+    if html_renderer is not None:
+        template = _env().get_template('note.html')
         html = template.render(**context)
-        return HTML(string=html, base_url=str(_TEMPLATE_ROOT)).write_pdf()
+        return html_renderer(string=html, base_url=str(_TEMPLATE_ROOT)).write_pdf()
 
     return _render_with_reportlab(context)
 
 
-__all__ = ['generate_note_pdf']
+def _render_packet(contexts: List[Dict[str, Any]]) -> Any:
+    """Lay out every note in one WeasyPrint pass; returns the rendered document."""
+    template = _env().get_template('packet.html')
+    html = template.render(generated_at=contexts[0]['generated_at'], patient=contexts[0]['patient'], entries=contexts)
+    return _html_renderer()(string=html, base_url=str(_TEMPLATE_ROOT)).render()
+
+
+@timed_call('pdf', 'packet')
+def generate_notes_pdf(
+    notes: Iterable['Note | Dict[str, Any]'],
+    *,
+    patient: 'Patient | Dict[str, Any] | None' = None,
+    target: Optional[BinaryIO] = None,
+) -> bytes:
+    """Render several notes of one patient as a single PDF packet.
+
+    When ``target`` is given the PDF is written there and ``b''`` is returned.
+    """
+    generated_at = datetime.now().strftime('%Y-%m-%d %H:%M')
+    patient_dict = _as_dict(patient)
+    contexts = [_build_context(note, patient_dict, generated_at) for note in notes]
+    if not contexts:
+        raise ValueError('no_notes')
+
+    if _html_renderer() is not None:
+        document = _render_packet(contexts)
+        if target is not None:
+            document.write_pdf(target)
+            return b''
+        return document.write_pdf()
+
+    return _render_many_with_reportlab(contexts, target)
+
+
+def _split_pages_by_note(document: Any, contexts: List[Dict[str, Any]]) -> List[List[Any]]:
+    starts: Dict[str, int] = {}
+    for index, page in enumerate(document.pages):
+        for anchor in page.anchors:
+            starts.setdefault(anchor, index)
+    bounds = [starts.get(f"note-{context['note'].get('id')}") for context in contexts]
+    groups: List[List[Any]] = []
+    for position, start in enumerate(bounds):
+        if start is None:
+            raise RuntimeError('pdf_packet_anchor_missing')
+        end = bounds[position + 1] if position + 1 < len(bounds) else len(document.pages)
+        groups.append(document.pages[start:end])
+    return groups
+
+
+def generate_notes_zip(
+    notes: Iterable['Note | Dict[str, Any]'],
+    *,
+    patient: 'Patient | Dict[str, Any] | None' = None,
+    target: BinaryIO,
+) -> int:
+    """Write one PDF per note into a ZIP archive; returns the number of files.
+
+    WeasyPrint lays the packet out once and each note's pages are copied into
+    their own file, so a large export still costs a single layout pass.
+    """
+    generated_at = datetime.now().strftime('%Y-%m-%d %H:%M')
+    patient_dict = _as_dict(patient)
+    contexts = [_build_context(note, patient_dict, generated_at) for note in notes]
+    if not contexts:
+        raise ValueError('no_notes')
+
+    with zipfile.ZipFile(target, 'w', compression=zipfile.ZIP_STORED) as archive:
+        if _html_renderer() is not None:
+            document = _render_packet(contexts)
+            for context, pages in zip(contexts, _split_pages_by_note(document, contexts)):
+                archive.writestr(f"note_{context['note'].get('id')}.pdf", document.copy(pages).write_pdf())
+        else:
+            for context in contexts:
+                archive.writestr(f"note_{context['note'].get('id')}.pdf", _render_many_with_reportlab([context]))
+    return len(contexts)
+
+
+__all__ = ['generate_note_pdf', 'generate_notes_pdf', 'generate_notes_zip']
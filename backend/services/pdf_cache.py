@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from io import BytesIO
+from pathlib import Path
+from typing import Any, BinaryIO, Callable, Dict, Iterable, Optional, Tuple
+
+from ..config import settings
+from .pdf import _TEMPLATE_ROOT
+
+
+class PDFArtifactCache:
+    """Disk cache for rendered note PDFs.
+
+    Entries are keyed by note id plus a digest of the note/patient payload and
+    the template mtimes, so editing an unsigned note (or the template) simply
+    produces a new key; the stale file for that note is dropped on the next store.
+    A hit serves the bytes of the first render, so cached PDFs label their
+    timestamp as the first render time (see ``generate_note_pdf(cached=True)``).
+    """
+
+    def __init__(self, directory: str | Path, max_bytes: int, templates: Iterable[Path]) -> None:
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.templates = list(templates)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _template_stamp(self) -> str:
+        return ','.join(f'{path.name}:{path.stat().st_mtime_ns}' for path in self.templates if path.exists())
+
+    def digest(self, note: Dict[str, Any], patient: Dict[str, Any]) -> str:
+        payload = json.dumps(
+            {'note': note, 'patient': patient, 'templates': self._template_stamp()},
+            sort_keys=True,
+            ensure_ascii=False,
+            default=str,
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]
+
+    def _path(self, note_id: Any, digest: str) -> Path:
+        return self.directory / f'note_{note_id}_{digest}.pdf'
+
+    def get_or_render(
+        self,
+        note: Dict[str, Any],
+        patient: Dict[str, Any],
+        render: Callable[[Dict[str, Any], Dict[str, Any]], bytes],
+    ) -> Tuple[BinaryIO, str]:
+        """Return ``(file, etag)`` for the note PDF, rendering it on a miss.
+
+        The file is returned already open: another request or worker may
+        evict or replace the entry at any moment, and an open handle keeps
+        reading the old inode where a path would raise FileNotFoundError.
+        The caller closes it (``send_file`` does).
+        """
+        digest = self.digest(note, patient)
+        path = self._path(note.get('id'), digest)
+        try:
+            handle = open(path, 'rb')
+        except FileNotFoundError:
+            pass
+        else:
+            try:
+                os.utime(path)  # mtime doubles as the LRU clock
+            except FileNotFoundError:
+                pass
+            with self._lock:
+                self.hits += 1
+            return handle, digest
+
+        pdf_bytes = render(note, patient)
+        with self._lock:
+            self.misses += 1
+        self._store(note.get('id'), path, pdf_bytes)
+        try:
+            return open(path, 'rb'), digest
+        except FileNotFoundError:  # evicted by another worker already
+            return BytesIO(pdf_bytes), digest
+
+    def _store(self, note_id: Any, path: Path, pdf_bytes: bytes) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix='.tmp-', suffix='.pdf')
+        with os.fdopen(fd, 'wb') as handle:
+            handle.write(pdf_bytes)
+        os.replace(tmp_path, path)
+        for stale in self.directory.glob(f'note_{note_id}_*.pdf'):
+            if stale != path:
+                stale.unlink(missing_ok=True)
+        self._evict(keep=path)
+
+    def _evict(self, keep: Path) -> None:
+        with self._lock:
+            entries = []
+            total = 0
+            for entry in os.scandir(self.directory):
+                if not entry.name.endswith('.pdf') or entry.name.startswith('.tmp-'):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, Path(entry.path)))
+                total += stat.st_size
+            if total <= self.max_bytes:
+                return
+            for _, size, path in sorted(entries):
+                if path == keep:
+                    continue
+                path.unlink(missing_ok=True)
+                total -= size
+                if total <= self.max_bytes:
+                    break
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses}
+
+
+def _build_pdf_cache() -> Optional[PDFArtifactCache]:
+    if settings.PDF_CACHE_MAX_MB <= 0:
+        return None
+    directory = settings.PDF_CACHE_DIR or os.path.join(tempfile.gettempdir(), 'carenotes-pdf-cache')
+    return PDFArtifactCache(
+        directory,
+        settings.PDF_CACHE_MAX_MB * 1024 * 1024,
+        [_TEMPLATE_ROOT / 'note.html', _TEMPLATE_ROOT / '_note_body.html'],
+    )
+
+
+pdf_cache = _build_pdf_cache()
+
+
+__all__ = ['PDFArtifactCache', 'pdf_cache']
@@ -0,0 +1,253 @@
+from __future__ import annotations
+
+import logging
+import multiprocessing
+import os
+import queue
+import shutil
+import tempfile
+import threading
+from typing import Any, Dict, List
+
+from ..config import settings
+from ..metrics import timed_call
+from . import pdf as pdf_service
+
+
+logger = logging.getLogger(__name__)
+
+# A fresh worker imports WeasyPrint and warms its fonts before its first job;
+# that is not counted against PDF_RENDER_TIMEOUT.
+WORKER_START_TIMEOUT = 120.0
+
+
+class RendererBusyError(RuntimeError):
+    pass
+
+
+class RendererUnavailableError(RuntimeError):
+    """A render timed out or its worker died; the worker has been replaced."""
+
+
+def _warm_worker() -> None:
+    """Runs once per worker: parse templates and pay WeasyPrint's font setup up front."""
+    for name in ('note.html', 'packet.html'):
+        pdf_service._env().get_template(name)
+    try:
+        pdf_service.generate_note_pdf({'id': 'warmup'}, patient={})
+    except RuntimeError:  # no renderer installed; the real job will report it
+        pass
+
+
+def _render_note_job(note: Dict[str, Any], patient: Dict[str, Any], cached: bool = False) -> bytes:
+    return pdf_service.generate_note_pdf(note, patient=patient, cached=cached)
+
+
+def _render_packet_job(notes: List[Dict[str, Any]], patient: Dict[str, Any], output_format: str, path: str) -> int:
+    with open(path, 'wb') as handle:
+        if output_format == 'zip':
+            return pdf_service.generate_notes_zip(notes, patient=patient, target=handle)
+        pdf_service.generate_notes_pdf(notes, patient=patient, target=handle)
+    return len(notes)
+
+
+def _worker_main(conn: Any) -> None:
+    _warm_worker()
+    conn.send(None)  # ready
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            return
+        if job is None:
+            return
+        fn, args = job
+        try:
+            conn.send((True, fn(*args)))
+        except Exception as exc:  # reported to the request thread as-is
+            try:
+                conn.send((False, exc))
+            except Exception:  # unpicklable exception
+                conn.send((False, RuntimeError(repr(exc))))
+
+
+class _Worker:
+    """One render process and the pipe to it; runs one job at a time."""
+
+    def __init__(self, context: Any) -> None:
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn,), name='carenotes-pdf', daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.ready = False
+
+    def call(self, fn, args: tuple, timeout: float) -> Any:
+        """Run one job; raises RendererUnavailableError if it overruns ``timeout`` or the process dies."""
+        try:
+            if not self.ready:
+                if not self.conn.poll(WORKER_START_TIMEOUT):
+                    raise RendererUnavailableError('pdf_renderer_start_timeout')
+                self.conn.recv()
+                self.ready = True
+            self.conn.send((fn, args))
+            # The clock starts here: time spent queueing for a worker is not counted.
+            if not self.conn.poll(timeout):
+                raise RendererUnavailableError('pdf_render_timeout')
+            ok, value = self.conn.recv()
+        except (EOFError, OSError) as exc:
+            raise RendererUnavailableError('pdf_renderer_crashed') from exc
+        if not ok:
+            raise value
+        return value
+
+    def stop(self, *, kill: bool) -> None:
+        if not kill:
+            try:
+                self.conn.send(None)
+            except OSError:
+                kill = True
+        if kill:
+            self.process.terminate()
+        self.process.join(5)
+        self.conn.close()
+
+
+class PDFRenderPool:
+    """Runs PDF rendering in worker processes so request threads never hold the GIL for layout.
+
+    Each worker runs one job at a time over its own pipe. A job that overruns
+    PDF_RENDER_TIMEOUT (counted from when a worker picks it up) or kills its
+    worker costs only that worker: it is terminated and replaced, and renders
+    running on the other workers carry on.
+    """
+
+    def __init__(self, workers: int, max_pending: int, timeout: float) -> None:
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._context = multiprocessing.get_context('spawn')
+        self._idle: 'queue.LifoQueue[_Worker]' = queue.LifoQueue()
+        self._spawned = 0
+        self._closed = False
+        self.replaced = 0
+
+    def _acquire(self) -> _Worker:
+        with self._lock:
+            if self._idle.empty() and self._spawned < self.workers:
+                self._spawned += 1
+                return _Worker(self._context)
+        return self._idle.get()
+
+    def _release(self, worker: _Worker) -> None:
+        with self._lock:
+            closed = self._closed
+        if closed:
+            worker.stop(kill=False)
+        else:
+            self._idle.put(worker)
+
+    def _replace(self, worker: _Worker) -> None:
+        # A stuck layout cannot be cancelled from outside: kill just this process.
+        worker.stop(kill=True)
+        with self._lock:
+            self.replaced += 1
+            if self._closed:
+                self._spawned -= 1
+                return
+        self._idle.put(_Worker(self._context))
+
+    def _run(self, fn, *args) -> Any:
+        if not self._slots.acquire(blocking=False):
+            raise RendererBusyError('pdf_renderer_busy')
+        try:
+            worker = self._acquire()
+            try:
+                result = worker.call(fn, args, self.timeout)
+            except RendererUnavailableError as exc:
+                logger.error('pdf worker %s replaced: %s', worker.process.pid, exc)
+                self._replace(worker)
+                raise
+            except BaseException:
+                self._release(worker)
+                raise
+            self._release(worker)
+            return result
+        finally:
+            self._slots.release()
+
+    # Rendering happens in worker processes, so time it (queueing included) from here.
+    @timed_call('pdf', 'pool_note')
+    def render_note(self, note: Dict[str, Any], patient: Dict[str, Any], cached: bool = False) -> bytes:
+        return self._run(_render_note_job, note, patient, cached)
+
+    @timed_call('pdf', 'pool_packet')
+    def render_packet(self, notes: List[Dict[str, Any]], patient: Dict[str, Any], output_format: str, path: str) -> int:
+        return self._run(_render_packet_job, notes, patient, output_format, path)
+
+    def shutdown(self) -> None:
+        """Stop idle workers now; busy ones stop when their job returns."""
+        with self._lock:
+            self._closed = True
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            worker.stop(kill=False)
+
+
+class InlineRenderer:
+    """Used when PDF_WORKERS=0: render on the request thread as before."""
+
+    def render_note(self, note: Dict[str, Any], patient: Dict[str, Any], cached: bool = False) -> bytes:
+        return _render_note_job(note, patient, cached)
+
+    def render_packet(self, notes: List[Dict[str, Any]], patient: Dict[str, Any], output_format: str, path: str) -> int:
+        return _render_packet_job(notes, patient, output_format, path)
+
+    def shutdown(self) -> None:
+        pass
+
+
+def render_packet_to_tempfile(renderer: PDFRenderPool | InlineRenderer, notes: List[Dict[str, Any]],
+                              patient: Dict[str, Any], output_format: str):
+    """Render a packet and return it as an anonymous temp file positioned at 0."""
+    fd, path = tempfile.mkstemp(prefix='carenotes-export-')
+    os.close(fd)
+    spool = tempfile.TemporaryFile()
+    try:
+        renderer.render_packet(notes, patient, output_format, path)
+        with open(path, 'rb') as rendered:
+            shutil.copyfileobj(rendered, spool, 1 << 20)
+    except Exception:
+        spool.close()
+        raise
+    finally:
+        os.unlink(path)
+    spool.seek(0)
+    return spool
+
+
+def _build_renderer() -> PDFRenderPool | InlineRenderer:
+    if settings.PDF_WORKERS <= 0:
+        return InlineRenderer()
+    return PDFRenderPool(
+        workers=settings.PDF_WORKERS,
+        max_pending=settings.PDF_WORKERS + settings.PDF_QUEUE_SIZE,
+        timeout=settings.PDF_RENDER_TIMEOUT,
+    )
+
+
+pdf_renderer = _build_renderer()
+
+
+__all__ = [
+    'PDFRenderPool',
+    'InlineRenderer',
+    'RendererBusyError',
+    'RendererUnavailableError',
+    'pdf_renderer',
+    'render_packet_to_tempfile',
+]
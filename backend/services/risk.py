@@ -0,0 +1,231 @@
+from __future__ import annotations
+
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Set, Tuple
+
+from ..config import settings
+from .alerts import VITAL_FIELDS
+
+# Note ids are allocated before commit, so a lower id can become visible after
+# a higher one was already folded in; catch-up re-reads this many ids below the
+# watermark and the state remembers which of them it has seen.
+CATCH_UP_OVERLAP = 500
+
+
+class RingBuffer:
+    """Fixed-size window of float readings with O(1) mean and least-squares slope.
+
+    Running sums over (x, y) are kept as readings enter and leave the window;
+    x is a monotonically increasing sample index.
+    """
+
+    __slots__ = ('capacity', '_values', '_xs', '_start', '_size', '_next_x',
+                 '_sx', '_sy', '_sxx', '_sxy')
+
+    def __init__(self, capacity: int) -> None:
+        self.capacity = capacity
+        self._values = array('d', bytes(8 * capacity))
+        self._xs = array('d', bytes(8 * capacity))
+        self._start = 0
+        self._size = 0
+        self._next_x = 0.0
+        self._sx = self._sy = self._sxx = self._sxy = 0.0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def push(self, value: float) -> None:
+        x = self._next_x
+        self._next_x += 1.0
+        if self._size == self.capacity:
+            old_x = self._xs[self._start]
+            old_y = self._values[self._start]
+            self._sx -= old_x
+            self._sy -= old_y
+            self._sxx -= old_x * old_x
+            self._sxy -= old_x * old_y
+            slot = self._start
+            self._start = (self._start + 1) % self.capacity
+        else:
+            slot = (self._start + self._size) % self.capacity
+            self._size += 1
+        self._values[slot] = value
+        self._xs[slot] = x
+        self._sx += x
+        self._sy += value
+        self._sxx += x * x
+        self._sxy += x * value
+
+    def latest(self) -> Optional[float]:
+        if not self._size:
+            return None
+        return self._values[(self._start + self._size - 1) % self.capacity]
+
+    def mean(self) -> Optional[float]:
+        return self._sy / self._size if self._size else None
+
+    def slope(self) -> Optional[float]:
+        """Change per reading across the window (None until 3 readings)."""
+        n = self._size
+        if n < 3:
+            return None
+        denominator = n * self._sxx - self._sx * self._sx
+        if denominator == 0:
+            return None
+        return (n * self._sxy - self._sx * self._sy) / denominator
+
+
+# NEWS2 bands as (upper bound inclusive, points); the last band catches everything above.
+_NEWS2_BANDS: Dict[str, Tuple[Tuple[float, int], ...]] = {
+    'rr': ((8, 3), (11, 1), (20, 0), (24, 2), (float('inf'), 3)),
+    'spo2': ((91, 3), (93, 2), (95, 1), (float('inf'), 0)),
+    'bp_sys': ((90, 3), (100, 2), (110, 1), (219, 0), (float('inf'), 3)),
+    'hr': ((40, 3), (50, 1), (90, 0), (110, 1), (130, 2), (float('inf'), 3)),
+    'temp': ((35.0, 3), (36.0, 1), (38.0, 0), (39.0, 1), (float('inf'), 2)),
+}
+
+# (field, minimum slope per reading, message); negative thresholds flag falling values.
+_TREND_RULES: Tuple[Tuple[str, float, str], ...] = (
+    ('hr', 5.0, '心率持续上升'),
+    ('rr', 2.0, '呼吸频率持续上升'),
+    ('temp', 0.3, '体温持续上升'),
+    ('spo2', -1.0, '血氧饱和度持续下降'),
+    ('bp_sys', -5.0, '收缩压持续下降'),
+)
+
+
+def _band_score(field: str, value: float) -> int:
+    for upper, points in _NEWS2_BANDS[field]:
+        if value <= upper:
+            return points
+    return 0
+
+
+def _risk_level(total: int, components: Mapping[str, int]) -> str:
+    if total >= 7:
+        return 'high'
+    if total >= 5:
+        return 'medium'
+    if any(points == 3 for points in components.values()):
+        return 'low_medium'
+    return 'low'
+
+
+def _as_float(value: Any) -> Optional[float]:
+    if value in (None, ''):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class PatientRiskState:
+    __slots__ = ('buffers', 'last_note_id', 'last_observed_at', '_seen')
+
+    def __init__(self, window: int) -> None:
+        self.buffers = {field: RingBuffer(window) for field in VITAL_FIELDS}
+        self.last_note_id = 0
+        self.last_observed_at: Any = None
+        # Folded-in ids within CATCH_UP_OVERLAP of the watermark.
+        self._seen: Set[int] = set()
+
+    def observe(self, note_id: int, vitals: Optional[Mapping[str, Any]], observed_at: Any = None) -> None:
+        floor = self.last_note_id - CATCH_UP_OVERLAP
+        if note_id <= floor or note_id in self._seen:
+            return
+        self._seen.add(note_id)
+        if note_id > self.last_note_id:
+            self.last_note_id = note_id
+            self.last_observed_at = observed_at
+            if len(self._seen) > CATCH_UP_OVERLAP:
+                floor = note_id - CATCH_UP_OVERLAP
+                self._seen = {seen for seen in self._seen if seen > floor}
+        if not isinstance(vitals, Mapping):
+            return
+        for field, buffer in self.buffers.items():
+            value = _as_float(vitals.get(field))
+            if value is not None:
+                buffer.push(value)
+
+    def snapshot(self) -> Dict[str, Any]:
+        components: Dict[str, int] = {}
+        latest: Dict[str, Optional[float]] = {}
+        trends: Dict[str, Optional[float]] = {}
+        for field, buffer in self.buffers.items():
+            value = buffer.latest()
+            latest[field] = value
+            slope = buffer.slope()
+            trends[field] = round(slope, 3) if slope is not None else None
+            if value is not None and field in _NEWS2_BANDS:
+                components[field] = _band_score(field, value)
+
+        alerts: List[str] = []
+        for field, threshold, message in _TREND_RULES:
+            slope = trends.get(field)
+            if slope is None:
+                continue
+            if (threshold > 0 and slope >= threshold) or (threshold < 0 and slope <= threshold):
+                alerts.append(message)
+
+        total = sum(components.values())
+        return {
+            'score': total,
+            'level': _risk_level(total, components),
+            'components': components,
+            'latest': latest,
+            'trends': trends,
+            'alerts': alerts,
+            'samples': {field: len(buffer) for field, buffer in self.buffers.items()},
+            'last_note_id': str(self.last_note_id) if self.last_note_id else None,
+        }
+
+
+class RiskRegistry:
+    """Per-process, LRU-bounded map of patient id -> rolling vitals state."""
+
+    def __init__(self, window: int, max_patients: int) -> None:
+        self.window = window
+        self.max_patients = max_patients
+        self._states: 'OrderedDict[int, PatientRiskState]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, patient_id: int) -> Optional[PatientRiskState]:
+        with self._lock:
+            state = self._states.get(patient_id)
+            if state is not None:
+                self._states.move_to_end(patient_id)
+            return state
+
+    def observe(self, patient_id: int, note_id: int, vitals: Optional[Mapping[str, Any]], observed_at: Any = None) -> None:
+        """O(1) update after a note commits; untracked patients are warmed lazily on read."""
+        with self._lock:
+            state = self._states.get(patient_id)
+            if state is not None:
+                state.observe(note_id, vitals, observed_at)
+
+    def catch_up(self, patient_id: int, rows: Iterable[Tuple[int, Optional[Mapping[str, Any]], Any]]) -> PatientRiskState:
+        """Create or advance a patient's state from ``(note_id, vitals, created_at)`` rows in id order.
+
+        Rows already folded in are skipped, so callers may re-read an overlap
+        below ``last_note_id``.
+        """
+        with self._lock:
+            state = self._states.get(patient_id)
+            if state is None:
+                state = PatientRiskState(self.window)
+                self._states[patient_id] = state
+                while len(self._states) > self.max_patients:
+                    self._states.popitem(last=False)
+            self._states.move_to_end(patient_id)
+            for note_id, vitals, created_at in rows:
+                state.observe(note_id, vitals, created_at)
+            return state
+
+
+risk_registry = RiskRegistry(window=settings.RISK_WINDOW, max_patients=settings.RISK_MAX_PATIENTS)
+
+
+__all__ = ['CATCH_UP_OVERLAP', 'RingBuffer', 'PatientRiskState', 'RiskRegistry', 'risk_registry']
@@ -1,23 +1,41 @@
 ﻿from __future__ import annotations
 
+import asyncio
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from io import BytesIO
-from typing import Optional
-
-from openai import OpenAI
+from pathlib import Path
+from typing import BinaryIO, Callable, List, Optional, Tuple
 
 from ..config import settings
+from ..metrics import timed_call
+from .openai_client import get_async_openai_client, get_openai_client
+
+PartialCallback = Callable[[int, int, str], None]
 
+_SPOOL_BUFFER = 1 << 20
+_FFMPEG_TIME_RE = re.compile(r'time=(\d+):(\d+):(\d+(?:\.\d+)?)')
 
-client = OpenAI(api_key=settings.OPENAI_API_KEY)
 
+def _extract_text(response) -> str:
+    text = response if isinstance(response, str) else getattr(response, 'text', None)
+    if not text:
+        raise RuntimeError('transcribe_failed: empty_response')
+    return text.strip()
 
+
+@timed_call('openai', 'transcribe')
 def transcribe_openai(file_bytes: bytes, filename: str, language: str = 'zh', model: Optional[str] = None) -> str:
     if not file_bytes:
         raise ValueError('invalid_audio')
 
     model_name = model or settings.OPENAI_TRANSCRIBE_MODEL
     try:
-        response = client.audio.transcriptions.create(
+        response = get_openai_client().audio.transcriptions.create(
             model=model_name,
             file=(filename, BytesIO(file_bytes)),
             response_format='text',
@@ -26,7 +44,264 @@ def transcribe_openai(file_bytes: bytes, filename: str, language: str = 'zh', mo
     except Exception as exc:  # pragma: no cover - depends on SDK
         raise RuntimeError(f'transcribe_failed: {exc}') from exc
 
-    text = getattr(response, 'text', None)
-    if not text:
-        raise RuntimeError('transcribe_failed: empty_response')
+    return _extract_text(response)
+
+
+def spool_upload(stream: BinaryIO, filename: str) -> Path:
+    """Copy an upload stream to a temp file without holding it in memory."""
+    suffix = Path(filename).suffix or '.webm'
+    fd, path = tempfile.mkstemp(prefix='carenotes-audio-', suffix=suffix)
+    try:
+        with os.fdopen(fd, 'wb') as handle:
+            shutil.copyfileobj(stream, handle, _SPOOL_BUFFER)
+    except Exception:
+        os.unlink(path)
+        raise
+    return Path(path)
+
+
+@timed_call('openai', 'transcribe_chunk')
+def _transcribe_path(path: str | Path, filename: str, language: str, model_name: str) -> str:
+    try:
+        with open(path, 'rb') as handle:
+            response = get_openai_client().audio.transcriptions.create(
+                model=model_name,
+                file=(filename, handle),
+                response_format='text',
+                language=language,
+            )
+    except Exception as exc:  # pragma: no cover - depends on SDK
+        raise RuntimeError(f'transcribe_failed: {exc}') from exc
+    return _extract_text(response)
+
+
+def _probe_duration(path: str | Path) -> Optional[float]:
+    ffprobe = shutil.which('ffprobe')
+    if ffprobe:
+        try:
+            result = subprocess.run(
+                [ffprobe, '-v', 'error', '-show_entries', 'format=duration',
+                 '-of', 'default=noprint_wrappers=1:nokey=1', str(path)],
+                capture_output=True, text=True, timeout=60,
+            )
+        except subprocess.TimeoutExpired as exc:
+            raise RuntimeError('transcribe_failed: probe_timeout') from exc
+        try:
+            return float(result.stdout.strip())
+        except ValueError:
+            pass  # MediaRecorder webm often has no duration header; fall through and decode
+    ffmpeg = shutil.which('ffmpeg')
+    if not ffmpeg:
+        return None
+    try:
+        result = subprocess.run(
+            [ffmpeg, '-nostdin', '-i', str(path), '-f', 'null', '-'],
+            capture_output=True, text=True, timeout=600,
+        )
+    except subprocess.TimeoutExpired as exc:
+        raise RuntimeError('transcribe_failed: probe_timeout') from exc
+    matches = _FFMPEG_TIME_RE.findall(result.stderr)
+    if not matches:
+        return None
+    hours, minutes, seconds = matches[-1]
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+
+def _plan_chunks(duration: float, chunk_seconds: float, overlap_seconds: float) -> List[Tuple[float, float]]:
+    step = max(chunk_seconds - overlap_seconds, 1.0)
+    chunks: List[Tuple[float, float]] = []
+    start = 0.0
+    while start < duration:
+        chunks.append((start, min(chunk_seconds, duration - start)))
+        if start + chunk_seconds >= duration:
+            break
+        start += step
+    return chunks
+
+
+def _decode_chunk(path: str | Path, index: int, start: float, length: float) -> str:
+    """Cut one chunk out of the recording as 16 kHz mono WAV; the caller deletes it."""
+    fd, chunk_path = tempfile.mkstemp(prefix=f'carenotes-chunk-{index:04d}-', suffix='.wav')
+    os.close(fd)
+    try:
+        subprocess.run(
+            [shutil.which('ffmpeg') or 'ffmpeg', '-nostdin', '-loglevel', 'error', '-y',
+             '-ss', f'{start:.3f}', '-t', f'{length:.3f}', '-i', str(path),
+             '-ac', '1', '-ar', '16000', '-f', 'wav', chunk_path],
+            check=True, capture_output=True, timeout=600,
+        )
+    except subprocess.CalledProcessError as exc:
+        os.unlink(chunk_path)
+        raise RuntimeError(f'transcribe_failed: chunk_{index}_decode') from exc
+    except subprocess.TimeoutExpired as exc:
+        os.unlink(chunk_path)
+        raise RuntimeError(f'transcribe_failed: chunk_{index}_decode_timeout') from exc
+    except BaseException:
+        os.unlink(chunk_path)
+        raise
+    return chunk_path
+
+
+def _transcribe_chunk(path: str | Path, index: int, start: float, length: float, language: str, model_name: str) -> str:
+    chunk_path = _decode_chunk(path, index, start, length)
+    try:
+        return _transcribe_path(chunk_path, f'chunk_{index:04d}.wav', language, model_name)
+    finally:
+        os.unlink(chunk_path)
+
+
+def _join_overlap(left: str, right: str, max_overlap: int = 80, min_overlap: int = 4) -> str:
+    if not left:
+        return right
+    if not right:
+        return left
+    for size in range(min(max_overlap, len(left), len(right)), min_overlap - 1, -1):
+        if left.endswith(right[:size]):
+            return left + right[size:]
+    separator = ' ' if left[-1].isascii() and right[0].isascii() and left[-1].isalnum() and right[0].isalnum() else ''
+    return left + separator + right
+
+
+def stitch_transcripts(parts: List[str]) -> str:
+    text = ''
+    for part in parts:
+        text = _join_overlap(text, part.strip())
     return text.strip()
+
+
+def transcribe_file(
+    path: str | Path,
+    filename: str,
+    language: str = 'zh',
+    model: Optional[str] = None,
+    *,
+    chunk_seconds: Optional[int] = None,
+    overlap_seconds: Optional[int] = None,
+    max_parallel: Optional[int] = None,
+    on_partial: Optional[PartialCallback] = None,
+) -> str:
+    """Transcribe a spooled recording, splitting long audio into overlapping chunks."""
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        raise ValueError('invalid_audio')
+
+    model_name = model or settings.OPENAI_TRANSCRIBE_MODEL
+    chunk_seconds = chunk_seconds or settings.STT_CHUNK_SECONDS
+    overlap_seconds = settings.STT_CHUNK_OVERLAP if overlap_seconds is None else overlap_seconds
+    max_parallel = max_parallel or settings.STT_MAX_PARALLEL
+
+    duration = _probe_duration(path) if shutil.which('ffmpeg') else None
+    if duration is None or duration <= chunk_seconds:
+        text = _transcribe_path(path, filename, language, model_name)
+        if on_partial:
+            on_partial(0, 1, text)
+        return text
+
+    plan = _plan_chunks(duration, chunk_seconds, overlap_seconds)
+    parts: List[str] = [''] * len(plan)
+    with ThreadPoolExecutor(max_workers=min(max_parallel, len(plan)), thread_name_prefix='carenotes-stt') as pool:
+        futures = {
+            pool.submit(_transcribe_chunk, path, index, start, length, language, model_name): index
+            for index, (start, length) in enumerate(plan)
+        }
+        try:
+            for future in as_completed(futures):
+                index = futures[future]
+                parts[index] = future.result()
+                if on_partial:
+                    on_partial(index, len(plan), parts[index])
+        except Exception:
+            for future in futures:
+                future.cancel()
+            raise
+    return stitch_transcripts(parts)
+
+
+# -- async variants (ASGI server) ----------------------------------------------
+# Same behaviour as above, but the OpenAI calls run on the SDK's async client
+# and only the blocking file/ffmpeg work is handed to threads, so a waiting
+# transcription holds no thread.
+
+@timed_call('openai', 'transcribe')
+async def transcribe_openai_async(file_bytes: bytes, filename: str, language: str = 'zh',
+                                  model: Optional[str] = None) -> str:
+    if not file_bytes:
+        raise ValueError('invalid_audio')
+
+    model_name = model or settings.OPENAI_TRANSCRIBE_MODEL
+    try:
+        response = await get_async_openai_client().audio.transcriptions.create(
+            model=model_name,
+            file=(filename, file_bytes),
+            response_format='text',
+            language=language,
+        )
+    except Exception as exc:  # pragma: no cover - depends on SDK
+        raise RuntimeError(f'transcribe_failed: {exc}') from exc
+
+    return _extract_text(response)
+
+
+async def _transcribe_path_async(path: str | Path, filename: str, language: str, model_name: str) -> str:
+    # The SDK reads file objects synchronously; read the bytes off the loop instead.
+    file_bytes = await asyncio.to_thread(Path(path).read_bytes)
+    return await transcribe_openai_async(file_bytes, filename, language, model_name)
+
+
+async def _transcribe_chunk_async(path: str | Path, index: int, start: float, length: float, language: str,
+                                  model_name: str) -> str:
+    chunk_path = await asyncio.to_thread(_decode_chunk, path, index, start, length)
+    try:
+        return await _transcribe_path_async(chunk_path, f'chunk_{index:04d}.wav', language, model_name)
+    finally:
+        os.unlink(chunk_path)
+
+
+async def transcribe_file_async(
+    path: str | Path,
+    filename: str,
+    language: str = 'zh',
+    model: Optional[str] = None,
+    *,
+    chunk_seconds: Optional[int] = None,
+    overlap_seconds: Optional[int] = None,
+    max_parallel: Optional[int] = None,
+) -> str:
+    """:func:`transcribe_file` for the event loop."""
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        raise ValueError('invalid_audio')
+
+    model_name = model or settings.OPENAI_TRANSCRIBE_MODEL
+    chunk_seconds = chunk_seconds or settings.STT_CHUNK_SECONDS
+    overlap_seconds = settings.STT_CHUNK_OVERLAP if overlap_seconds is None else overlap_seconds
+    max_parallel = max_parallel or settings.STT_MAX_PARALLEL
+
+    duration = await asyncio.to_thread(_probe_duration, path) if shutil.which('ffmpeg') else None
+    if duration is None or duration <= chunk_seconds:
+        return await _transcribe_path_async(path, filename, language, model_name)
+
+    plan = _plan_chunks(duration, chunk_seconds, overlap_seconds)
+    limit = asyncio.Semaphore(max_parallel)
+
+    async def run(index: int, start: float, length: float) -> str:
+        async with limit:
+            return await _transcribe_chunk_async(path, index, start, length, language, model_name)
+
+    tasks = [asyncio.ensure_future(run(index, start, length)) for index, (start, length) in enumerate(plan)]
+    try:
+        parts = await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+    return stitch_transcripts(parts)
+
+
+__all__ = [
+    'transcribe_openai',
+    'transcribe_openai_async',
+    'transcribe_file',
+    'transcribe_file_async',
+    'spool_upload',
+    'stitch_transcripts',
+]
@@ -0,0 +1,288 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Dict, Optional, Protocol, Sequence, Tuple
+
+from sqlalchemy import Table, delete, insert, select
+from sqlalchemy.engine import Engine
+
+if TYPE_CHECKING:  # pragma: no cover - hints only
+    from flask import Flask
+
+
+logger = logging.getLogger(__name__)
+
+
+def token_digest(token: str) -> bytes:
+    return hashlib.sha256(token.encode('utf-8')).digest()
+
+
+class VerifiedTokenCache:
+    """Bounded LRU of already-verified tokens, keyed by token digest.
+
+    Each entry lives until the token's own ``exp``, so a cached value is
+    never served after the token would have failed verification.
+    """
+
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max_entries
+        self._items: 'OrderedDict[bytes, Tuple[float, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, digest: bytes, now: float) -> Any:
+        with self._lock:
+            item = self._items.get(digest)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at <= now:
+                del self._items[digest]
+                return None
+            self._items.move_to_end(digest)
+            return value
+
+    def set(self, digest: bytes, value: Any, expires_at: Any) -> int:
+        if not isinstance(expires_at, (int, float)):
+            return 0
+        evicted = 0
+        with self._lock:
+            self._items[digest] = (float(expires_at), value)
+            self._items.move_to_end(digest)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+                evicted += 1
+        return evicted
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+class RevocationStore(Protocol):
+    def add(self, jti: str, expires_at: float, now: float) -> None: ...
+
+    def since(self, revoked_after: float, now: float) -> Sequence[Tuple[str, float, float]]: ...
+
+
+class DatabaseRevocationStore:
+    """Default shared tier: the ``revoked_tokens`` table in the primary database.
+
+    Every worker on every host polls the same table, so a logout anywhere
+    takes effect everywhere within one refresh interval. ``engine`` is a
+    callable so the store can be built before the app's engine exists.
+    """
+
+    def __init__(self, engine: Callable[[], Engine], table: Table) -> None:
+        self.engine = engine
+        self.table = table
+
+    def add(self, jti: str, expires_at: float, now: float) -> None:
+        table = self.table
+        with self.engine().begin() as conn:
+            conn.execute(delete(table).where((table.c.jti == jti) | (table.c.expires_at < now)))
+            conn.execute(insert(table).values(jti=jti, expires_at=expires_at, revoked_at=now))
+
+    def since(self, revoked_after: float, now: float) -> list[Tuple[str, float, float]]:
+        table = self.table
+        query = select(table.c.jti, table.c.expires_at, table.c.revoked_at).where(
+            table.c.revoked_at >= revoked_after, table.c.expires_at >= now,
+        )
+        with self.engine().connect() as conn:
+            return [tuple(row) for row in conn.execute(query)]
+
+
+class SQLiteRevocationStore:
+    """Host-local shared tier: a logout on one worker reaches the others on the same host.
+
+    Cheaper to poll than the database, but workers on other hosts never see
+    it; use it only when the whole deployment runs on one machine.
+    """
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = str(path)
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+            with self._init_lock:
+                if not self._initialized:
+                    conn.execute(
+                        'CREATE TABLE IF NOT EXISTS revoked_tokens ('
+                        '  jti TEXT PRIMARY KEY,'
+                        '  expires_at REAL NOT NULL,'
+                        '  revoked_at REAL NOT NULL'
+                        ')'
+                    )
+                    conn.execute('CREATE INDEX IF NOT EXISTS ix_revoked_tokens_revoked ON revoked_tokens (revoked_at)')
+                    self._initialized = True
+        return conn
+
+    def add(self, jti: str, expires_at: float, now: float) -> None:
+        conn = self._conn()
+        conn.execute(
+            'INSERT OR REPLACE INTO revoked_tokens (jti, expires_at, revoked_at) VALUES (?, ?, ?)',
+            (jti, expires_at, now),
+        )
+        conn.execute('DELETE FROM revoked_tokens WHERE expires_at < ?', (now,))
+
+    def since(self, revoked_after: float, now: float) -> list[Tuple[str, float, float]]:
+        return self._conn().execute(
+            'SELECT jti, expires_at, revoked_at FROM revoked_tokens WHERE revoked_at >= ? AND expires_at >= ?',
+            (revoked_after, now),
+        ).fetchall()
+
+
+class RevocationList:
+    """Revoked ``jti`` values, each kept only until its token would expire anyway.
+
+    Lookups are a dict membership test and never wait on the store. With a
+    shared store, entries written by other workers are pulled in every
+    ``refresh_interval`` seconds: by a background thread once ``init_app``
+    has started it, otherwise by whichever lookup finds the data stale. In
+    that case the lookup runs the query itself, but other lookups do not
+    wait for it. A worker that starts up pulls every unexpired entry on its
+    first poll.
+    """
+
+    # Rows are matched on ``revoked_at`` from the revoking worker's clock, so
+    # each poll re-reads this far back to cover clock skew between hosts.
+    SKEW_SECONDS = 5.0
+
+    def __init__(self, store: Optional[RevocationStore] = None, refresh_interval: float = 1.0) -> None:
+        self.store = store
+        self.refresh_interval = refresh_interval
+        self._revoked: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._next_refresh = 0.0
+        self._synced_until = 0.0
+        self._polling = False
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def init_app(self, app: 'Flask') -> None:
+        """Poll the store from a background thread (in an app context) instead of from lookups."""
+        if self.store is None or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(app,), name='carenotes-revocations', daemon=True)
+        self._thread.start()
+
+    def _run(self, app: 'Flask') -> None:
+        while not self._stop.is_set():
+            with app.app_context():
+                self._refresh(time.time())
+            self._stop.wait(self.refresh_interval)
+
+    def close(self) -> None:
+        self._stop.set()
+
+    def revoke(self, jti: str, expires_at: float) -> None:
+        now = time.time()
+        with self._lock:
+            self._revoked[jti] = expires_at
+            self._prune(now)
+        if self.store is not None:
+            self.store.add(jti, expires_at, now)
+
+    def is_revoked(self, jti: Optional[str], now: float) -> bool:
+        if self.store is not None and self._thread is None and now >= self._next_refresh:
+            self._refresh(now)
+        if not jti:
+            return False
+        expires_at = self._revoked.get(jti)
+        return expires_at is not None and expires_at > now
+
+    def _refresh(self, now: float) -> None:
+        # The query runs outside the lock: only one caller polls at a time, and
+        # lookups keep answering from the current dict while it does.
+        with self._lock:
+            if self._polling or (self._thread is None and now < self._next_refresh):
+                return
+            self._polling = True
+            self._next_refresh = now + self.refresh_interval
+            # Overlap by one interval: rows written just before the last sync
+            # may have become visible only afterwards.
+            revoked_after = self._synced_until - self.refresh_interval - self.SKEW_SECONDS
+        try:
+            rows = self.store.since(revoked_after, now)
+        except Exception:
+            # Keep serving from memory; the next poll re-reads from the
+            # last successful sync, so nothing written meanwhile is missed.
+            logger.exception('revocation store poll failed')
+            rows = None
+        with self._lock:
+            self._polling = False
+            if rows is None:
+                return
+            self._synced_until = now
+            for jti, expires_at, _revoked_at in rows:
+                self._revoked[jti] = expires_at
+            self._prune(now)
+
+    def _prune(self, now: float) -> None:
+        expired = [jti for jti, expires_at in self._revoked.items() if expires_at <= now]
+        for jti in expired:
+            del self._revoked[jti]
+
+    def __len__(self) -> int:
+        return len(self._revoked)
+
+
+@dataclass(slots=True)
+class AuthStats:
+    requests: int = 0
+    cache_hits: int = 0
+    cache_misses: int = 0
+    rejected: int = 0
+    revoked: int = 0
+    evictions: int = 0
+    total_seconds: float = 0.0
+    max_seconds: float = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'requests': self.requests,
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+            'rejected': self.rejected,
+            'revoked': self.revoked,
+            'evictions': self.evictions,
+            'mean_us': round(self.total_seconds * 1e6 / self.requests, 2) if self.requests else 0.0,
+            'max_us': round(self.max_seconds * 1e6, 2),
+        }
+
+
+def build_revocation_list(sqlite_path: Optional[str] = None,
+                          database: Optional[DatabaseRevocationStore] = None) -> RevocationList:
+    """The SQLite tier if ``sqlite_path`` is set, else ``database`` (memory-only if neither)."""
+    if sqlite_path:
+        return RevocationList(SQLiteRevocationStore(sqlite_path))
+    return RevocationList(database)
+
+
+__all__ = [
+    'AuthStats',
+    'DatabaseRevocationStore',
+    'RevocationList',
+    'RevocationStore',
+    'SQLiteRevocationStore',
+    'VerifiedTokenCache',
+    'build_revocation_list',
+    'token_digest',
+]
@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import time
+from typing import Callable, Optional
+
+from sqlalchemy import bindparam, func, select, update
+from sqlalchemy.engine import Engine
+
+from ..models import Note
+from ..models.note import VITAL_COLUMNS, typed_vitals
+
+
+def backfill_vitals(
+    engine: Engine,
+    *,
+    chunk_size: int = 2000,
+    pause_seconds: float = 0.05,
+    after_id: int = 0,
+    until_id: Optional[int] = None,
+    on_chunk: Optional[Callable[[int, int], None]] = None,
+) -> int:
+    """Fill notes.temp/hr/... from notes.vitals in short primary-key-range transactions.
+
+    Each chunk reads and updates at most ``chunk_size`` rows by id, so only
+    those row locks are held and only briefly. The read locks them (FOR
+    UPDATE): a note edited between the read and the write would otherwise
+    get its dual-written values overwritten from the stale JSON.
+    ``pause_seconds`` between chunks leaves headroom for foreground writes.
+    Rows above ``until_id`` (default: the max id at start) are already
+    dual-written. Returns the rows updated; safe to re-run or resume with
+    ``after_id``.
+    """
+    table = Note.__table__
+    if until_id is None:
+        with engine.connect() as conn:
+            until_id = conn.execute(select(func.max(table.c.id))).scalar() or 0
+
+    read = (
+        select(table.c.id, table.c.vitals)
+        .where(table.c.id > bindparam('after'), table.c.id <= until_id)
+        .order_by(table.c.id)
+        .limit(chunk_size)
+        .with_for_update()
+    )
+    write = (
+        update(table)
+        .where(table.c.id == bindparam('note_id'))
+        .values({name: bindparam(name) for name in VITAL_COLUMNS})
+    )
+
+    updated = 0
+    while after_id < until_id:
+        with engine.begin() as conn:
+            rows = conn.execute(read, {'after': after_id}).all()
+            if not rows:
+                break
+            params = []
+            for note_id, vitals in rows:
+                values = typed_vitals(vitals)
+                if any(value is not None for value in values.values()):
+                    params.append({'note_id': note_id, **values})
+            if params:
+                conn.execute(write, params)
+        after_id = rows[-1][0]
+        updated += len(params)
+        if on_chunk is not None:
+            on_chunk(after_id, updated)
+        if pause_seconds:
+            time.sleep(pause_seconds)
+    return updated
+
+
+__all__ = ['backfill_vitals']
@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Dict, Iterable, List
+
+from ..db import db
+from ..models import Note, Patient, PatientLatestState
+
+
+def _naive(value: datetime | None) -> datetime | None:
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone().replace(tzinfo=None)
+
+
+def init_latest_state(patient: Patient) -> PatientLatestState:
+    """Create the (empty) summary row for a freshly flushed patient."""
+    state = PatientLatestState(patient_id=patient.id, ward=patient.ward, bed=patient.bed, unsigned_count=0)
+    db.session.add(state)
+    return state
+
+
+def apply_notes_to_latest_state(notes: Iterable[Note]) -> None:
+    """Fold newly flushed notes into ``patient_latest_state`` within the caller's transaction.
+
+    Rows are locked with SELECT ... FOR UPDATE in patient-id order so concurrent
+    writers for the same patient serialize instead of losing counts.
+    """
+    by_patient: Dict[int, List[Note]] = {}
+    for note in notes:
+        by_patient.setdefault(note.patient_id, []).append(note)
+
+    for patient_id in sorted(by_patient):
+        state = db.session.get(PatientLatestState, patient_id, with_for_update=True)
+        if state is None:
+            patient = db.session.get(Patient, patient_id)
+            state = init_latest_state(patient)
+        for note in by_patient[patient_id]:
+            if not note.signed:
+                state.unsigned_count = (state.unsigned_count or 0) + 1
+            created_at = _naive(note.created_at)
+            if state.is_newer(created_at, note.id):
+                state.last_note_id = note.id
+                state.last_note_at = created_at or datetime.now()
+                state.latest_vitals = note.vitals
+                state.latest_alerts = note.alerts
+
+
+__all__ = ['apply_notes_to_latest_state', 'init_latest_state']
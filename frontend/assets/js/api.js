@@ -1,6 +1,22 @@
 import { getToken } from './auth.js';
 
 let API_BASE = localStorage.getItem('API_BASE') || 'http://127.0.0.1:5000/api';
+// After a write the server asks for reads to stay on the primary database for a
+// few seconds (X-Read-Primary-For), so a read replica's lag never hides it.
+let readPrimaryUntil = 0;
+
+function applyReadPrimary(headers) {
+    if (Date.now() < readPrimaryUntil) {
+        headers.set('X-Read-Primary', '1');
+    }
+}
+
+function trackReadPrimary(response) {
+    const seconds = Number(response.headers.get('X-Read-Primary-For'));
+    if (seconds > 0) {
+        readPrimaryUntil = Math.max(readPrimaryUntil, Date.now() + seconds * 1000);
+    }
+}
 
 export function setApiBase(url) {
     API_BASE = url;
@@ -20,6 +36,7 @@ async function request(path, { method = 'GET', body, headers = {}, multipart = f
     if (token) {
         finalHeaders.set('Authorization', `Bearer ${token}`);
     }
+    applyReadPrimary(finalHeaders);
 
     const url = `${API_BASE}${path}`;
     const options = { method, headers: finalHeaders }; 
@@ -28,6 +45,7 @@ async function request(path, { method = 'GET', body, headers = {}, multipart = f
     }
 
     const response = await fetch(url, options);
+    trackReadPrimary(response);
     if (!response.ok) {
         let errorPayload;
         try {
@@ -70,6 +88,7 @@ export async function download(path) {
     if (token) {
         headers.set('Authorization', `Bearer ${token}`);
     }
+    applyReadPrimary(headers);
     const response = await fetch(url, { headers });
     if (!response.ok) {
         throw new Error(`HTTP ${response.status}`);